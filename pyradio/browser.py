@@ -5,7 +5,6 @@ try:
 except:
     pass
 from copy import deepcopy
-import random
 import json
 from os import path
 import collections
@@ -17,10 +16,14 @@ except:
 import threading
 import logging
 from .player import info_dict_to_list
-from .cjkwrap import cjklen, PY3
+from .cjkwrap import cjkljust, PY3
 from .countries import countries
 from .simple_curses_widgets import SimpleCursesLineEdit, SimpleCursesHorizontalPushButtons, SimpleCursesWidgetColumns, SimpleCursesCheckBox, SimpleCursesCounter, SimpleCursesBoolean, DisabledWidget, SimpleCursesString
-from .ping import ping
+from .browser_mirrors import RadioBrowserMirrors, open_mirrors
+from .browser_cache import RadioBrowserCache, search_cache_key
+from .browser_http import radio_browser_session, radio_browser_pool, http_get, iter_json_array
+from .browser_station import RadioBrowserStation
+from .search_index import PyRadioSearchIndex
 
 import locale
 locale.setlocale(locale.LC_ALL, '')    # set your locale
@@ -324,6 +327,32 @@ class RadioBrowser(PyRadioStationsBrowser):
     _server_selection_window = None
     _dns_info = None
 
+    ''' number of mirrors to send each search to, when the
+        server has not been selected by the user; the first
+        one to respond wins '''
+    _parallel_queries = 3
+    _server_set_by_user = False
+    _mirrors = RadioBrowserMirrors()
+
+    ''' search results cache (None if disabled) '''
+    _cache = None
+    _cache_revalidate = True
+
+    ''' when a search may return more stations than this,
+        the first ones are displayed while the rest are
+        still being received '''
+    PARTIAL_RESULTS = 100
+
+    ''' formatted stations' lines and columns separators,
+        for the window width in _render_width; cleared
+        when the width or the stations change '''
+    _render_cache = {}
+    _separators_cache = {}
+    _render_width = -1
+
+    ''' search index of the stations (built on first search) '''
+    _search_index = None
+
     search_by = _old_search_by = None
 
     _default_max_number_of_results = 100
@@ -366,7 +395,7 @@ class RadioBrowser(PyRadioStationsBrowser):
         if session:
             self._session = session
         else:
-            self._session = requests.Session()
+            self._session = radio_browser_session()
         self._pyradio_info = pyradio_info.strip()
         if self._pyradio_info:
             self._headers['User-Agent'] = self._pyradio_info.replace(' ', '/')
@@ -482,7 +511,8 @@ class RadioBrowser(PyRadioStationsBrowser):
         def do_click(a_station, a_station_uuid):
             url = 'http://' + self._server + '/json/url/' + a_station_uuid
             try:
-                r = self._session.get(url=url, headers=self._headers, timeout=(self._search_timeout, 2 * self._search_timeout))
+                ''' not retried; a click must only be counted once '''
+                r = http_get(url, retries=0, session=self._session, headers=self._headers, timeout=(self._search_timeout, 2 * self._search_timeout))
                 if logger.isEnabledFor(logging.DEBUG):
                     logger.debug('Station click result: "{}"'.format(r.text))
                 # if '"ok":true' in r.text:
@@ -490,7 +520,10 @@ class RadioBrowser(PyRadioStationsBrowser):
             except:
                 if logger.isEnabledFor(logging.DEBUG):
                     logger.debug('Station click failed...')
-        threading.Thread(target=do_click, args=(a_station, self._raw_stations[a_station]['stationuuid'], )).start()
+        if radio_browser_pool().submit(do_click, a_station, self._raw_stations[a_station]['stationuuid']) is None:
+            ''' the pool is full; do not block the UI for a click '''
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning('RadioBrowser: too many pending requests; station click not sent')
 
     def vote(self, a_station):
         url = 'http://' + self._server + '/json/vote/' + self._raw_stations[a_station]['stationuuid']
@@ -498,7 +531,7 @@ class RadioBrowser(PyRadioStationsBrowser):
             logger.debug('Voting for: {}'.format(self._raw_stations[a_station]))
             logger.debug('Voting url: ' + url)
         try:
-            r = self._session.get(url=url, headers=self._headers, timeout=(self._search_timeout, 2 * self._search_timeout))
+            r = http_get(url, retries=0, session=self._session, headers=self._headers, timeout=(self._search_timeout, 2 * self._search_timeout))
             message = json.loads(r.text)
             self.vote_result = self._raw_stations[a_station]['name'], message['message'][0].upper() + message['message'][1:]
             # logger.error('DE voting result = {}'.format(self.vote_result))
@@ -513,6 +546,7 @@ class RadioBrowser(PyRadioStationsBrowser):
 
         if ret:
             self._raw_stations[a_station]['votes'] += 1
+            self._clear_render_cache()
 
         if self._vote_callback:
             self._vote_callback()
@@ -592,8 +626,8 @@ class RadioBrowser(PyRadioStationsBrowser):
                 Returns
                 -------
                 self._raw_stations
-                    A dictionary with a subset of returned station data.
-                    Its format is:
+                    A list of RadioBrowserStation, with a subset of
+                    returned station data. Its fields are:
                         name           : station name
                         id             : station id
                         url            : station url
@@ -618,7 +652,8 @@ class RadioBrowser(PyRadioStationsBrowser):
         )
         self._old_search_by = self.search_by
         self._sort = None
-        url = self._format_url(self._search_history[self._search_history_index])
+        url_path = self._format_url_path(self._search_history[self._search_history_index])
+        url = 'http://' + self._server + url_path
         post_data = {}
         if self._search_history[self._search_history_index]['post_data']:
             post_data = deepcopy(self._search_history[self._search_history_index]['post_data'])
@@ -639,23 +674,63 @@ class RadioBrowser(PyRadioStationsBrowser):
         ''' keep server results here '''
         new_raw_stations = []
 
-        try:
-            r = self._session.get(url=url, headers=self._headers, params=post_data, timeout=(self._search_timeout, 2 * self._search_timeout))
-            self._log_response(r)
-            r.raise_for_status()
+        cache_key = search_cache_key(url_path, post_data)
+        if self._cache:
+            cached, age = self._cache.get(cache_key)
+            if cached is not None:
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info('RadioBrowser: using cached result ({} seconds old)'.format(int(age)))
+                cached = [RadioBrowserStation.from_list(x) for x in cached]
+                self._calculate_max_len(cached)
+                self._raw_stations = cached
+                self._clear_render_cache()
+                if self._cache_revalidate and age > self._cache.ttl / 2:
+                    if radio_browser_pool().submit(
+                        self._revalidate_cached_search,
+                        url_path, post_data, cache_key
+                    ) is None:
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug('RadioBrowser: too many pending requests; cached result not refreshed')
+                if self._search_return_function:
+                    self._search_return_function((True, len(cached), go_back_in_history))
+                return
 
-            new_raw_stations = self._extract_data(json.loads(r.text))
-            # logger.error('DE \n\n{}'.format(new_raw_stations))
-            ret = True, len(new_raw_stations), go_back_in_history
-        except requests.exceptions.RequestException as e:
+        def show_partial_result(server, stations):
+            ''' display the first stations received '''
+            self._use_server(server)
+            self._calculate_max_len(stations)
+            self._raw_stations = stations[:]
+            self._clear_render_cache()
+            if self._search_return_function:
+                self._search_return_function((True, len(stations), go_back_in_history, True))
+
+        limit = post_data.get('limit', 0)
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        server, new_raw_stations, complete = self._fetch_stations(
+            url_path,
+            post_data,
+            partial_function=show_partial_result if limit == 0 or limit > self.PARTIAL_RESULTS else None
+        )
+        if server is None:
             if logger.isEnabledFor(logging.INFO):
-                logger.info(e)
+                logger.info('RadioBrowser: search failed on all servers')
             # self._raw_stations = []
+            new_raw_stations = []
             ret = False, 0, go_back_in_history
+        else:
+            self._use_server(server)
+            self._calculate_max_len(new_raw_stations)
+            ret = True, len(new_raw_stations), go_back_in_history
+            if self._cache and new_raw_stations and complete:
+                self._cache.put(cache_key, [x.as_list() for x in new_raw_stations])
 
         ''' use server result '''
         if len(new_raw_stations) > 0:
             self._raw_stations = new_raw_stations[:]
+            self._clear_render_cache()
 
         if self._search_return_function:
             self._search_return_function(ret)
@@ -672,15 +747,97 @@ class RadioBrowser(PyRadioStationsBrowser):
             except:
                 pass
 
-    def _log_response(self, r):
-        if logger.isEnabledFor(logging.INFO):
+    def _revalidate_cached_search(self, url_path, post_data, cache_key):
+        ''' Refresh a cached search result, in the background;
+            it will be used the next time the search is made '''
+        server, stations, complete = self._fetch_stations(url_path, post_data)
+        if stations and complete:
+            self._cache.put(cache_key, [x.as_list() for x in stations])
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('RadioBrowser: cached result refreshed')
+
+    def _fetch_stations(self, url_path, post_data, partial_function=None):
+        ''' Send a search to the fastest mirrors and decode the
+            stations while they are being received
+
+            If the result of the fastest mirror cannot be read
+            (i.e. it is truncated or not valid JSON), the search
+            is sent again to the rest of the mirrors.
+
+            If partial_function is given, it is called with
+            (server, stations) once PARTIAL_RESULTS stations
+            have been received (only once, even if the search
+            has to be sent again)
+
+            Returns server, list of RadioBrowserStation, complete
+                    complete is False if no mirror sent a
+                    valid result, but the first stations
+                    had been received (and displayed) already
+                    None, None, False if the search failed
+        '''
+        servers = self._servers_to_query()
+        partial = None
+        while servers:
+            server, r = open_mirrors(
+                self._session,
+                servers,
+                url_path,
+                params=post_data,
+                headers=self._headers,
+                timeout=(self._search_timeout, 2 * self._search_timeout),
+                mirrors=self._mirrors
+            )
+            if server is None:
+                break
+            stations = []
             try:
-                logger.info('>>> RadioBrowser Response Query:')
-                logger.info('  url = "{}"'.format(r.request.url))
-                logger.info('  body = "{}"'.format(r.request.body))
-                logger.info('  headers = "{}"'.format(r.request.headers))
-            except:
-                pass
+                for n in iter_json_array(r):
+                    try:
+                        stations.append(self._station_from_search_result(n))
+                    except (KeyError, TypeError, ValueError, AttributeError):
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug('RadioBrowser: invalid station data: {}'.format(n))
+                        continue
+                    if partial is None and len(stations) == self.PARTIAL_RESULTS:
+                        partial = server, stations[:]
+                        if partial_function:
+                            partial_function(server, stations)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                if logger.isEnabledFor(logging.ERROR):
+                    logger.error('RadioBrowser: cannot read result from {0}: {1}'.format(server, e))
+                self._mirrors.record_failure(server)
+                servers = [x for x in servers if x != server]
+                continue
+            finally:
+                r.close()
+            return server, stations, True
+        if partial is not None:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info('RadioBrowser: using the first {} stations received'.format(len(partial[1])))
+            return partial[0], partial[1], False
+        return None, None, False
+
+    def _use_server(self, server):
+        if server != self._server:
+            ''' a faster server; use it from now on '''
+            self._server = server
+            self._get_title()
+
+    def _servers_to_query(self):
+        ''' Return the servers to send a search to
+
+            A server selected by the user is the only one used.
+            Otherwise, the search is sent to the fastest mirrors
+            (up to _parallel_queries of them) '''
+        if self._server_set_by_user or self._parallel_queries < 2:
+            return [self._server]
+        servers = self._dns_info.server_urls if self._dns_info else None
+        if not servers:
+            return [self._server]
+        servers = self._mirrors.rank(servers)[:self._parallel_queries]
+        if self._server not in servers:
+            servers[-1] = self._server
+        return servers
 
     def _get_search_elements(self, a_search):
         '''
@@ -741,18 +898,13 @@ class RadioBrowser(PyRadioStationsBrowser):
 
     def get_next(self, search_term, start=0, stop=None):
         if search_term:
-            for n in range(start, len(self._raw_stations)):
-                if self._search_in_station(search_term, n):
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug('forward search term "{0}" found at {1}'.format(search_term, n))
-                    return n
-
-            """ if not found start from list top """
-            for n in range(0, start):
-                if self._search_in_station(search_term, n):
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug('forward search term "{0}" found at {1}'.format(search_term, n))
-                    return n
+            if start >= len(self._raw_stations):
+                start = 0
+            n = self._get_search_index().find_next(search_term.lower(), max(start, 0))
+            if n is not None:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('forward search term "{0}" found at {1}'.format(search_term, n))
+                return n
             """ if not found return None """
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug('forward search term "{}" not found'.format(search_term))
@@ -762,17 +914,13 @@ class RadioBrowser(PyRadioStationsBrowser):
 
     def get_previous(self, search_term, start=0, stop=None):
         if search_term:
-            for n in range(start, -1, -1):
-                if self._search_in_station(search_term, n):
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug('backward search term "{0}" found at {1}'.format(search_term, n))
-                    return n
-            """ if not found start from list end """
-            for n in range(len(self._raw_stations) - 1, start, -1):
-                if self._search_in_station(search_term, n):
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug('backward search term "{0}" found at {1}'.format(search_term, n))
-                    return n
+            if start < 0 or start >= len(self._raw_stations):
+                start = len(self._raw_stations) - 1
+            n = self._get_search_index().find_previous(search_term.lower(), start)
+            if n is not None:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('backward search term "{0}" found at {1}'.format(search_term, n))
+                return n
             """ if not found return None """
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug('backward search term "{}" not found'.format(search_term))
@@ -780,37 +928,41 @@ class RadioBrowser(PyRadioStationsBrowser):
         else:
             return None
 
-    def _search_in_station(self, a_search_term, a_station):
-        guide = (
-            'name',
-            'country',
-            'codec',
-            'tags',
-            'bitrate',
-            'language'
-        )
-        for n in guide:
-            source = self._raw_stations[a_station][n]
-            if isinstance(source, int):
-                ''' this is one of the numerical data '''
-                source = str(source)
-            if a_search_term.lower() in source.lower():
-                return True
-        return False
+    def _get_search_index(self):
+        ''' Return the search index of the stations; each of them
+            is searched in its name, country, codec, tags,
+            bitrate and language '''
+        if self._search_index is None:
+            guide = (
+                'name',
+                'country',
+                'codec',
+                'tags',
+                'bitrate',
+                'language'
+            )
+            sep = PyRadioSearchIndex.SEPARATOR
+            self._search_index = PyRadioSearchIndex(
+                sep.join(
+                    str(x[n]) if isinstance(x[n], int) else x[n] for n in guide
+                ).lower() for x in self._raw_stations
+            )
+        return self._search_index
+
+    def _format_url_path(self, a_search):
+        ''' Return the path of the url of a search (the part
+            after the server), so that it can be sent to any
+            of the mirrors
 
-    def _format_url(self, a_search):
-        ''' work on a copy, this way we can change it and not
+            work on a copy, this way we can change it and not
             break "term to widgets" assignment
         '''
         a_search_copy = deepcopy(a_search)
-        logger.error('_format_url(): a_search_copy = {}'.format(a_search_copy))
+        logger.error('_format_url_path(): a_search_copy = {}'.format(a_search_copy))
         if a_search_copy['type'] in RADIO_BROWSER_DISPLAY_TERMS.keys():
-            url = 'http://{0}{1}'.format(
-                self._server,
-                '/json/stations/{}'.format(a_search_copy['type'])
-            )
+            url_path = '/json/stations/{}'.format(a_search_copy['type'])
             if a_search_copy['term'] not in ('', '0'):
-                url += '/{}'.format(a_search_copy['term'])
+                url_path += '/{}'.format(a_search_copy['term'])
             self._search_type = 0
 
         elif a_search_copy['type'] in RADIO_BROWSER_SEARCH_BY_TERMS.keys():
@@ -818,18 +970,14 @@ class RadioBrowser(PyRadioStationsBrowser):
                     len(a_search_copy['term']) == 2:
                 a_search_copy['type'] = 'bycountrycodeexact'
                 a_search_copy['term'] = a_search_copy['term'].upper()
-            url = 'http://{0}{1}/{2}'.format(
-                self._server,
-                '/json/stations/{}'.format(a_search_copy['type']),
+            url_path = '/json/stations/{0}/{1}'.format(
+                a_search_copy['type'],
                 a_search_copy['term']
             )
             self._search_type = 1
 
         elif a_search_copy['type'] == 'search':
-            url = 'http://{0}{1}'.format(
-                self._server,
-                '/json/stations/search'
-            )
+            url_path = '/json/stations/search'
             if a_search_copy['post_data']:
                 if 'country' in a_search_copy['post_data']:
                     ''' look for country code '''
@@ -843,7 +991,7 @@ class RadioBrowser(PyRadioStationsBrowser):
                             pass
             self._search_type = 2
 
-        return url
+        return url_path
 
     def format_empty_line(self, width):
         if self._output_format == 0:
@@ -906,7 +1054,18 @@ class RadioBrowser(PyRadioStationsBrowser):
                         [Bitrate: XXXkb], or
                         empty string
         '''
-
+        self._get_output_format(width)
+        self._check_render_width(width)
+        key = (id_in_list, pad, self._output_format, self._raw_stations[id_in_list]['played'])
+        try:
+            return self._render_cache[key]
+        except KeyError:
+            ret = self._render_cache[key] = self._build_station_line(id_in_list, pad, width)
+            return ret
+
+    def _build_station_line(self, id_in_list, pad, width):
+        ''' Actually create a station's line; called by
+            format_station_line() when it is not cached '''
         info = (u'',
                 u' {0}{1}kb',
                 u' {0}{1}│{2}kb',
@@ -916,7 +1075,6 @@ class RadioBrowser(PyRadioStationsBrowser):
                 u' {0}{1}│{2}│{3}kb│{4}│{5}│{6}',
                 u' {0}{1}│{2}│{3}kb│{4}│{5}│{6}│{7}│{8}',
                 )
-        self._get_output_format(width)
         # logger.error('DE self._output_format = {}'.format(self._output_format))
         out = ['{0}. '.format(str(id_in_list + 1).rjust(pad)), '', '']
 
@@ -997,47 +1155,55 @@ class RadioBrowser(PyRadioStationsBrowser):
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug('New encoding set to "{0}" for station "{1}"'.format(new_encoding, self._raw_stations[id_in_list]['name']))
 
+    def _clear_render_cache(self):
+        ''' the stations have changed '''
+        self._render_cache = {}
+        self._search_index = None
+
+    def _check_render_width(self, width):
+        if width != self._render_width:
+            self._render_width = width
+            self._render_cache = {}
+            self._separators_cache = {}
+
     def _fix_cjk_string_width(self, a_string, width):
-        while cjklen(a_string) > width:
-            a_string = a_string[:-1]
-        while cjklen(a_string) < width:
-            a_string += ' '
-        return a_string
+        return cjkljust(a_string, width)
 
-    def _extract_data(self, a_search_result):
-        ret = []
+    def _calculate_max_len(self, stations):
         self._max_len = [0, 0]
-        if a_search_result:
-            for n in a_search_result:
-                ret.append({'name': n['name'].replace(',', ' ')})
-                ret[-1]['stationuuid'] = n['stationuuid']
-                ret[-1]['url'] = n['url']
-                ret[-1]['url_resolved'] = n['url_resolved']
-                ret[-1]['url'] = n['url']
-                ret[-1]['played'] = False
-                ret[-1]['hls'] = n['hls']
-                ret[-1]['stationuuid'] = n['stationuuid']
-                ret[-1]['countrycode'] = n['countrycode']
-                ret[-1]['country'] = n['country']
-                ret[-1]['codec'] = n['codec']
-                ret[-1]['state'] = n['state']
-                ret[-1]['tags'] = n['tags'].replace(',', ', ')
-                ret[-1]['homepage'] = n['homepage']
-                if isinstance(n['clickcount'], int):
-                    # old API
-                    ret[-1]['votes'] = n['votes']
-                    ret[-1]['clickcount'] = n['clickcount']
-                    ret[-1]['bitrate'] = n['bitrate']
-                else:
-                    # new API
-                    ret[-1]['votes'] = int(n['votes'])
-                    ret[-1]['clickcount'] = int(n['clickcount'])
-                    ret[-1]['bitrate'] = int(n['bitrate'])
-                ret[-1]['language'] = capitalize_comma_separated_string(n['language'])
-                ret[-1]['encoding'] = ''
-                self._get_max_len(ret[-1]['votes'],
-                                  ret[-1]['clickcount'])
-        return ret
+        for n in stations:
+            self._get_max_len(n['votes'], n['clickcount'])
+
+    def _station_from_search_result(self, n):
+        if isinstance(n['clickcount'], int):
+            # old API
+            votes = n['votes']
+            clickcount = n['clickcount']
+            bitrate = n['bitrate']
+        else:
+            # new API
+            votes = int(n['votes'])
+            clickcount = int(n['clickcount'])
+            bitrate = int(n['bitrate'])
+        return RadioBrowserStation(
+            name=n['name'].replace(',', ' '),
+            stationuuid=n['stationuuid'],
+            url=n['url'],
+            url_resolved=n['url_resolved'],
+            played=False,
+            hls=n['hls'],
+            countrycode=n['countrycode'],
+            country=n['country'],
+            codec=n['codec'],
+            state=n['state'],
+            tags=n['tags'].replace(',', ', '),
+            homepage=n['homepage'],
+            votes=votes,
+            clickcount=clickcount,
+            bitrate=bitrate,
+            language=capitalize_comma_separated_string(n['language']),
+            encoding=''
+        )
 
     def _get_max_len(self, votes, clicks):
         ''' Calculate the maximum length of numeric_data / country
@@ -1152,9 +1318,25 @@ class RadioBrowser(PyRadioStationsBrowser):
             A list containing columns_separotors (e.g. [55, 65]).
         '''
 
-        columns_separotors = []
         if not use_old_output_format:
             self._get_output_format(width)
+        self._check_render_width(width)
+        key = (self._output_format, adjust, adjust_for_body, adjust_for_header)
+        try:
+            columns_separotors = self._separators_cache[key]
+        except KeyError:
+            columns_separotors = self._separators_cache[key] = self._calculate_columns_separators(
+                width, adjust, adjust_for_body, adjust_for_header
+            )
+        ''' callers may modify the list '''
+        return columns_separotors[:]
+
+    def _calculate_columns_separators(self,
+                                      width,
+                                      adjust,
+                                      adjust_for_body,
+                                      adjust_for_header):
+        columns_separotors = []
         if self._output_format == 0:
             columns_separotors = []
         elif self._output_format == 1:
@@ -1313,32 +1495,43 @@ class RadioBrowser(PyRadioStationsBrowser):
         self._default_ping_count = self.browser_config.ping_count
         self._default_ping_timeout = self.browser_config.ping_timeout
         self._calculate_do_ping()
+        if self.browser_config.cache_ttl > 0:
+            self._cache = RadioBrowserCache(
+                path.join(self._cnf.stations_dir, '.radio-browser-cache'),
+                ttl=60 * self.browser_config.cache_ttl,
+                max_size=1024 * self.browser_config.cache_size
+            )
+        else:
+            self._cache = None
+        self._cache_revalidate = self.browser_config.cache_revalidate
         self._server = None
         if self._default_server:
             if logger.isEnabledFor(logging.INFO):
                 logger.info('RadioBrowser: pinging user default server: ' + self._default_server)
             if self._do_ping:
-                if ping(self._default_server,
-                        count=self._default_ping_count,
-                        timeout_in_seconds=self._default_ping_timeout) == 1:
+                if self._mirrors.probe(
+                        [self._default_server],
+                        timeout=self._default_ping_timeout,
+                        tries=self._default_ping_count,
+                        force=True):
                     self._server = self._default_server
                     if logger.isEnabledFor(logging.INFO):
                         logger.info('ping was successful!')
                         logger.info('RadioBrowser: server is set by user: ' + self._server)
             else:
                 self._server = self._default_server
+        self._server_set_by_user = bool(self._server)
 
         if not self._server:
-            random_server = self._dns_info.give_me_a_server_url()
-            # logger.error('DE random_server = {}'.format(random_server))
-            if random_server is None:
+            fastest_server = self._dns_info.give_me_a_server_url()
+            if fastest_server is None:
                 if logger.isEnabledFor(logging.INFO):
                     logger.info('RadioBrowser: No server is reachable!')
                 return False
 
-            self._server = random_server
+            self._server = fastest_server
             if logger.isEnabledFor(logging.INFO):
-                logger.info('RadioBrowser: using random server: ' + self._server)
+                logger.info('RadioBrowser: using fastest server: ' + self._server)
 
         if logger.isEnabledFor(logging.INFO):
             logger.info('RadioBrowser: result limit = {}'.format(self._default_max_number_of_results))
@@ -1384,11 +1577,13 @@ class RadioBrowser(PyRadioStationsBrowser):
                                 logger.debug('settng reverse to {}'.format(self.reverse))
 
                 self._raw_stations = sorted(self._raw_stations, key=itemgetter(self.search_by), reverse=self.reverse)
+                self._clear_render_cache()
                 self._old_search_by = self.search_by
 
             elif self.keyboard_handler == self._server_selection_window:
                 if ret == 0:
                     self._server = self._server_selection_window.server
+                    self._server_set_by_user = True
                     if logger.isEnabledFor(logging.INFO):
                         logger.info('RadioBrowser: user selected server is ' + self._server)
                     self._get_title()
@@ -1445,6 +1640,9 @@ class RadioBrowserConfig(object):
             ping_timeout : int (ping timeout is seconds)
             ping_count   : int (number of ping packages)
             terms        : list of dicts (the actual search paremeters)
+            cache_ttl    : int (minutes to keep search results; 0 disables the cache)
+            cache_size   : int (maximum size of the search results cache in KB)
+            cache_revalidate : Boolean (refresh cached results in the background)
     '''
     auto_save = False
     server = ''
@@ -1454,6 +1652,9 @@ class RadioBrowserConfig(object):
     dirty = False
     ping_count = 1
     ping_timeout = 1
+    cache_ttl = 60
+    cache_size = 5120
+    cache_revalidate = True
 
     def __init__(self, stations_dir):
         self.config_file = path.join(stations_dir, 'radio-browser-config')
@@ -1469,6 +1670,9 @@ class RadioBrowserConfig(object):
         self.limit = 100
         self.ping_count = 1
         self.ping_timeout = 1
+        self.cache_ttl = 60
+        self.cache_size = 5120
+        self.cache_revalidate = True
         lines = []
         term_str = []
         try:
@@ -1514,6 +1718,18 @@ class RadioBrowserConfig(object):
                             self.ping_timeout = int(sp[1])
                         except:
                             self.ping_timeout = 1
+                    elif sp[0] == 'CACHE_TTL':
+                        try:
+                            self.cache_ttl = int(sp[1])
+                        except:
+                            self.cache_ttl = 60
+                    elif sp[0] == 'CACHE_SIZE':
+                        try:
+                            self.cache_size = int(sp[1])
+                        except:
+                            self.cache_size = 5120
+                    elif sp[0] == 'CACHE_REVALIDATE':
+                        self.cache_revalidate = False if sp[1].lower() == 'false' else True
 
         if term_str:
             for n in range(0, len(term_str)):
@@ -1612,6 +1828,27 @@ PING_TIMEOUT = '''
 
         txt += '''
 
+# search results cache
+# minutes to keep a search result (0 disables the cache)
+CACHE_TTL = '''
+
+        txt += str(self.cache_ttl)
+
+        txt += '''
+# maximum size of the cache in KB
+CACHE_SIZE = '''
+
+        txt += str(self.cache_size)
+
+        txt += '''
+# refresh cached results in the background
+# Possible values: True (default), False
+CACHE_REVALIDATE = '''
+
+        txt += str(self.cache_revalidate)
+
+        txt += '''
+
 # List of "search terms" (queries)
 # An asterisk specifies the default search term (the
 # one activated when RadioBrowser opens up)
@@ -3385,9 +3622,10 @@ class RadioBrowserData(object):
     _timeout = 3
     data_thread = None
 
-    def __init__(self, url, timeout=3):
+    def __init__(self, url, timeout=3, pyradio_info=''):
         self._url = url
         self._timeout = timeout
+        self._pyradio_info = pyradio_info.strip()
 
     def start(self, force_update=False):
         ''' Start data acquisition thread '''
@@ -3493,38 +3731,6 @@ class RadioBrowserData(object):
 
     def _get_all_data_thread(self, lock, force_update, stop, callback): # noqa
 
-        def get_data(data):
-            ret = {}
-            json_data = []
-            connection_error, json_data = get_data_dict(data)
-            if connection_error:
-                return True, {}
-            if json_data:
-                for a_tag in json_data:
-                    ret[a_tag['name']] = a_tag['stationcount']
-                return False, ret
-
-        def get_countries(stop):
-            ret = {}
-            connection_error, json_countrycodes = get_data_dict('countrycodes')
-            if connection_error:
-                return True, {}
-            from countries import countries
-            st = 'stationcount'
-            for n in json_countrycodes:
-                if n['name'] in countries.keys():
-                    ret[countries[n['name']]] = {}
-                    ret[countries[n['name']]]['code'] = n['name']
-                    ret[countries[n['name']]]['stationcount'] = n[st]
-                    ret[countries[n['name']]]['states'] = {}
-            connection_error, json_states = get_data_dict('states')
-            if connection_error:
-                return True, {}
-            for n in json_states:
-                if n['country'] in ret.keys():
-                    ret[n['country']]['states'][n['name']] = n['stationcount']
-            return False, ret
-
         def get_data_dict(data):
             url = 'http://' + self._url + '/json/' + data
             jdata = {'hidebroken': 'true'}
@@ -3533,32 +3739,70 @@ class RadioBrowserData(object):
             if self._pyradio_info:
                 headers['user-agent'] = self._pyradio_info.replace(' ', '/')
             try:
-                r = requests.get(url, headers=headers, json=jdata, timeout=self._timeout)
+                r = http_get(url, headers=headers, json=jdata, timeout=self._timeout)
                 r.raise_for_status()
                 return False, json.loads(r.text)
-                # if r.status_code == 200:
-                #     return False, json.loads(r.text)
-                # else:
-                #     return True, []
             except requests.exceptions.RequestException as e:
-                if logger.isEnabledFor(logger.ERROR):
+                if logger.isEnabledFor(logging.ERROR):
                     logger.error(e)
                 return True, []
 
-        my_data = {}
-        data_items = ['tags', 'countries', 'codecs', 'languages']
-        for an_item in data_items:
-            if an_item == 'countries':
-                ret, my_data['countries'] = get_countries(stop)
+        def get_data(json_data):
+            ret = {}
+            for a_tag in json_data:
+                ret[a_tag['name']] = a_tag['stationcount']
+            return ret
+
+        def get_countries(json_countrycodes, json_states):
+            ret = {}
+            st = 'stationcount'
+            for n in json_countrycodes:
+                if n['name'] in countries.keys():
+                    ret[countries[n['name']]] = {}
+                    ret[countries[n['name']]]['code'] = n['name']
+                    ret[countries[n['name']]]['stationcount'] = n[st]
+                    ret[countries[n['name']]]['states'] = {}
+            for n in json_states:
+                if n['country'] in ret.keys():
+                    ret[n['country']]['states'][n['name']] = n['stationcount']
+            return ret
+
+        ''' fetch all endpoints at once '''
+        pool = radio_browser_pool()
+        endpoints = ('tags', 'countrycodes', 'states', 'codecs', 'languages')
+        futures = {}
+        for an_endpoint in endpoints:
+            futures[an_endpoint] = pool.submit(get_data_dict, an_endpoint)
+
+        results = {}
+        connection_error = False
+        for an_endpoint in endpoints:
+            if futures[an_endpoint] is None:
+                ''' the pool is full '''
+                results[an_endpoint] = get_data_dict(an_endpoint)
             else:
-                ret, my_data[an_item] = get_data(an_item)
+                results[an_endpoint] = futures[an_endpoint].result()
+            if results[an_endpoint] is None or results[an_endpoint][0]:
+                connection_error = True
+                results[an_endpoint] = (True, [])
             if stop():
                 if logger.isEnabledFor(logging.DEBUG):
-                    logger.info('Asked to stop after working on "{}"...'.format(an_item))
+                    logger.info('Asked to stop after working on "{}"...'.format(an_endpoint))
                 self._terminated = True
                 return
+
+        my_data = {}
+        for an_item in ('tags', 'codecs', 'languages'):
+            my_data[an_item] = get_data(results[an_item][1])
+        if results['countrycodes'][0] or results['states'][0]:
+            my_data['countries'] = {}
+        else:
+            my_data['countries'] = get_countries(
+                results['countrycodes'][1],
+                results['states'][1]
+            )
         lock.acquire()
-        callback(my_data, ret)
+        callback(my_data, connection_error)
         lock.release()
 
 
@@ -3636,30 +3880,23 @@ class RadioBrowserDns(object):
         logger.error('DE countries = {}'.format(self._countries))
 
     def give_me_a_server_url(self):
-        ''' Returns a random server '''
+        ''' Returns the fastest reachable server
+
+            All servers are probed at once (see
+            RadioBrowserMirrors.probe); the results are
+            reused for RadioBrowserMirrors.PROBE_TTL seconds
+        '''
         if self._urls is None:
             self._get_urls()
 
         if self._urls:
-            ping_response = [-2] * len(self._urls)
-            start_num = num = random.randint(0, len(self._urls) - 1)
-            while ping_response[num] == -2:
-                if logger.isEnabledFor(logging.INFO):
-                    logger.info('pinging random server: ' + self._urls[num])
-                ping_response[num] = ping(self._urls[num], count=1, timeout_in_seconds=1)
-                if ping_response[num] == 1:
-                    ''' ping was ok '''
-                    if logger.isEnabledFor(logging.INFO):
-                        logger.info('ping was successful!')
-                    break
-                if logger.isEnabledFor(logging.INFO):
-                    logger.info('ping was unsuccessful!')
-                num += 1
-                if num == len(self._urls):
-                    num = 0
-                if num == start_num:
-                    return None
-            return self._urls[num]
+            server = RadioBrowserMirrors().fastest(self._urls, timeout=1)
+            if logger.isEnabledFor(logging.INFO):
+                if server is None:
+                    logger.info('RadioBrowser: no server responded')
+                else:
+                    logger.info('RadioBrowser: fastest server: ' + server)
+            return server
         else:
             return None
 
@@ -3890,6 +4127,14 @@ class RadioBrowserServersSelect(object):
         self._Y = Y
         self._X = X
         logger.error('DE self._Y ={0}, self._X = {1}'.format(self._Y, self._X))
+        self._mirrors = RadioBrowserMirrors()
+        if self.ping_count > 0 and self.ping_timeout > 0:
+            ''' check the servers while the user is choosing '''
+            self._mirrors.probe_in_background(
+                servers,
+                timeout=self.ping_timeout,
+                tries=self.ping_count
+            )
 
     def show(self, parent=None):
         if parent:
@@ -3970,10 +4215,11 @@ class RadioBrowserServersSelect(object):
                         curses.color_pair(3)
                     )
                     self._win.refresh()
-                    if ping(self.servers.server,
-                            count=self.ping_count,
-                            timeout_in_seconds=self.ping_timeout) != 1:
-                        ''' ping was not ok '''
+                    if not self._mirrors.probe(
+                            [self.servers.server],
+                            timeout=self.ping_timeout,
+                            tries=self.ping_count):
+                        ''' server is not reachable '''
                         msg = ' Host is unreachable '
                         self._win.addstr(
                             self.maxY - 1, int((self.maxX - len(msg)) / 2),
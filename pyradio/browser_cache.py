@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import json
+import hashlib
+import logging
+from os import path, listdir, makedirs, remove, rename, stat, utime
+from time import time
+
+logger = logging.getLogger(__name__)
+
+''' Increase this when the format of the cached stations
+    changes, so that older results are not used '''
+CACHE_FORMAT_VERSION = 2
+
+
+def search_cache_key(url_path, post_data):
+    ''' Return the cache key of a RadioBrowser query
+
+        It does not depend on the server the query is sent
+        to, or on the order of the items of post_data.
+    '''
+    data = dict((str(k), str(v)) for k, v in post_data.items()) if post_data else {}
+    return 'v{0}:{1}?{2}'.format(
+        CACHE_FORMAT_VERSION, url_path, json.dumps(data, sort_keys=True)
+    )
+
+
+class RadioBrowserCache(object):
+    ''' An on-disk cache of RadioBrowser search results
+
+        Each result is kept in a file of its own, in cache_dir;
+        the file's mtime is the time it was last used, so that
+        the least recently used results are removed when the
+        files' total size exceeds max_size (in bytes).
+
+        A result older than ttl (in seconds) is not returned.
+    '''
+
+    def __init__(self, cache_dir, ttl=3600, max_size=5*1024*1024):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_size = max_size
+
+    def _cache_file(self, key):
+        return path.join(
+            self.cache_dir,
+            hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json'
+        )
+
+    def get(self, key):
+        ''' Return (stations, age in seconds), or (None, None)
+            if the result is not cached or has expired '''
+        a_file = self._cache_file(key)
+        try:
+            with open(a_file, 'r') as f:
+                data = json.load(f)
+        except:
+            return None, None
+        age = time() - data.get('time', 0)
+        if data.get('key') != key or age > self.ttl or age < 0:
+            self._remove(a_file)
+            return None, None
+        try:
+            ''' mark it as recently used '''
+            utime(a_file, None)
+        except:
+            pass
+        return data['stations'], age
+
+    def put(self, key, stations):
+        if not path.exists(self.cache_dir):
+            try:
+                makedirs(self.cache_dir)
+            except:
+                return False
+        a_file = self._cache_file(key)
+        tmp_file = a_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump({
+                    'key': key,
+                    'time': time(),
+                    'stations': stations
+                }, f)
+            rename(tmp_file, a_file)
+        except:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('RadioBrowser: cannot write cache file "{}"'.format(a_file))
+            self._remove(tmp_file)
+            return False
+        self._evict()
+        return True
+
+    def clear(self):
+        for a_file in self._cache_files():
+            self._remove(a_file[2])
+
+    def _cache_files(self):
+        ''' Return a list of (mtime, size, path) of the cache files '''
+        ret = []
+        try:
+            files = listdir(self.cache_dir)
+        except:
+            return ret
+        for a_file in files:
+            if a_file.endswith('.json'):
+                a_path = path.join(self.cache_dir, a_file)
+                try:
+                    st = stat(a_path)
+                except:
+                    continue
+                ret.append((st.st_mtime, st.st_size, a_path))
+        return ret
+
+    def _evict(self):
+        files = self._cache_files()
+        total = sum(x[1] for x in files)
+        if total <= self.max_size:
+            return
+        files.sort()
+        for an_mtime, a_size, a_path in files:
+            if total <= self.max_size:
+                break
+            self._remove(a_path)
+            total -= a_size
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('RadioBrowser: removed cached result "{}"'.format(a_path))
+
+    def _remove(self, a_file):
+        try:
+            remove(a_file)
+        except:
+            pass
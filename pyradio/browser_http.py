@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+import json
+import codecs
+import threading
+import logging
+from time import sleep
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except:
+    pass
+
+logger = logging.getLogger(__name__)
+
+''' number of servers to keep connections to, and
+    number of connections to keep per server '''
+POOL_SERVERS = 8
+POOL_CONNECTIONS_PER_SERVER = 4
+
+''' number of worker threads used for RadioBrowser requests '''
+POOL_WORKERS = 4
+
+''' number of requests that can wait for a worker '''
+POOL_QUEUE_SIZE = 64
+
+''' bytes read at a time when streaming a response '''
+STREAM_CHUNK_SIZE = 16384
+
+_session = None
+_pool = None
+_lock = threading.Lock()
+
+
+class PyRadioWorkerFuture(object):
+    ''' The (future) result of a function run by PyRadioWorkerPool '''
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+        self.error = None
+
+    def set_result(self, result, error=None):
+        self._result = result
+        self.error = error
+        self._event.set()
+
+    def result(self, timeout=None):
+        ''' Wait for the function to return and return its
+            result (None on timeout or if it raised) '''
+        self._event.wait(timeout)
+        return self._result
+
+    def done(self):
+        return self._event.is_set()
+
+
+class PyRadioWorkerPool(object):
+    ''' A fixed number of (daemon) threads running functions
+        from a bounded queue
+
+        The threads are started when the first function is
+        submitted; if the queue is full, submit() does not
+        block, it returns None instead.
+    '''
+
+    def __init__(self, workers=POOL_WORKERS, queue_size=POOL_QUEUE_SIZE):
+        self._workers = workers
+        self._queue = queue.Queue(queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        ''' Run func(*args, **kwargs) in a worker thread
+
+            Returns a PyRadioWorkerFuture, or None if there
+            are too many requests waiting already
+        '''
+        self._start_threads()
+        future = PyRadioWorkerFuture()
+        try:
+            self._queue.put_nowait((future, func, args, kwargs))
+        except queue.Full:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('RadioBrowser: too many pending requests; dropping one')
+            return None
+        return future
+
+    def _start_threads(self):
+        with self._lock:
+            while len(self._threads) < self._workers:
+                a_thread = threading.Thread(target=self._work)
+                a_thread.daemon = True
+                a_thread.start()
+                self._threads.append(a_thread)
+
+    def _work(self):
+        while True:
+            future, func, args, kwargs = self._queue.get()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('RadioBrowser: request failed: {}'.format(e))
+                future.set_result(None, e)
+
+
+def radio_browser_session():
+    ''' Return the (shared) requests.Session used for all
+        RadioBrowser traffic; it keeps connections alive, up to
+        POOL_CONNECTIONS_PER_SERVER for each of POOL_SERVERS
+        servers '''
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=POOL_SERVERS,
+                pool_maxsize=POOL_CONNECTIONS_PER_SERVER
+            )
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def radio_browser_pool():
+    ''' Return the (shared) PyRadioWorkerPool used for
+        RadioBrowser requests '''
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = PyRadioWorkerPool()
+        return _pool
+
+
+def http_get(url, retries=2, backoff=0.5, session=None, **kwargs):
+    ''' GET a url, using the shared session
+
+        Connection errors, timeouts and server errors (5xx) are
+        retried up to retries times, waiting backoff, 2*backoff,
+        4*backoff... seconds in between. Use retries=0 for
+        requests that must not be repeated (i.e. votes).
+
+        Returns the response; raises the last error if all
+        tries failed.
+    '''
+    if session is None:
+        session = radio_browser_session()
+    attempt = 0
+    while True:
+        try:
+            r = session.get(url, **kwargs)
+            if r.status_code < 500 or attempt >= retries:
+                return r
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout):
+            if attempt >= retries:
+                raise
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('RadioBrowser: retrying "{}"'.format(url))
+        sleep(backoff * (2 ** attempt))
+        attempt += 1
+
+
+def iter_json_array(response, chunk_size=STREAM_CHUNK_SIZE):
+    ''' Decode a JSON array (i.e. a RadioBrowser search result)
+        while it is being received, yielding its items one by one
+
+        response is a requests response opened with stream=True.
+        Neither the whole body nor its decoded text are kept in
+        memory; just the part of it that has not been decoded yet.
+
+        Raises ValueError if the body is not a valid JSON array
+        (items already yielded are not affected).
+    '''
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    chunks = response.iter_content(chunk_size)
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n':
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError('Unexpected end of JSON data')
+            buf, pos, eof = _read_more(chunks, text_decoder, buf, pos)
+            continue
+        if not started:
+            if buf[pos] != '[':
+                raise ValueError('JSON array expected')
+            started = True
+            pos += 1
+        elif buf[pos] == ']':
+            return
+        elif buf[pos] == ',':
+            pos += 1
+        else:
+            try:
+                item, pos = decoder.raw_decode(buf, pos)
+            except ValueError:
+                ''' the item is not complete yet '''
+                if eof:
+                    raise
+                buf, pos, eof = _read_more(chunks, text_decoder, buf, pos)
+                continue
+            yield item
+
+
+def _read_more(chunks, text_decoder, buf, pos):
+    ''' Append the next chunk of a response to the part of buf
+        not decoded yet; returns buf, pos, eof '''
+    try:
+        chunk = next(chunks)
+        return buf[pos:] + text_decoder.decode(chunk), 0, False
+    except StopIteration:
+        return buf[pos:] + text_decoder.decode(b'', True), 0, True
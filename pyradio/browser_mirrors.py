@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+import socket
+import threading
+import logging
+from collections import deque
+from time import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+try:
+    import requests
+except:
+    pass
+
+logger = logging.getLogger(__name__)
+
+
+class RadioBrowserMirrors(object):
+    ''' Latency statistics of RadioBrowser mirrors
+
+        For each mirror it keeps an exponentially weighted
+        moving average of its response time and the number
+        of consecutive failed requests, so that the fastest
+        working mirrors are tried first.
+
+        Mirrors can also be probed (all of them at once) by
+        timing a TCP connection to their HTTP port; the last
+        RTT_SAMPLES round trip times of each mirror are kept,
+        and a mirror is not probed again for PROBE_TTL seconds.
+
+        The statistics are kept for the whole PyRadio session
+        (they are class attributes).
+    '''
+
+    ''' weight of the last response time in the average '''
+    ALPHA = 0.3
+
+    ''' response time assumed for a mirror never used '''
+    UNKNOWN_LATENCY = 1.0
+
+    ''' number of round trip times kept per mirror '''
+    RTT_SAMPLES = 20
+
+    ''' seconds a probe result is valid for '''
+    PROBE_TTL = 300
+
+    ''' the port probed '''
+    PROBE_PORT = 80
+
+    _lock = threading.Lock()
+    _latency = {}
+    _failures = {}
+    _rtt = {}
+    _probed = {}
+    _alive = {}
+
+    def record(self, server, seconds):
+        with self._lock:
+            old = self._latency.get(server)
+            if old is None:
+                self._latency[server] = seconds
+            else:
+                self._latency[server] = old + self.ALPHA * (seconds - old)
+            self._failures[server] = 0
+
+    def record_failure(self, server):
+        with self._lock:
+            self._failures[server] = self._failures.get(server, 0) + 1
+
+    def latency(self, server):
+        with self._lock:
+            return self._latency.get(server)
+
+    def rtt_percentile(self, server, percent=50):
+        ''' Return the percent-th percentile of the probed
+            round trip times of a server (None if it has
+            never been probed successfully) '''
+        with self._lock:
+            samples = sorted(self._rtt.get(server, ()))
+        if not samples:
+            return None
+        index = int(round(percent / 100.0 * (len(samples) - 1)))
+        return samples[min(max(index, 0), len(samples) - 1)]
+
+    def _estimate(self, server):
+        ''' Expected response time of a server: its average
+            response time, or its median round trip time if
+            it has not been queried yet '''
+        ret = self._latency.get(server)
+        if ret is None:
+            samples = sorted(self._rtt.get(server, ()))
+            if samples:
+                ret = samples[len(samples) // 2]
+            else:
+                ret = self.UNKNOWN_LATENCY
+        return ret
+
+    def rank(self, servers):
+        ''' Return servers sorted, failing mirrors last
+            and then by average response time '''
+        with self._lock:
+            return sorted(
+                servers,
+                key=lambda x: (
+                    self._failures.get(x, 0),
+                    self._estimate(x)
+                )
+            )
+
+    def probe(self, servers, timeout=1, tries=1, force=False):
+        ''' Check all servers at once, by timing a TCP connection
+            to each of them (up to tries connections per server,
+            until one succeeds)
+
+            Servers probed less than PROBE_TTL seconds ago are
+            not probed again, unless force is True. Waits for
+            timeout * tries seconds at most.
+
+            Returns the servers found alive, fastest first
+        '''
+        now = time()
+        with self._lock:
+            to_probe = [x for x in servers if force or
+                        now - self._probed.get(x, now - self.PROBE_TTL) >= self.PROBE_TTL]
+        if to_probe:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('RadioBrowser: probing {}'.format(', '.join(to_probe)))
+            results = queue.Queue()
+            for a_server in to_probe:
+                a_thread = threading.Thread(
+                    target=self._probe_server,
+                    args=(a_server, timeout, tries, results)
+                )
+                a_thread.daemon = True
+                a_thread.start()
+            deadline = time() + timeout * max(tries, 1) + 0.1
+            for _ in to_probe:
+                try:
+                    results.get(timeout=max(deadline - time(), 0))
+                except queue.Empty:
+                    break
+            with self._lock:
+                for a_server in to_probe:
+                    if self._probed.get(a_server, 0) < now:
+                        ''' did not answer in time '''
+                        self._set_probe_result(a_server, None)
+        with self._lock:
+            alive = [x for x in servers if self._alive.get(x)]
+        return self.rank(alive)
+
+    def probe_in_background(self, servers, timeout=1, tries=1):
+        ''' Run probe() in a thread of its own '''
+        a_thread = threading.Thread(
+            target=self.probe,
+            args=(list(servers), timeout, tries)
+        )
+        a_thread.daemon = True
+        a_thread.start()
+        return a_thread
+
+    def fastest(self, servers, timeout=1, tries=1, force=False):
+        ''' Return the fastest live server, or None '''
+        alive = self.probe(servers, timeout, tries, force)
+        return alive[0] if alive else None
+
+    def _probe_server(self, server, timeout, tries, results):
+        rtt = None
+        for _ in range(max(tries, 1)):
+            rtt = tcp_connect_time(server, self.PROBE_PORT, timeout)
+            if rtt is not None:
+                break
+        with self._lock:
+            self._set_probe_result(server, rtt)
+        if logger.isEnabledFor(logging.DEBUG):
+            if rtt is None:
+                logger.debug('RadioBrowser: {} is unreachable'.format(server))
+            else:
+                logger.debug('RadioBrowser: {0} connected in {1:.0f} ms'.format(server, rtt * 1000))
+        results.put(server)
+
+    def _set_probe_result(self, server, rtt):
+        ''' Store the result of a probe (rtt is None on failure);
+            to be called with the lock held '''
+        self._probed[server] = time()
+        if rtt is None:
+            self._alive[server] = False
+            self._failures[server] = self._failures.get(server, 0) + 1
+        else:
+            self._alive[server] = True
+            self._failures[server] = 0
+            if server not in self._rtt:
+                self._rtt[server] = deque(maxlen=self.RTT_SAMPLES)
+            self._rtt[server].append(rtt)
+
+
+def tcp_connect_time(server, port=80, timeout=1):
+    ''' Return the seconds it took to connect to server:port
+        (name resolution excluded), or None on failure '''
+    try:
+        address = socket.getaddrinfo(server, port, 0, socket.SOCK_STREAM)[0]
+    except:
+        return None
+    sock = None
+    try:
+        sock = socket.socket(address[0], address[1], address[2])
+        sock.settimeout(timeout)
+        start = time()
+        sock.connect(address[4])
+        return time() - start
+    except:
+        return None
+    finally:
+        if sock is not None:
+            try:
+                sock.close()
+            except:
+                pass
+
+
+def open_mirrors(session,
+                 servers,
+                 url_path,
+                 params=None,
+                 headers=None,
+                 timeout=(3, 6),
+                 mirrors=None):
+    ''' Send the same GET request to all servers at once and
+        return the first successful response, without reading
+        its body, so that it can be streamed
+
+        The responses that arrive later are closed (their body
+        is not downloaded, if possible), but their response time
+        is still recorded in mirrors (a RadioBrowserMirrors).
+
+        Returns:
+            server, response
+                the caller should close the response when done
+            None, None
+                if all requests failed
+    '''
+    if mirrors is None:
+        mirrors = RadioBrowserMirrors()
+    results = queue.Queue()
+    lock = threading.Lock()
+    winner = []
+
+    def do_query(server):
+        start = time()
+        r = None
+        try:
+            r = session.get(
+                url='http://' + server + url_path,
+                headers=headers,
+                params=params,
+                timeout=timeout,
+                stream=True
+            )
+            r.raise_for_status()
+        except:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('RadioBrowser: query to {} failed'.format(server))
+            mirrors.record_failure(server)
+            if r is not None:
+                r.close()
+            results.put((server, None))
+            return
+        mirrors.record(server, time() - start)
+        with lock:
+            first = not winner
+            winner.append(server)
+        if first:
+            results.put((server, r))
+        else:
+            ''' too late; do not download the body '''
+            r.close()
+            results.put((server, None))
+
+    for a_server in servers:
+        a_thread = threading.Thread(target=do_query, args=(a_server, ))
+        a_thread.daemon = True
+        a_thread.start()
+
+    for _ in servers:
+        server, response = results.get()
+        if response is not None:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info('RadioBrowser: fastest response from {}'.format(server))
+            return server, response
+    return None, None
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+''' the data kept for each station of a RadioBrowser search '''
+STATION_FIELDS = (
+    'name',
+    'stationuuid',
+    'url',
+    'url_resolved',
+    'played',
+    'hls',
+    'countrycode',
+    'country',
+    'codec',
+    'state',
+    'tags',
+    'homepage',
+    'votes',
+    'clickcount',
+    'bitrate',
+    'language',
+    'encoding',
+)
+_FIELDS = frozenset(STATION_FIELDS)
+
+
+class RadioBrowserStation(object):
+    ''' A station of a RadioBrowser search result
+
+        It takes a fraction of the memory a dict would, since
+        its fields are slots, but it can still be used like
+        one (station['name'], station['votes'] += 1, etc.),
+        so itemgetter() can be used to sort a list of them.
+    '''
+
+    __slots__ = STATION_FIELDS
+
+    def __init__(self, *args, **kwargs):
+        for a_field, a_value in zip(STATION_FIELDS, args):
+            setattr(self, a_field, a_value)
+        for a_field in STATION_FIELDS[len(args):]:
+            setattr(self, a_field, kwargs.get(a_field, ''))
+
+    def __getitem__(self, key):
+        if key in _FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in _FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in _FIELDS
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+    def keys(self):
+        return list(STATION_FIELDS)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def as_list(self):
+        ''' Return the station's data as a list
+            (in STATION_FIELDS order) '''
+        return [getattr(self, x) for x in STATION_FIELDS]
+
+    def as_dict(self):
+        return dict(zip(STATION_FIELDS, self.as_list()))
+
+    @classmethod
+    def from_list(cls, a_list):
+        ''' Create a station out of the output of as_list() '''
+        return cls(*a_list)
@@ -46,14 +46,51 @@ def is_wide(char):
     return unicodedata.east_asian_width(char) in ('F', 'W')
 
 
+# Width of the non ASCII chars already seen. There are not that
+# many different chars in station names and titles, so it is
+# never cleared.
+_char_width = {}
+
+
+def char_width(char):
+    """char_width(unicode_char) -> integer
+
+    Return the width of unicode_char (2 for wide chars, 1 otherwise).
+    """
+    try:
+        return _char_width[char]
+    except KeyError:
+        w = _char_width[char] = 2 if is_wide(char) else 1
+        return w
+
+
+if PY3 and hasattr(str, 'isascii'):
+    def _is_ascii(text):
+        return text.isascii()
+else:
+    def _is_ascii(text):
+        try:
+            text.encode('ascii')
+        except UnicodeError:
+            return False
+        return True
+
+
 def cjklen(text):
     """cjklen(object) -> integer
 
     Return the real width of an unicode text, the len of any other type.
     """
-    if not isinstance(text, text_type):
+    if not isinstance(text, text_type) or _is_ascii(text):
         return len(text)
-    return sum(2 if is_wide(char) else 1 for char in text)
+    cache = _char_width
+    ret = 0
+    for char in text:
+        try:
+            ret += cache[char]
+        except KeyError:
+            ret += char_width(char)
+    return ret
 
 
 def cjkslices(text, index):
@@ -61,15 +98,26 @@ def cjkslices(text, index):
 
     Return the two slices of a text cut to the index.
     """
-    if not isinstance(text, text_type):
+    if not isinstance(text, text_type) or _is_ascii(text):
         return text[:index], text[index:]
-    if cjklen(text) <= index:
-        return text, u''
-    i = 1
-    # <= and i-1 to catch the last double length char of odd line
-    while cjklen(text[:i]) <= index:
-        i = i + 1
-    return text[:i-1], text[i-1:]
+    w = 0
+    for i, char in enumerate(text):
+        w += char_width(char)
+        # a double length char that does not fit
+        # goes to the second slice
+        if w > index:
+            return text[:i], text[i:]
+    return text, u''
+
+
+def cjkljust(text, width):
+    """cjkljust(object, integer) -> object
+
+    Return text cut or padded with spaces on the right,
+    so that its real width is exactly width.
+    """
+    text = cjkslices(text, width)[0]
+    return text + u' ' * (width - cjklen(text))
 
 
 class CJKWrapper(textwrap.TextWrapper):
@@ -57,6 +57,26 @@ def erase_curses_win(self, Y, X, beginY, beginX, char=' ', color=5):
     empty_win.erase()
     empty_win.refresh()
 
+def module_is_available(name):
+    ''' Return True if a module can be imported, without
+        importing it (so that it is only loaded when used) '''
+    try:
+        from importlib.util import find_spec
+    except ImportError:
+        ''' python 2 '''
+        import imp
+        try:
+            a_path = None
+            for a_name in name.split('.'):
+                a_path = [imp.find_module(a_name, a_path)[1]]
+            return True
+        except ImportError:
+            return False
+    try:
+        return find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
 def is_rasberrypi():
     ''' Try to detest rasberry pi '''
     try:
@@ -15,21 +15,21 @@ import threading
 from copy import deepcopy
 from pyradio import version, stations_updated
 
-from .browser import PyRadioStationsBrowser, probeBrowsers
-from .install import get_github_long_description
-from .common import is_rasberrypi
+from .common import is_rasberrypi, module_is_available
 from .player import pywhich
-HAS_REQUESTS = True
-try:
-    import requests
-except:
-    HAS_REQUESTS = False
+from .playlist_cache import read_playlist_cache, write_playlist_cache
+from .station_list import PyRadioStationList
+from .playlist_reader import PyRadioPlaylistReader
+from .playlist_index import playlist_index
+from .playlist_journal import JOURNAL_REMOVE, JOURNAL_INSERT, \
+    JOURNAL_MOVE, JOURNAL_SWITCH, append_to_playlist_journal, \
+    read_playlist_journal, apply_playlist_journal, \
+    remove_playlist_journal, playlist_journal_size, playlist_journal_file
+''' requests and dnspython are only imported when used
+    (by the online browser, or to download a theme) '''
+HAS_REQUESTS = module_is_available('requests')
 from .log import Log
-HAS_DNSPYTHON = True
-try:
-    from dns import resolver
-except:
-    HAS_DNSPYTHON = False
+HAS_DNSPYTHON = module_is_available('dns.resolver')
 
 logger = logging.getLogger(__name__)
 
@@ -75,7 +75,24 @@ class PyRadioStations(object):
             PLAYLIST_HAS_NAME_URL_ENCODING_BROWSER: 'PLAYLIST_HAS_NAME_URL_ENCODING_BROWSER'
         }
 
-    dirty_playlist = False
+    _dirty_playlist = False
+
+    ''' Journaled saving:
+            Edits done to a big playlist using remove_station,
+            insert_station, move_station and switch_stations
+            are kept in _journal_ops and appended to a journal
+            file when the playlist is saved, instead of
+            rewriting the whole CSV file.
+            The journal is written to the CSV file when the
+            playlist is closed, when PyRadio terminates or when
+            it grows bigger than JOURNAL_MAX_SIZE.
+        _journal_ops is None when the playlist has been
+        modified in any other way, in which case the next
+        save will rewrite the CSV file.
+    '''
+    JOURNAL_MIN_STATIONS = 1000
+    JOURNAL_MAX_SIZE = 64 * 1024
+    _journal_ops = None
 
     playlist_recovery_result = 0
 
@@ -193,6 +210,17 @@ class PyRadioStations(object):
     def internal_header_height(self, value):
         raise ValueError('property is read only')
 
+    @property
+    def dirty_playlist(self):
+        return self._dirty_playlist
+
+    @dirty_playlist.setter
+    def dirty_playlist(self, value):
+        ''' changes made outside of this class
+            cannot be journaled '''
+        self._journal_ops = None
+        self._dirty_playlist = value
+
     @property
     def online_browser(self):
         return self._online_browser
@@ -468,20 +496,7 @@ class PyRadioStations(object):
 
     def _package_stations(self):
         ''' read package stations.csv file '''
-        with open(self.root_path, 'r') as cfgfile:
-            for row in csv.reader(filter(lambda row: row[0]!='#', cfgfile), skipinitialspace=True):
-                if not row:
-                    continue
-                try:
-                    name, url = [s.strip() for s in row]
-                    yield [name, url, '', '']
-                except:
-                    try:
-                        name, url, enc = [s.strip() for s in row]
-                        yield [name, url, enc, '']
-                    except:
-                        name, url, enc, onl = [s.strip() for s in row]
-                        yield [name, url, enc, onl]
+        return PyRadioPlaylistReader(self.root_path)
 
     def integrate_playlists(self):
         ''''''
@@ -516,6 +531,9 @@ class PyRadioStations(object):
                -8  -  file not supported (from _get_playlist_abspath_from_data)
                '''
 
+        ''' closing the current playlist '''
+        self.compact_playlist_journal()
+
         ret = 0
         if self._register_to_open:
             stationFile, ret = self._get_register_filename_from_register()
@@ -528,13 +546,13 @@ class PyRadioStations(object):
             ''' returns -2, -3, -4 or -8 '''
             self.last_playlist_to_open = []
             if self._register_to_open:
-                self._reading_stations = []
+                self._reading_stations = PyRadioStationList()
                 prev_file = self.station_path
                 prev_format = self._playlist_version
                 self._read_playlist_version = self._playlist_version = self.PLAYLIST_HAS_NAME_URL_ENCODING_BROWSER
                 read_file = False
             else:
-                self.stations = []
+                self.stations = PyRadioStationList()
                 return ret
 
         if read_file:
@@ -550,30 +568,18 @@ class PyRadioStations(object):
             prev_file = self.station_path
             prev_format = self._playlist_version
             self._read_playlist_version = self._playlist_version = self.PLAYLIST_HAS_NAME_URL
-            self._reading_stations = []
-            with eval(self._open_string[self._open_string_id]) as cfgfile:
-                try:
-                    for row in csv.reader(filter(lambda row: row[0]!='#', cfgfile), skipinitialspace=True):
-                        if not row:
-                            continue
-                        try:
-                            name, url = [s.strip() for s in row]
-                            self._reading_stations.append([name, url, '', ''])
-                        except:
-                            try:
-                                name, url, enc = [s.strip() for s in row]
-                                self._reading_stations.append([name, url, enc, ''])
-                                self._read_playlist_version = self._playlist_version = self.PLAYLIST_HAS_NAME_URL_ENCODING
-                            except:
-                                name, url, enc, onl = [s.strip() for s in row]
-                                self._reading_stations.append([name, url, enc, onl])
-                                self._read_playlist_version = self._playlist_version = self.PLAYLIST_HAS_NAME_URL_ENCODING_BROWSER
-                except:
-                    self._reading_stations = []
-                    self._playlist_version = prev_format
-                    return -1
+            ''' apply the edits journaled by a previous session '''
+            self.compact_playlist_journal(stationFile)
+            self._reading_stations, version = self._read_playlist_stations(stationFile)
+            if self._reading_stations is None:
+                self._reading_stations = PyRadioStationList()
+                self._playlist_version = prev_format
+                return -1
+            self._read_playlist_version = self._playlist_version = version
 
-        self.stations = list(self._reading_stations)
+        ''' no need to copy; _reading_stations is reset
+            in set_playlist_data '''
+        self.stations = self._reading_stations
         # logger.error('DE stations\n{}\n\n'.format(self.stations))
         self.set_playlist_data(stationFile, prev_file, is_register)
         self.number_of_stations = len(self.stations)
@@ -610,6 +616,35 @@ class PyRadioStations(object):
 
         return self.number_of_stations
 
+    def _read_playlist_stations(self, stationFile):
+        ''' Read the stations of a playlist, from its sidecar
+            cache if possible, or else from the CSV file
+
+            Returns:
+                stations, playlist_version
+                    stations is a PyRadioStationList
+                None, None
+                    if the playlist is malformed
+        '''
+        use_cache = self._can_cache_playlist(stationFile)
+        if use_cache:
+            cached = read_playlist_cache(stationFile)
+            if cached:
+                return cached
+        reader = PyRadioPlaylistReader(stationFile)
+        stations = PyRadioStationList.from_stations(reader)
+        if reader.error:
+            return None, None
+        playlist_version = reader.version
+        if use_cache:
+            write_playlist_cache(stationFile, stations, playlist_version)
+        return stations, playlist_version
+
+    def _can_cache_playlist(self, stationFile):
+        ''' Registers change all the time, so only
+            real playlists get a sidecar cache file '''
+        return path.dirname(path.abspath(stationFile)) != self.registers_dir
+
     def set_playlist_data(self, stationFile, prev_file, is_register = False):
         ''' used to be part of read_playlist_file
             moved here so it can be used with station history
@@ -620,7 +655,8 @@ class PyRadioStations(object):
         self._set_playlist_elements(stationFile)
         self.previous_station_path = prev_file
         self._is_playlist_in_config_dir()
-        self.dirty_playlist = False
+        self._dirty_playlist = False
+        self._journal_ops = []
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug('read_playlist_file: Playlist version: {}'.format(self._playlist_version_to_string[self._playlist_version]))
         self.jump_tag = -1
@@ -716,9 +752,40 @@ class PyRadioStations(object):
                 logger.debug('Playlist not modified...')
             return 0
 
+        if self._journal_ops and self._can_journal_playlist(st_file):
+            if append_to_playlist_journal(st_file, self._journal_ops) == 0:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('Journaled {} playlist edits'.format(len(self._journal_ops)))
+                self._journal_ops = []
+                self._dirty_playlist = False
+                if playlist_journal_size(st_file) <= self.JOURNAL_MAX_SIZE:
+                    return 0
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('Compacting playlist journal...')
+
+        ret = self._write_playlist_file(st_file, self.stations, self._playlist_version)
+        if ret < 0:
+            return ret
+        if self._can_cache_playlist(st_file):
+            write_playlist_cache(st_file, self.stations, self._playlist_version)
+        self._dirty_playlist = False
+        self._journal_ops = [] if st_file == self.station_path else None
+        return 0
+
+    def _write_playlist_file(self, st_file, stations, playlist_version):
+        ''' Write stations to a playlist
+        Create a txt file and write stations in it.
+        Then rename it to final target (and remove
+        the playlist's journal, if it exists)
+
+        return    0: All ok
+                 -1: Error writing file
+                 -2: Error renaming file
+        '''
         st_new_file = st_file.replace('.csv', '.txt')
 
-        tmp_stations = self.stations[:]
+        ''' a copy-on-write snapshot of the stations '''
+        tmp_stations = stations[:]
         # Do not write comment about iheart.com
         #tmp_stations.reverse()
         #if self._playlist_version == self.PLAYLIST_HAS_NAME_URL:
@@ -735,7 +802,7 @@ class PyRadioStations(object):
             with eval(self._open_string[self._open_string_id].replace("'r'", "'w'").replace('stationFile','st_new_file')) as cfgfile:
                 writter = csv.writer(cfgfile)
                 for a_station in tmp_stations:
-                    writter.writerow(self._format_playlist_row(a_station))
+                    writter.writerow(self._format_playlist_row(a_station, playlist_version))
         except:
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug('Cannot open playlist file for writing,,,')
@@ -746,16 +813,68 @@ class PyRadioStations(object):
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug('Cannot rename playlist file...')
             return -2
-        self.dirty_playlist = False
+        remove_playlist_journal(st_file)
         return 0
 
-    def _format_playlist_row(self, a_row):
+    def _can_journal_playlist(self, stationFile):
+        return stationFile == self.station_path and \
+                not self.browsing_station_service and \
+                self.number_of_stations >= self.JOURNAL_MIN_STATIONS and \
+                self._can_cache_playlist(stationFile)
+
+    def _add_journal_op(self, *op):
+        ''' Keep an edit to be journaled, if possible '''
+        if self._journal_ops is not None:
+            self._journal_ops.append(op)
+
+    def compact_playlist_journal(self, stationFile=''):
+        ''' Write the journaled edits of a playlist to its CSV file
+            and remove the journal.
+
+            If stationFile is not specified, the loaded playlist is
+            compacted. The playlist is read from disk, so that any
+            unsaved edits will not be written to it.
+
+            Returns:
+                 0: All ok (or nothing to do)
+                -1: Error writing file
+                -2: Error renaming file
+        '''
+        st_file = stationFile if stationFile else self.station_path
+        if not st_file or \
+                not path.exists(playlist_journal_file(st_file)):
+            return 0
+        ops = read_playlist_journal(st_file)
+        if not ops:
+            ''' stale or empty journal '''
+            remove_playlist_journal(st_file)
+            return 0
+        stations, playlist_version = self._read_playlist_stations(st_file)
+        if stations is None:
+            return 0
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Compacting playlist journal of: "{}"'.format(st_file))
+        try:
+            apply_playlist_journal(stations, ops)
+        except:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info('Invalid playlist journal; ignoring it')
+            remove_playlist_journal(st_file)
+            return 0
+        ret = self._write_playlist_file(st_file, stations, playlist_version)
+        if ret == 0:
+            write_playlist_cache(st_file, stations, playlist_version)
+        return ret
+
+    def _format_playlist_row(self, a_row, playlist_version=None):
         ''' Return a 2-column if in old format,
             a 3-column row if has encoding, or
             a 4 column row if has online browser flag too '''
-        if self._playlist_version == self.PLAYLIST_HAS_NAME_URL_ENCODING_BROWSER:
+        if playlist_version is None:
+            playlist_version = self._playlist_version
+        if playlist_version == self.PLAYLIST_HAS_NAME_URL_ENCODING_BROWSER:
             return a_row
-        elif self._playlist_version == self.PLAYLIST_HAS_NAME_URL_ENCODING:
+        elif playlist_version == self.PLAYLIST_HAS_NAME_URL_ENCODING:
             return a_row[:-1]
         else:
             return a_row[:-2]
@@ -916,13 +1035,9 @@ class PyRadioStations(object):
             return -2
 
     def remove_station(self, target):
-        self.dirty_playlist = True
-        d = collections.deque(self.stations)
-        d.rotate(-target)
-        ret = d.popleft()
-        d.rotate(target)
-        self.stations = list(d)
-        #ret = self.stations.pop(target)
+        self._dirty_playlist = True
+        ret = self.stations.pop(target)
+        self._add_journal_op(JOURNAL_REMOVE, target)
         self.number_of_stations = len(self.stations)
         return ret, self.number_of_stations
 
@@ -936,15 +1051,9 @@ class PyRadioStations(object):
             return False, self.number_of_stations
         if station[2] == 'utf-8':
             station[2] = ''
-        if target == self.number_of_stations:
-            self.stations.append(station)
-        else:
-            d = collections.deque(self.stations)
-            d.rotate(-target)
-            d.appendleft(station)
-            d.rotate(target)
-            self.stations = list(d)
-        self.dirty_playlist = True
+        self.stations.insert(target, station)
+        self._dirty_playlist = True
+        self._add_journal_op(JOURNAL_INSERT, target, list(station))
         self.number_of_stations = len(self.stations)
         # logger.error('DE number_of_stations = {}'.format(self.number_of_stations))
         return True, self.number_of_stations
@@ -962,21 +1071,13 @@ class PyRadioStations(object):
                 self.number_of_stations == 0:
             # logger.error('DE \n\nreturning False\n\n')
             return False
-        if source < target:
-            step = 1
+        if isinstance(self.stations, PyRadioStationList):
+            self.stations.move(source, target)
         else:
-            step = 0
-        d = collections.deque(self.stations)
-        d.rotate(-source)
-        source_item = d.popleft()
-        # logger.error('DE source_item = "{}"'.format(source_item))
-        d.rotate(source)
-        d.rotate(-target)
-        d.appendleft(source_item)
-        d.rotate(target)
-        self.stations = list(d)
+            self.stations.insert(target, self.stations.pop(source))
         self.number_of_stations = len(self.stations)
-        self.dirty_playlist = True
+        self._dirty_playlist = True
+        self._add_journal_op(JOURNAL_MOVE, source, target)
         return True
 
     def switch_stations(self, source, target):
@@ -987,18 +1088,9 @@ class PyRadioStations(object):
                 target >= self.number_of_stations or \
                 self.number_of_stations == 0:
             return False, self.number_of_stations
-        target_item = self.stations[target]
-        d = collections.deque(self.stations)
-        self.stations.clear()
-        d.rotate(-source)
-        source_item = d.popleft()
-        d.appendleft(target_item)
-        d.rotate(source)
-        d.rotate(-target)
-        d.popleft()
-        d.appendleft(source_item)
-        d.rotate(target)
-        self.stations = list(d)
+        self.stations[source], self.stations[target] = \
+            self.stations[target], self.stations[source]
+        self._add_journal_op(JOURNAL_SWITCH, source, target)
         self.number_of_stations = len(self.stations)
         return True, self.number_of_stations
 
@@ -1009,21 +1101,33 @@ class PyRadioStations(object):
         self.playlists = glob.glob(path.join(self.stations_dir, '*.csv'))
 
     def read_playlists(self):
+        ''' Read the playlists (or registers) from the
+            playlist index of their directory
+
+            Each item of self.playlists is
+                [name, mtime, size, number of stations, path]
+        '''
         self.playlists = []
         self.selected_playlist = -1
+        ''' the index reads the CSV files; write any journaled
+            edits of the loaded playlist to it first, so that
+            its number of stations is up to date '''
+        self.compact_playlist_journal()
         if self._open_register_list:
-            files = glob.glob(path.join(self.registers_dir, '*.csv'))
+            entries = playlist_index(self.registers_dir).refresh()
         else:
-            files = glob.glob(path.join(self.stations_dir, '*.csv'))
-        if len(files) == 0:
+            entries = playlist_index(self.stations_dir).refresh()
+        if len(entries) == 0:
             return 0, -1
         else:
-            for a_file in files:
-                a_file_name = ''.join(path.basename(a_file).split('.')[:-1])
-                a_file_size = self._bytes_to_human(path.getsize(a_file))
-                a_file_time = ctime(path.getmtime(a_file))
-                self.playlists.append([a_file_name, a_file_time, a_file_size, a_file])
-        self.playlists.sort()
+            for an_entry in entries:
+                self.playlists.append([
+                    an_entry.name,
+                    ctime(an_entry.mtime),
+                    self._bytes_to_human(an_entry.size),
+                    an_entry.count,
+                    an_entry.path
+                ])
         ''' get already loaded playlist id '''
         for i, a_playlist in enumerate(self.playlists):
             if a_playlist[-1] == self.station_path:
@@ -1043,11 +1147,12 @@ class PyRadioStations(object):
             self.read_playlists()
         for i, a_playlist in enumerate(self.playlists):
             #if a_playlist[0] == self.station_title:
-            if a_playlist[3] == self.station_path:
+            if a_playlist[-1] == self.station_path:
                 return i
         return -1
 
     def open_browser(self, url, search_return_function, message_function):
+        from .browser import probeBrowsers
         self._online_browser = probeBrowsers(url)(
             self,
             self.default_encoding,
@@ -1146,6 +1251,7 @@ class PyRadioConfig(PyRadioStations):
     opts['conn_title'] = ['Connection Options: ', '']
     opts['connection_timeout'] = ['Connection timeout: ', '10']
     opts['force_http'] = ['Force http connections: ', False]
+    opts['warm_player'] = ['Keep mpv running: ', False]
     opts['theme_title'] = ['Theme Options', '']
     opts['theme'] = ['Theme: ', 'dark']
     opts['use_transparency'] = ['Use transparency: ', False]
@@ -1220,6 +1326,7 @@ class PyRadioConfig(PyRadioStations):
         self.default_playlist = 'stations'
         self.default_station = 'False'
         self.force_http = False
+        self.warm_player = False
         self.default_encoding = 'utf-8'
         self.connection_timeout = '10'
         self.theme = 'dark'
@@ -1377,6 +1484,15 @@ class PyRadioConfig(PyRadioStations):
         self.opts['force_http'][1] = val
         self.opts['dirty_config'][1] = True
 
+    @property
+    def warm_player(self):
+        return self.opts['warm_player'][1]
+
+    @warm_player.setter
+    def warm_player(self, val):
+        self.opts['warm_player'][1] = val
+        self.opts['dirty_config'][1] = True
+
     @property
     def use_transparency(self):
         return self.opts['use_transparency'][1]
@@ -1825,6 +1941,11 @@ class PyRadioConfig(PyRadioStations):
                     self.opts['force_http'][1] = True
                 else:
                     self.opts['force_http'][1] = False
+            elif sp[0] == 'warm_player':
+                if sp[1].lower() == 'true':
+                    self.opts['warm_player'][1] = True
+                else:
+                    self.opts['warm_player'][1] = False
             elif sp[0] in ('mpv_parameter',
                            'mplayer_parameter',
                            'vlc_parameter'):
@@ -2077,6 +2198,16 @@ connection_timeout = {6}
 # Default value: False
 force_http = {7}
 
+# Keep mpv running
+# If this is enabled and mpv is the player in use, changing
+# station while playing will not start a new mpv instance;
+# the running one will be told to play the new station
+# instead, which makes switching stations a lot faster.
+#
+# Valid values: True, true, False, false
+# Default value: False
+warm_player = {14}
+
 # Default theme
 # Hardcooded themes:
 #   dark (default) (8 colors)
@@ -2151,7 +2282,8 @@ auto_save_playlist = {13}
                     self.opts['calculated_color_factor'][1],
                     self.opts['confirm_station_deletion'][1],
                     self.opts['confirm_playlist_reload'][1],
-                    self.opts['auto_save_playlist'][1]))
+                    self.opts['auto_save_playlist'][1],
+                    self.opts['warm_player'][1]))
 
                 ''' write extra player parameters to file '''
                 first_param = True
@@ -2833,6 +2965,7 @@ class PyRadioBase16Themes(object):
 
             ret = False
             # logger.error('w_path = {}'.format(w_path))
+            import requests
             requests_response = None
             written = False
             line_num = 1
@@ -3,13 +3,14 @@ import curses
 from copy import deepcopy
 from textwrap import wrap
 import glob
-import csv
 from os import path, sep, remove
 from sys import platform
 
 from .common import *
 from .window_stack import Window_Stack_Constants
 from .cjkwrap import cjklen
+from .playlist_reader import PyRadioPlaylistReader
+from .playlist_index import playlist_index, PLAYLIST_MALFORMED
 from .config import SUPPORTED_PLAYERS
 from .encodings import *
 from .themes import *
@@ -72,6 +73,8 @@ class PyRadioConfigWindow(object):
     '|', 'Valid values: 5 - 60, 0 disables check', 'Default value: 10'])
     _help_text.append(['Most radio stations use plain old http protocol to broadcast, but some of them use https.', '|', 'If this parameter is enabled, all connections will use http; results depend on the combination of station/player.', '|', 'This value is read at program startup, use "z" to change its effect while mid-session.',
     '|', 'Default value: False'])
+    _help_text.append(['If this option is enabled and mpv is the player in use, changing station while playing will not start a new mpv instance; the running one will be told to play the new station instead, which makes switching stations a lot faster.',
+    '|', 'Default value: False'])
     _help_text.append(None)
     _help_text.append(['The theme to be used by default.', '|',
     'This is the equivalent to the -t , --theme command line option.', '|',
@@ -327,6 +330,7 @@ class PyRadioConfigWindow(object):
         self._config_options['use_transparency'][1] = False
         self._config_options['calculated_color_factor'][1] = '0'
         self._config_options['force_http'][1] = False
+        self._config_options['warm_player'][1] = False
         self._toggle_transparency_function(changed_from_config_window=True, force_value=False)
         self._config_options['playlist_manngement_title'][1] = ''
         self._config_options['confirm_station_deletion'][1] = True
@@ -558,7 +562,8 @@ class PyRadioConfigWindow(object):
                     sel == 'confirm_playlist_reload' or \
                     sel == 'enable_mouse' or \
                     sel == 'auto_save_playlist' or \
-                    sel == 'force_http':
+                    sel == 'force_http' or \
+                    sel == 'warm_player':
                 self._config_options[sel][1] = not self._config_options[sel][1]
                 # # if sel == 'open_last_playlist':
                 # #     if self._config_options[sel][1]:
@@ -2193,16 +2198,13 @@ class PyRadioSelectPlaylist(object):
 
     def _read_items(self):
         self._items = []
-        self._items = glob.glob(path.join(self._config_path, '*.csv'))
-        if len(self._items) > 0:
-            self._items.sort()
+        self._items = [x.path for x in playlist_index(self._config_path).refresh()]
         if self._include_registers:
             self._registers_path = path.join(self._config_path, '.registers')
             if platform == 'win32':
                 self._registers_path.replace('.reg', '_reg')
-            r_items = glob.glob(path.join(self._registers_path, '*.csv'))
+            r_items = [x.path for x in playlist_index(self._registers_path).refresh()]
             if r_items:
-                r_items.sort()
                 self._items.extend(r_items)
         if len(self._items) == 0:
             return 0, -1
@@ -2272,28 +2274,11 @@ class PyRadioSelectPlaylist(object):
             return 0, ret
 
         stationFile = path.join(self._config_path, self._items[self._selected_playlist_id] + '.csv')
-        self._select_playlist_error = 0
-        with open(stationFile, 'r') as cfgfile:
-            try:
-                for row in csv.reader(filter(lambda row: row[0] != '#', cfgfile), skipinitialspace=True):
-                    if not row:
-                        continue
-                    try:
-                        name, url = [s.strip() for s in row]
-                        self._select_playlist_error = 1
-                    except ValueError:
-                        try:
-                            name, url, enc = [s.strip() for s in row]
-                            self._select_playlist_error = 1
-                        except ValueError:
-                            try:
-                                name, url, enc, br = [s.strip() for s in row]
-                                self._select_playlist_error = 1
-                            except ValueError:
-                                self._select_playlist_error = -1
-                                break
-            except:
-                self._select_playlist_error = -1
+        an_entry = playlist_index(self._config_path).get(stationFile)
+        if an_entry is None or an_entry.version == PLAYLIST_MALFORMED:
+            self._select_playlist_error = -1
+        else:
+            self._select_playlist_error = 1 if an_entry.count else 0
         if self._select_playlist_error == -1 or \
                 self._select_playlist_error == 0:
             self.print_select_playlist_error()
@@ -2530,21 +2515,9 @@ class PyRadioSelectStation(PyRadioSelectPlaylist):
         self._items = []
         stationFile = path.join(self._config_path, self._default_playlist + '.csv')
         if path.exists(stationFile):
-            with open(stationFile, 'r') as cfgfile:
-                try:
-                    for row in csv.reader(filter(lambda row: row[0] != '#', cfgfile), skipinitialspace=True):
-                        if not row:
-                            continue
-                        try:
-                            name, _ = [s.strip() for s in row]
-                        except ValueError:
-                            try:
-                                name, _, _ = [s.strip() for s in row]
-                            except ValueError:
-                                name, _, _, _ = [s.strip() for s in row]
-                        self._items.append(name)
-                except:
-                    pass
+            ''' like before, keep the stations read
+                up to a malformed line (if any) '''
+            self._items = [x.name for x in PyRadioPlaylistReader(stationFile)]
             self._items.reverse()
         self._items.append('Play a Random station on startup')
         self._items.append('Do not play a station on startup')
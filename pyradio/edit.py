@@ -3,7 +3,6 @@ import curses
 import curses.ascii
 from time import sleep
 import logging
-from sys import version_info
 from os import path, remove
 from string import punctuation as string_punctuation
 try:
@@ -13,6 +12,8 @@ except:
     from urlparse import urlparse
 from .simple_curses_widgets import SimpleCursesLineEdit, SimpleCursesCheckBox, SimpleCursesHorizontalPushButtons, DisabledWidget
 from .log import Log
+from .playlist_cache import remove_playlist_cache
+from .search_index import PyRadioSearchIndex
 
 import locale
 locale.setlocale(locale.LC_ALL, '')    # set your locale
@@ -29,10 +30,9 @@ class PyRadioSearch(SimpleCursesLineEdit):
             key_up_function_handler=self._get_history_previous,
             key_down_function_handler=self._get_history_next,
             **kwargs)
-        if version_info < (3, 0):
-            self._range_command = 'xrange'
-        else:
-            self._range_command = 'range'
+        ''' the search index, the list it was built
+            for and the list's version at the time '''
+        self._index = self._index_list = self._index_version = None
 
     def show(self, parent_win, repaint=False):
         if repaint:
@@ -100,17 +100,11 @@ class PyRadioSearch(SimpleCursesLineEdit):
                     stop=stop
                 )
 
-            for n in eval(self._range_command)(start, len(a_list)):
-                if active_search_term.lower() in self._get_string(a_list[n]):
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug('forward search term "{0}" found at {1}'.format(self.string, n))
-                    return n
-            """ if not found start from list top """
-            for n in eval(self._range_command)(0, start):
-                if active_search_term.lower() in self._get_string(a_list[n]):
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug('forward search term "{0}" found at {1}'.format(self.string, n))
-                    return n
+            n = self._find(a_list, active_search_term.lower(), start, forward=True)
+            if n is not None:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('forward search term "{0}" found at {1}'.format(self.string, n))
+                return n
             """ if not found return None """
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug('forward search term "{}" not found'.format(self.string))
@@ -135,17 +129,11 @@ class PyRadioSearch(SimpleCursesLineEdit):
                     stop=stop
                 )
 
-            for n in eval(self._range_command)(start, -1, -1):
-                if active_search_term.lower() in self._get_string(a_list[n]):
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug('backward search term "{0}" found at {1}'.format(self.string, n))
-                    return n
-            """ if not found start from list end """
-            for n in eval(self._range_command)(len(a_list) - 1, start, -1):
-                if active_search_term.lower() in self._get_string(a_list[n]):
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug('backward search term "{0}" found at {1}'.format(self.string, n))
-                    return n
+            n = self._find(a_list, active_search_term.lower(), start, forward=False)
+            if n is not None:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('backward search term "{0}" found at {1}'.format(self.string, n))
+                return n
             """ if not found return None """
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug('backward search term "{}" not found'.format(self.string))
@@ -165,6 +153,46 @@ class PyRadioSearch(SimpleCursesLineEdit):
         else:
             return item[0].lower()
 
+    def _get_index(self, a_list, rebuild=False):
+        ''' Return the search index of a_list, building it if
+            a_list is not the list it was built for, or if the
+            list has changed since (PyRadioStationList keeps a
+            version number; other lists, i.e. themes and playlists,
+            are short and cannot tell, so it is always rebuilt) '''
+        version = getattr(a_list, 'version', None)
+        if rebuild or \
+                version is None or \
+                self._index is None or \
+                self._index_list is not a_list or \
+                self._index_version != version or \
+                len(self._index) != len(a_list):
+            self._index = PyRadioSearchIndex(self._get_string(x) for x in a_list)
+            self._index_list = a_list
+            self._index_version = version
+        return self._index
+
+    def _find(self, a_list, term, start, forward=True):
+        ''' Find the next (or previous) item of a_list which
+            contains term, starting at start and wrapping around '''
+        if not a_list:
+            return None
+        if forward and start >= len(a_list):
+            start = 0
+        elif not forward and start < 0:
+            start = len(a_list) - 1
+        else:
+            start = min(max(start, 0), len(a_list) - 1)
+        for rebuild in (False, True):
+            index = self._get_index(a_list, rebuild)
+            if forward:
+                n = index.find_next(term, start)
+            else:
+                n = index.find_previous(term, start)
+            if n is None or term in self._get_string(a_list[n]):
+                return n
+            ''' an item has been changed in place; start over '''
+        return n
+
 
 class PyRadioEditor(object):
     """ PyRadio stations editor """
@@ -1078,6 +1106,7 @@ class PyRadioRenameFile(object):
                     remove(self.filename)
                 except:
                     return -3
+                remove_playlist_cache(self.filename)
         return 1
 
     def _get_result(self, ret):
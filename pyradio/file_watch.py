@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+import os
+import struct
+import select
+import threading
+import logging
+from os import path
+from sys import platform
+from time import sleep, time
+
+logger = logging.getLogger(__name__)
+
+''' inotify constants (from <sys/inotify.h>) '''
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+    IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT_HEADER = struct.Struct('iIII')
+
+_libc = None
+if platform.startswith('linux'):
+    try:
+        import ctypes
+        import ctypes.util
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        _libc.inotify_init1.argtypes = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except:
+        _libc = None
+
+
+def inotify_available():
+    return _libc is not None
+
+
+def _file_stat(a_file):
+    ''' Return (mtime, size) of a file, or None if it does not exist '''
+    try:
+        st = os.stat(a_file)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+class PyRadioFileWatcher(object):
+    ''' Watch a file and call a function when it changes
+
+        On Linux, inotify is used (through ctypes): the
+        directory of the file is watched, so that the file
+        being replaced, removed or created is also detected,
+        and the thread sleeps until something happens in it.
+
+        Elsewhere (or if inotify cannot be used), the file's
+        mtime and size are checked every poll_interval seconds.
+
+        A burst of writes results in a single call of the
+        function, after the file has not been touched for
+        debounce seconds. The function is called from the
+        watcher's thread, and only if the file exists.
+
+        Usage:
+            watcher = PyRadioFileWatcher(a_file, a_function)
+            watcher.start()
+            ...
+            watcher.stop()
+    '''
+
+    def __init__(self,
+                 a_file,
+                 callback,
+                 debounce=0.3,
+                 poll_interval=0.75,
+                 use_inotify=True):
+        self.file = path.abspath(a_file)
+        self.callback = callback
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._use_inotify = use_inotify and inotify_available()
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake_r = self._wake_w = None
+
+    @property
+    def using_inotify(self):
+        return self._use_inotify
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        fd = -1
+        if self._use_inotify:
+            fd = self._inotify_init()
+            if fd < 0:
+                self._use_inotify = False
+        if self._use_inotify:
+            self._wake_r, self._wake_w = os.pipe()
+            target = self._inotify_loop
+            args = (fd, )
+        else:
+            target = self._poll_loop
+            args = ()
+        self._thread = threading.Thread(target=target, args=args)
+        self._thread.daemon = True
+        self._thread.start()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('File watch thread started ({0}) on: {1}'.format(
+                'inotify' if self._use_inotify else 'polling', self.file))
+
+    def stop(self):
+        ''' Stop watching and wait for the thread to exit '''
+        if self._thread is None:
+            return
+        self._stop.set()
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b'x')
+            except OSError:
+                pass
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        for fd in (self._wake_r, self._wake_w):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._wake_r = self._wake_w = None
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('File watch thread stopped on: {}'.format(self.file))
+
+    def _inotify_init(self):
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return -1
+        a_dir = path.dirname(self.file)
+        try:
+            a_dir = a_dir.encode('utf-8')
+        except UnicodeError:
+            pass
+        if _libc.inotify_add_watch(fd, a_dir, _WATCH_MASK) < 0:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('inotify: cannot watch "{}"; polling instead'.format(path.dirname(self.file)))
+            os.close(fd)
+            return -1
+        return fd
+
+    def _read_events(self, fd):
+        ''' Return True if any of the pending events
+            is about the watched file (or its directory) '''
+        ret = False
+        name = path.basename(self.file)
+        while True:
+            try:
+                data = os.read(fd, 4096)
+            except OSError:
+                return ret
+            if not data:
+                return ret
+            i = 0
+            while i + _EVENT_HEADER.size <= len(data):
+                wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, i)
+                i += _EVENT_HEADER.size
+                a_name = data[i:i+length].rstrip(b'\0')
+                i += length
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    ret = True
+                else:
+                    try:
+                        if a_name.decode('utf-8', 'replace') == name:
+                            ret = True
+                    except:
+                        pass
+
+    def _inotify_loop(self, fd):
+        old_stat = _file_stat(self.file)
+        try:
+            while not self._stop.is_set():
+                ''' sleep until something happens '''
+                r, _, _ = select.select([fd, self._wake_r], [], [])
+                if self._stop.is_set():
+                    break
+                if not self._read_events(fd):
+                    continue
+                ''' wait for the writes to settle '''
+                while not self._stop.is_set():
+                    r, _, _ = select.select([fd, self._wake_r], [], [], self.debounce)
+                    if not r:
+                        break
+                    if self._stop.is_set():
+                        break
+                    self._read_events(fd)
+                if self._stop.is_set():
+                    break
+                old_stat = self._check(old_stat)
+        finally:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _poll_loop(self):
+        old_stat = _file_stat(self.file)
+        while not self._stop.wait(self.poll_interval):
+            new_stat = _file_stat(self.file)
+            if new_stat is None or new_stat == old_stat:
+                continue
+            ''' wait for the writes to settle '''
+            settled = time() + self.debounce
+            while not self._stop.wait(max(0, settled - time())):
+                a_stat = _file_stat(self.file)
+                if a_stat == new_stat:
+                    break
+                new_stat = a_stat
+                settled = time() + self.debounce
+            if self._stop.is_set():
+                break
+            old_stat = self._check(old_stat)
+
+    def _check(self, old_stat):
+        ''' Call the callback if the file has changed;
+            return its current stat '''
+        new_stat = _file_stat(self.file)
+        if new_stat is not None and new_stat != old_stat:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Watched file changed: {}'.format(self.file))
+            try:
+                self.callback()
+            except:
+                if logger.isEnabledFor(logging.ERROR):
+                    logger.error('File watch callback failed for: {}'.format(self.file))
+        return new_stat
@@ -3,6 +3,7 @@ import curses
 from sys import version_info, platform, stdout
 import logging
 import threading
+from time import time, sleep
 from .common import player_start_stop_token
 from .cjkwrap import cjklen, PY3
 if not PY3:
@@ -36,10 +37,21 @@ class Log(object):
 
     _show_status_updates = False
 
+    ''' minimum time between status bar updates (seconds) '''
+    MIN_REFRESH_INTERVAL = 0.05
+
+    ''' seconds stop() waits for the writer thread '''
+    STOP_TIMEOUT = 1
+
+    _queue = []
+    _writer = _writer_cond = None
+    _last_refresh = 0
+    _stopped = False
 
     def __init__(self, config):
         self._cnf = config
         self.width = None
+        self._queue = []
 
     def setScreen(self, cursesScreen):
         self.cursesScreen = cursesScreen
@@ -64,165 +76,246 @@ class Log(object):
               counter=None,
               help_msg=False,
               error_msg=False,
+              reset_help_msg=False,
               notify_function=None):
+        ''' Queue an update of the status bar
+
+            The status bar is drawn by a single writer thread;
+            updates queued while it is busy (or before
+            MIN_REFRESH_INTERVAL has passed since the last one)
+            are coalesced: the latest msg, suffix and counter win.
+            Player start / stop messages are never merged, so
+            they are processed in the order they were written.
+
+            To clear the counter, write counter='0'; to stop
+            displaying "Press ? for help", use reset_help_msg.
+            Log's state should only be changed through here, since
+            an update still in the queue would override it.
+        '''
         if self.cursesScreen:
             with self.lock:
-                if msg:
-                    if player_start_stop_token[1] in msg or \
-                            player_start_stop_token[2] in msg:\
-                        self._player_stopped += 1
-                    elif msg.startswith(player_start_stop_token[0]):
-                        self._player_stopped = 0
-                if msg and self._player_stopped > 1:
-                    ''' Refuse to print anything if "Playback stopped"
-                        was the last message printed
-                    '''
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug('Refusing to show message; player is stopped: "{}"'.format(msg))
-                    # return
-                elif self._player_stopped == 1:
-                    self._player_stopped = 2
-                if self.asked_to_stop:
-                    self.asked_to_stop = False
-                    self.counter = None
-                    self._player_stopped = 0
+                if self._stopped:
                     return
-                #if logger.isEnabledFor(logging.DEBUG):
-                #    logger.debug('before ----------------------------')
-                #    logger.debug('msg = "{}"'.format(msg))
-                #    logger.debug('self.msg = "{}"'.format(self.msg))
-                #    logger.debug('suffix = "{}"'.format(suffix))
-                #    logger.debug('self.suffix = "{}"'.format(self.suffix))
-                #    logger.debug('counter = "{}"'.format(counter))
-                #    logger.debug('self.counter = "{}"'.format(self.counter))
-
-                first_print = True
-                if msg is not None:
-                    self.msg = msg
-                if suffix is not None:
-                    self.suffix = suffix
-                if counter is not None:
-                    self.counter = counter
-                self.error_msg = True if error_msg else False
-
-                #if logger.isEnabledFor(logging.DEBUG):
-                #    logger.debug('after ----------------------------')
-                #    logger.debug('msg = "{}"'.format(msg))
-                #    logger.debug('self.msg = "{}"'.format(self.msg))
-                #    logger.debug('suffix = "{}"'.format(suffix))
-                #    logger.debug('self.suffix = "{}"'.format(self.suffix))
-                #    logger.debug('counter = "{}"'.format(counter))
-                #    logger.debug('self.counter = "{}"'.format(self.counter))
-
+                is_token = self._is_start_stop_message(msg)
+                if self._queue and \
+                        not is_token and \
+                        not self._queue[-1]['token']:
+                    ''' supersede the last queued update '''
+                    entry = self._queue[-1]
+                    if msg is not None:
+                        entry['msg'] = msg
+                    if suffix is not None:
+                        entry['suffix'] = suffix
+                    if counter is not None:
+                        entry['counter'] = counter
+                    if reset_help_msg:
+                        entry['reset_help_msg'] = True
+                        entry['help_msg'] = False
+                    entry['help_msg'] = entry['help_msg'] or help_msg
+                    entry['error_msg'] = error_msg
+                else:
+                    self._queue.append({
+                        'msg': msg,
+                        'suffix': suffix,
+                        'counter': counter,
+                        'help_msg': help_msg,
+                        'error_msg': error_msg,
+                        'reset_help_msg': reset_help_msg,
+                        'token': is_token
+                    })
+                if self._writer is None:
+                    self._writer_cond = threading.Condition(self.lock)
+                    self._writer = threading.Thread(target=self._writer_loop)
+                    self._writer.daemon = True
+                    self._writer.start()
+                else:
+                    self._writer_cond.notify()
+
+    def stop(self):
+        ''' Stop the writer thread; updates still in the queue
+            are discarded and later ones are ignored
+
+            Must be called before curses is terminated, so that
+            nothing gets drawn after that.
+        '''
+        with self.lock:
+            self._stopped = True
+            self._queue = []
+            writer = self._writer
+            if writer is not None:
+                self._writer_cond.notify()
+        if writer is not None and \
+                writer is not threading.current_thread():
+            writer.join(self.STOP_TIMEOUT)
+
+    def _is_start_stop_message(self, msg):
+        if msg:
+            return player_start_stop_token[1] in msg or \
+                player_start_stop_token[2] in msg or \
+                msg.startswith(player_start_stop_token[0])
+        return False
+
+    def _writer_loop(self):
+        while True:
+            with self.lock:
+                while not self._queue and not self._stopped:
+                    self._writer_cond.wait()
+                if self._stopped:
+                    return
+                delay = self._last_refresh + self.MIN_REFRESH_INTERVAL - time()
+            if delay > 0:
+                ''' let more updates come in and coalesce '''
+                sleep(delay)
+            with self.lock:
+                if self._stopped:
+                    return
+                queue = self._queue
+                self._queue = []
+                help_msg = False
+                for entry in queue:
+                    if self.asked_to_stop:
+                        break
+                    self._apply(entry)
+                    help_msg = help_msg or entry['help_msg']
                 if self.asked_to_stop:
                     self.asked_to_stop = False
                     self.counter = None
                     self._player_stopped = 0
-                    return
-                ''' update main message '''
-                if self.msg:
-                    self.cursesScreen.erase()
-                    d_msg = ''
+                    continue
+                try:
+                    self._display(help_msg)
+                except:
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug('Error updating the Status Bar')
+                self._last_refresh = time()
+
+    def _apply(self, entry):
+        ''' Update the status bar state with a queued update '''
+        msg = entry['msg']
+        if msg:
+            if player_start_stop_token[1] in msg or \
+                    player_start_stop_token[2] in msg:\
+                self._player_stopped += 1
+            elif msg.startswith(player_start_stop_token[0]):
+                self._player_stopped = 0
+        if msg and self._player_stopped > 1:
+            ''' Refuse to print anything if "Playback stopped"
+                was the last message printed
+            '''
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Refusing to show message; player is stopped: "{}"'.format(msg))
+            # return
+        elif self._player_stopped == 1:
+            self._player_stopped = 2
+
+        if msg is not None:
+            self.msg = msg
+            if msg:
+                ''' log every title, even if it is superseded
+                    before it gets displayed '''
+                try:
+                    self._write_title_to_log(msg.strip().replace('\r', '').replace('\n', ''))
+                except:
+                    pass
+        if entry['suffix'] is not None:
+            self.suffix = entry['suffix']
+        if entry['counter'] is not None:
+            self.counter = entry['counter']
+        if entry['reset_help_msg']:
+            self.display_help_message = False
+        self.error_msg = True if entry['error_msg'] else False
+
+    def _display(self, help_msg):
+        ''' Draw the status bar; called by the writer thread '''
+        first_print = True
+        ''' update main message '''
+        if self.msg:
+            self.cursesScreen.erase()
+            d_msg = ''
+            try:
+                d_msg = self.msg.strip()[0: self.width].replace('\r', '').replace('\n', '')
+                self.cursesScreen.addstr(0, 1, d_msg)
+            except:
+                try:
+                    d_msg = self.msg.encode('utf-8', 'replace').strip()[0: self.width].replace('\r', '').replace('\n', '')
+                    self.cursesScreen.addstr(0, 1, d_msg)
+                except:
+                    pass
+                    # if logger.isEnabledFor(logging.ERROR):
+                    #     logger.error('Error updating the Status Bar')
+            self.set_win_title(d_msg)
+            if self._show_status_updates:
+                if logger.isEnabledFor(logging.DEBUG):
                     try:
-                        d_msg = self.msg.strip()[0: self.width].replace('\r', '').replace('\n', '')
-                        self.cursesScreen.addstr(0, 1, d_msg)
+                        logger.debug('Status: "{}"'.format(self.msg))
                     except:
-                        try:
-                            d_msg = self.msg.encode('utf-8', 'replace').strip()[0: self.width].replace('\r', '').replace('\n', '')
-                            self.cursesScreen.addstr(0, 1, d_msg)
-                        except:
-                            pass
-                            # if logger.isEnabledFor(logging.ERROR):
-                            #     logger.error('Error updating the Status Bar')
-                    self.set_win_title(d_msg)
-                    self._write_title_to_log(d_msg)
-                    if self._show_status_updates:
-                        if logger.isEnabledFor(logging.DEBUG):
-                            try:
-                                logger.debug('Status: "{}"'.format(self.msg))
-                            except:
-                                pass
+                        pass
 
-                self._active_width = self.width
+        self._active_width = self.width
 
-                if self.asked_to_stop:
-                    self.asked_to_stop = False
-                    self.counter = None
-                    self._player_stopped = 0
-                    return
-                ''' display suffix '''
+        ''' display suffix '''
+        if self.suffix:
+            d_msg = ' [' + self.suffix + ']'
+            try:
+                self.cursesScreen.addstr(
+                    0, self._active_width - len(d_msg),
+                    d_msg + ' ')
+            except:
+                pass
+            self.cursesScreen.chgat(
+                0, self._active_width - len(d_msg) + 1,
+                len(d_msg) - 1,
+                curses.color_pair(1))
+            first_print = self._do_i_print_last_char(first_print)
+            self._active_width -= len(d_msg)
+        if self._show_status_updates:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Suffix: {}'.format(self.suffix))
+
+        ''' display counter '''
+        if self.counter:
+            if self.counter == '0':
+                self.counter = None
+            if self.counter:
                 if self.suffix:
-                    d_msg = ' [' + self.suffix + ']'
-                    try:
-                        self.cursesScreen.addstr(
-                            0, self._active_width - len(d_msg),
-                            d_msg + ' ')
-                    except:
-                        pass
-                    self.cursesScreen.chgat(
-                        0, self._active_width - len(d_msg) + 1,
-                        len(d_msg) - 1,
-                        curses.color_pair(1))
-                    first_print = self._do_i_print_last_char(first_print)
-                    self.cursesScreen.refresh()
-                    self._active_width -= len(d_msg)
-                if self._show_status_updates:
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug('Suffix: {}'.format(self.suffix))
-
-                ''' display counter '''
-                if self.counter:
-                    if self.counter == '0':
-                        self.counter = None
-                    if self.counter:
-                        if self.suffix:
-                            self._active_width += 1
-                        d_msg = ' [' + self.counter + ']'
-                        self.cursesScreen.addstr(
-                            0,
-                            self._active_width - len(d_msg),
-                            d_msg)
-                        first_print = self._do_i_print_last_char(first_print)
-                        self.cursesScreen.refresh()
-                        self._active_width -= len(d_msg)
-                        self.display_help_message = False
+                    self._active_width += 1
+                d_msg = ' [' + self.counter + ']'
+                self.cursesScreen.addstr(
+                    0,
+                    self._active_width - len(d_msg),
+                    d_msg)
+                first_print = self._do_i_print_last_char(first_print)
+                self._active_width -= len(d_msg)
+                self.display_help_message = False
+        if self._show_status_updates:
+            if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('Counter: {}'.format(self.counter))
+
+        ''' display press ? '''
+        if help_msg or self.display_help_message:
+            if not self.error_msg:
+                self.counter = None
+                suffix_string = ' Press ? for help'
+                try:
+                    self.cursesScreen.addstr(
+                        0,
+                        self._active_width - len(suffix_string),
+                        suffix_string)
+                except:
+                    pass
+                self.display_help_message = True
                 if self._show_status_updates:
                     if logger.isEnabledFor(logging.DEBUG):
-                            logger.debug('Counter: {}'.format(self.counter))
-
-                if self.asked_to_stop:
-                    self.asked_to_stop = False
-                    self.counter = None
-                    return
-                ''' display press ? '''
-                if help_msg or self.display_help_message:
-                    if not self.error_msg:
-                        self.counter = None
-                        suffix_string = ' Press ? for help'
-                        try:
-                            self.cursesScreen.addstr(
-                                0,
-                                self._active_width - len(suffix_string),
-                                suffix_string)
-                        except:
-                            pass
-                        self.cursesScreen.refresh()
-                        self.display_help_message = True
-                        if self._show_status_updates:
-                            if logger.isEnabledFor(logging.DEBUG):
-                                logger.debug('Press ? for help: yes')
-                else:
-                    if self._show_status_updates:
-                        if logger.isEnabledFor(logging.DEBUG):
-                            logger.debug('Press ? for help: no')
-
-                if self.asked_to_stop:
-                    self.asked_to_stop = False
-                    self.counter = None
-                    self._player_stopped = 0
-                    return
-                self.cursesScreen.refresh()
-                # logger.error('DE _player_stopped = {}'.format(self._player_stopped))
+                        logger.debug('Press ? for help: yes')
+        else:
+            if self._show_status_updates:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('Press ? for help: no')
+
+        ''' a single screen update for the whole status bar '''
+        self.cursesScreen.noutrefresh()
+        curses.doupdate()
+        # logger.error('DE _player_stopped = {}'.format(self._player_stopped))
 
     def readline(self):
         pass
@@ -8,9 +8,11 @@ from sys import platform, version_info
 from contextlib import contextmanager
 from platform import system
 
-from .radio import PyRadio
+''' The TUI (radio) and the installer (install) are imported
+    when needed, so that command line actions (i.e. -ls, -l,
+    -V) do not have to load them, or requests, dnspython etc.
+    Run devel/startup_time to check how long they take. '''
 from .config import PyRadioConfig, SUPPORTED_PLAYERS
-from .install import PyRadioUpdate, PyRadioUpdateOnWindows, is_pyradio_user_installed, version_string_to_list, get_github_tag
 from .cjkwrap import cjklen, cjkslices, fill
 from .log import Log
 
@@ -25,6 +27,10 @@ def pyradio_config_file():
     try:
         yield cf
     finally:
+        try:
+            cf.compact_playlist_journal()
+        except:
+            pass
         try:
             ret, lfile = cf.remove_session_lock_file()
             if cf.force_to_remove_lock_file:
@@ -90,6 +96,8 @@ def shell():
                         help='List of available playlists in config dir.')
     parser.add_argument('-l', '--list', action='store_true',
                         help='List of available stations in a playlist.')
+    parser.add_argument('-cp', '--check-playlist', default=None, metavar='PLAYLIST',
+                        help='Check which stations of a playlist (name or number, as with -s) are dead or slow.')
     parser.add_argument('-t', '--theme', default='', help='Use specified theme.')
     parser.add_argument('--show-themes', action='store_true',
                        help='Show Internal and System Themes names.')
@@ -204,6 +212,7 @@ def shell():
 
         package = 0
         if args.uninstall or args.update:
+            from .install import PyRadioUpdate, PyRadioUpdateOnWindows, version_string_to_list, get_github_tag
             if args.sng_master:
                 package = 1
             elif args.sng_devel:
@@ -359,11 +368,14 @@ def shell():
         if args.use_player != '':
             requested_player = args.use_player
 
+        if args.check_playlist is not None:
+            args.stations = args.check_playlist
+
         if args.list is False and args.add is False:
             print('Reading playlist...')
         sys.stdout.flush()
         is_last_playlist = False
-        if pyradio_config.open_last_playlist:
+        if pyradio_config.open_last_playlist and args.check_playlist is None:
             last_playlist = pyradio_config.get_last_playlist()
             if last_playlist:
                 args.stations = last_playlist
@@ -394,6 +406,10 @@ def shell():
                 print_playlist_selection_error(args.stations, pyradio_config, ret)
             sys.exit()
 
+        if args.check_playlist is not None:
+            check_playlist(pyradio_config)
+            sys.exit()
+
         if args.list:
             m_len, header_format_string, format_string = get_format_string(pyradio_config.stations)
             header_string = header_format_string.format('[Name]','[URL]','[Encoding]')
@@ -454,6 +470,7 @@ def shell():
             theme_to_use = pyradio_config.theme
 
         # Starts the radio TUI.
+        from .radio import PyRadio
         pyradio = PyRadio(
             pyradio_config,
             play=args.play,
@@ -501,6 +518,7 @@ def shell():
                 install_player()
 
             elif pyradio_config.PROGRAM_UPDATE:
+                from .install import PyRadioUpdate, PyRadioUpdateOnWindows, is_pyradio_user_installed
                 if platform.startswith('win'):
                     upd = PyRadioUpdateOnWindows()
                     upd.update_or_uninstall_on_windows(mode='update-open')
@@ -600,6 +618,51 @@ def get_format_string(stations):
     header_format_string = '{0:' + str(len0+num+2) + '.' + str(len0+num+2) + 's} | {1:' + str(len1) + '.' + str(len1) + 's} | {2}'
     return len0, header_format_string, format_string
 
+def check_playlist(cnf):
+    ''' Check the stations of the loaded playlist and print
+        the result; the results are also saved, so that dead
+        and slow stations are marked when the playlist is
+        opened '''
+    from .station_check import PyRadioStationChecker
+
+    def progress(done, total):
+        if sys.stdout.isatty():
+            sys.stdout.write('\rChecking stations: {0}/{1}'.format(done, total))
+            sys.stdout.flush()
+
+    stations = cnf.stations
+    checker = PyRadioStationChecker(
+        [x[1] for x in stations],
+        config_dir=cnf.stations_dir,
+        progress_function=progress
+    )
+    checker.start()
+    try:
+        results = checker.wait()
+    except KeyboardInterrupt:
+        checker.stop()
+        print('\nCheck interrupted...')
+        sys.exit(1)
+    if sys.stdout.isatty():
+        sys.stdout.write('\r' + ' ' * 40 + '\r')
+
+    num = len(str(len(stations)))
+    print('{0} {1:6} {2:>8} {3:6} {4:>7}  {5}'.format(
+        ' ' * num, 'Status', 'Latency', 'Codec', 'Bitrate', 'Name'))
+    counts = {'ok': 0, 'slow': 0, 'dead': 0}
+    for i, (a_station, res) in enumerate(zip(stations, results)):
+        counts[res['status']] += 1
+        latency = '' if res['latency'] is None else '{}ms'.format(res['latency'])
+        bitrate = res['bitrate'] + 'k' if res['bitrate'] else ''
+        line = '{0} {1:6} {2:>8} {3:6.6} {4:>7}  {5}'.format(
+            str(i + 1).rjust(num), res['status'], latency,
+            res['codec'], bitrate, a_station[0])
+        if res['error']:
+            line += ' ({})'.format(res['error'])
+        print(line)
+    print('\n{0} stations checked in {1:.1f}s: {2} ok, {3} slow, {4} dead'.format(
+        len(stations), checker.elapsed, counts['ok'], counts['slow'], counts['dead']))
+
 def pad_string(a_string, width):
     st_len = cjklen(a_string)
     if st_len > width:
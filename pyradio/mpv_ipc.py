@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+import json
+import socket
+import threading
+import logging
+from sys import version_info
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+logger = logging.getLogger(__name__)
+
+''' request ids used by PyRadio's predefined mpv commands are
+    below this one, so that they never clash with the ones
+    assigned by MpvIpcClient '''
+FIRST_REQUEST_ID = 10000
+
+
+class MpvIpcFuture(object):
+    ''' The (future) response of an mpv command '''
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.line = b''
+        self.response = None
+
+    def set_result(self, line, response):
+        self.line = line
+        self.response = response
+        self._event.set()
+
+    def result(self, timeout=None):
+        ''' Wait for the response and return it (the decoded
+            JSON object), or None on timeout or disconnection '''
+        self._event.wait(timeout)
+        return self.response
+
+    def done(self):
+        return self._event.is_set()
+
+
+class MpvIpcClient(object):
+    ''' A long lived connection to mpv's JSON IPC server
+
+        A reader thread splits what mpv sends into lines (one
+        JSON object each, even if they arrive in pieces) and:
+            - hands each command response to the MpvIpcFuture
+              of the command, matching it by its request_id
+            - puts everything else (events and responses to
+              commands sent with send()) to the queue of
+              every subscriber
+
+        When the connection is lost, b'' is put to the
+        subscribers' queues and the pending futures get a
+        None response.
+
+        Only unix domain sockets are supported.
+    '''
+
+    def __init__(self, address):
+        self.address = address
+        self._sock = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = {}
+        self._subscribers = []
+        self._next_id = FIRST_REQUEST_ID
+        self._thread = None
+        self.connected = False
+
+    def connect(self):
+        ''' Connect to mpv; return True on success '''
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.address)
+        except:
+            sock.close()
+            return False
+        self._sock = sock
+        self.connected = True
+        self._thread = threading.Thread(target=self._read_loop)
+        self._thread.daemon = True
+        self._thread.start()
+        return True
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except:
+                pass
+            try:
+                self._sock.close()
+            except:
+                pass
+        self._disconnected()
+
+    def subscribe(self):
+        ''' Return a queue to which everything mpv sends,
+            except responses to request(), will be put '''
+        a_queue = queue.Queue()
+        with self._lock:
+            self._subscribers.append(a_queue)
+        return a_queue
+
+    def unsubscribe(self, a_queue):
+        with self._lock:
+            try:
+                self._subscribers.remove(a_queue)
+            except ValueError:
+                pass
+
+    def send(self, message):
+        ''' Send a message (bytes, a JSON line) without waiting
+            for its response; return True on success '''
+        if not self.connected:
+            return False
+        try:
+            with self._write_lock:
+                self._sock.sendall(message)
+            return True
+        except:
+            self.close()
+            return False
+
+    def request(self, message):
+        ''' Send a command and return an MpvIpcFuture for its
+            response
+
+            message is either a JSON line (bytes), possibly
+            containing its own request_id, or the command list
+            (i.e. ['get_property', 'volume'])
+        '''
+        future = MpvIpcFuture()
+        if isinstance(message, list):
+            message = {'command': message}
+        else:
+            try:
+                message = json.loads(message)
+            except:
+                future.set_result(b'', None)
+                return future
+        with self._lock:
+            if 'request_id' not in message:
+                message['request_id'] = self._next_id
+                self._next_id += 1
+            ''' mpv answers in order, so keep a list per id '''
+            self._pending.setdefault(message['request_id'], []).append(future)
+        a_line = json.dumps(message) + '\n'
+        if version_info >= (3, 0):
+            a_line = a_line.encode('utf-8')
+        if not self.send(a_line):
+            future.set_result(b'', None)
+        return future
+
+    def _read_loop(self):
+        buf = b''
+        while True:
+            try:
+                data = self._sock.recv(4096)
+            except:
+                data = b''
+            if not data:
+                break
+            buf += data
+            lines = buf.split(b'\n')
+            buf = lines.pop()
+            for a_line in lines:
+                if a_line:
+                    self._dispatch(a_line)
+        self._disconnected()
+
+    def _dispatch(self, a_line):
+        try:
+            d = json.loads(a_line.decode('utf-8', 'replace'))
+        except:
+            d = None
+        if isinstance(d, dict) and 'request_id' in d and 'event' not in d:
+            with self._lock:
+                futures = self._pending.get(d['request_id'])
+                future = futures.pop(0) if futures else None
+                if futures == []:
+                    del self._pending[d['request_id']]
+            if future is not None:
+                future.set_result(a_line, d)
+                return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for a_queue in subscribers:
+            a_queue.put(a_line)
+
+    def _disconnected(self):
+        with self._lock:
+            was_connected = self.connected
+            self.connected = False
+            pending = self._pending
+            self._pending = {}
+            subscribers = list(self._subscribers)
+        for futures in pending.values():
+            for future in futures:
+                future.set_result(b'', None)
+        if was_connected:
+            for a_queue in subscribers:
+                a_queue.put(b'')
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import subprocess
 import threading
+import re
 import os
 import random
 import logging
@@ -11,16 +12,16 @@ from time import sleep
 import collections
 import json
 import socket
-try:
-    import psutil
-except:
-    pass
 if platform.startswith('win'):
     import win32pipe, win32file, pywintypes
 try:
     from urllib import unquote
 except:
     from urllib.parse import unquote
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 ''' In case of import from win.py '''
 try:
@@ -32,6 +33,16 @@ try:
     from .encodings import get_encodings
 except:
     pass
+''' In case of import from win.py '''
+try:
+    from .mpv_ipc import MpvIpcClient
+except:
+    pass
+''' In case of import from win.py '''
+try:
+    from .player_cache import player_cache
+except:
+    pass
 
 logger = logging.getLogger(__name__)
 
@@ -197,6 +208,71 @@ def info_dict_to_list(info, fix_highlight, max_width):
                 a_list[n] = '|' + a_list[n]
     return a_list
 
+class PlayerOutputTokenizer(object):
+    ''' Find out what a line of player output is about
+
+        All the tokens a player is interested in (volume,
+        playback start, icy title, icy audio data) are compiled
+        into a single regular expression, so that a line is
+        scanned just once, instead of once per token.
+
+        tokenize() returns an (event, tokens) tuple:
+            event is one of VOLUME, PLAYBACK, ICY_TITLE,
+                ICY_AUDIO or None (nothing of interest);
+                if more than one are found, the first one
+                in this order wins (as the checks used to
+                be made in this order)
+            tokens is the list of icy audio tokens found
+                (in the order of the icy audio tokens dict)
+                for ICY_AUDIO, or an empty list
+    '''
+
+    VOLUME = 0
+    PLAYBACK = 1
+    ICY_TITLE = 2
+    ICY_AUDIO = 3
+
+    def __init__(self,
+                 volume_string,
+                 playback_tokens,
+                 icy_tokens,
+                 icy_audio_tokens):
+        self._events = {}
+        self._audio_order = {}
+        tokens = []
+        for event, event_tokens in (
+            (self.VOLUME, (volume_string, )),
+            (self.PLAYBACK, playback_tokens),
+            (self.ICY_TITLE, icy_tokens),
+            (self.ICY_AUDIO, tuple(icy_audio_tokens.keys()))
+        ):
+            for a_token in event_tokens:
+                if a_token and a_token not in self._events:
+                    self._events[a_token] = event
+                    tokens.append(a_token)
+                    if event == self.ICY_AUDIO:
+                        self._audio_order[a_token] = len(self._audio_order)
+        if tokens:
+            ''' at any position, the first token (i.e. the
+                one of the first event) that matches wins '''
+            self._regex = re.compile(
+                '|'.join(re.escape(x) for x in tokens)
+            )
+        else:
+            self._regex = None
+
+    def tokenize(self, a_string):
+        if self._regex is None:
+            return None, []
+        found = set(self._regex.findall(a_string))
+        if not found:
+            return None, []
+        event = min(self._events[x] for x in found)
+        if event == self.ICY_AUDIO:
+            return event, sorted(found, key=self._audio_order.get)
+        return event, []
+
+
 class Player(object):
     ''' Media player class. Playing is handled by player sub classes '''
     process = None
@@ -217,6 +293,11 @@ class Player(object):
 
     delay_thread = None
     connection_timeout_thread = None
+    _timeout_counter_id = 0
+
+    ''' the playlist url of the station playing, if its
+        (cached) stream url is used instead '''
+    _playlist_url = None
 
     ''' make it possible to change volume but not show it '''
     show_volume = True
@@ -231,6 +312,8 @@ class Player(object):
     icy_tokens = ()
     icy_audio_tokens = {}
 
+    _output_tokenizer = None
+
     playback_is_on = connecting = False
 
     _station_encoding = 'utf-8'
@@ -558,11 +641,48 @@ class Player(object):
                 pass
             self.delay_thread = None
 
-    def _is_in_playback_token(self, a_string):
-        for a_token in self._playback_token_tuple:
-            if a_token in a_string:
-                return True
-        return False
+    def _get_output_tokenizer(self):
+        ''' Return the PlayerOutputTokenizer of the player
+            (created on first use) '''
+        if self._output_tokenizer is None:
+            self._output_tokenizer = PlayerOutputTokenizer(
+                getattr(self, 'volume_string', ''),
+                self._playback_token_tuple,
+                self.icy_tokens,
+                self.icy_audio_tokens
+            )
+        return self._output_tokenizer
+
+    def _update_icy_audio_data(self, subsystemOut, tokens):
+        ''' Update icy data from the icy audio tokens
+            found in a line of player output
+
+            Returns True if icy data have changed '''
+        with self.status_update_lock:
+            old_data = dict(self._icy_data)
+            for a_token in tokens:
+                # logger.error('DE token = "{}"'.format(a_token))
+                # logger.error('DE icy_audio_tokens[a_token] = "{}"'.format(self.icy_audio_tokens[a_token]))
+                a_str = subsystemOut.split(a_token)
+                # logger.error('DE str = "{}"'.format(a_str))
+                if self.icy_audio_tokens[a_token] == 'icy-br':
+                    self._icy_data[self.icy_audio_tokens[a_token]] = a_str[1].replace('kbit/s', '')
+                else:
+                    self._icy_data[self.icy_audio_tokens[a_token]] = a_str[1]
+                if self.icy_audio_tokens[a_token] == 'codec':
+                    if '[' in self._icy_data['codec']:
+                        self._icy_data['codec-name'] = self._icy_data['codec'].split('] ')[0].replace('[', '')
+                        self._icy_data['codec'] = self._icy_data['codec'].split('] ')[1]
+                if version_info < (3, 0):
+                    for an_item in self._icy_data.keys():
+                        try:
+                            self._icy_data[an_item] = self._icy_data[an_item].encode(self._station_encoding, 'replace')
+                        except UnicodeDecodeError as e:
+                            self._icy_data[an_item] = ''
+                if 'codec-name' in self._icy_data.keys():
+                    self._icy_data['codec-name'] = self._icy_data['codec-name'].replace('"', '')
+            # logger.error('DE audio data\n\n{}\n\n'.format(self._icy_data))
+            return old_data != self._icy_data
 
     def updateStatus(self, *args):
         stop = args[0]
@@ -578,6 +698,7 @@ class Player(object):
         #    self.outputStream.write(msg=self.oldUserInput['Title'])
         ''' Force volume display even when icy title is not received '''
         self.oldUserInput['Title'] = 'Playing: ' + self.name
+        tokenizer = self._get_output_tokenizer()
         try:
             out = self.process.stdout
             while(True):
@@ -603,7 +724,8 @@ class Player(object):
                             logger.debug('User input: {}'.format(subsystemOut))
 
                     self.oldUserInput['Input'] = subsystemOut
-                    if self.volume_string in subsystemOut:
+                    event, tokens = tokenizer.tokenize(subsystemOut)
+                    if event == tokenizer.VOLUME:
                         # disable volume for mpv
                         if self.PLAYER_NAME != 'mpv':
                             # logger.error('***** volume')
@@ -618,7 +740,7 @@ class Player(object):
                                 if self.show_volume and self.oldUserInput['Title']:
                                     self.outputStream.write(msg=string_to_show, counter='')
                                     self.threadUpdateTitle()
-                    elif self._is_in_playback_token(subsystemOut):
+                    elif event == tokenizer.PLAYBACK:
                         self.stop_timeout_counter_thread = True
                         try:
                             self.connection_timeout_thread.join()
@@ -641,11 +763,13 @@ class Player(object):
                         self.stations_history_add_function()
                         if 'AO: [' in subsystemOut:
                             with self.status_update_lock:
+                                old_audio_format = self._icy_data.get('audio_format')
                                 if version_info > (3, 0):
                                     self._icy_data['audio_format'] = subsystemOut.split('] ')[1].split(' (')[0]
                                 else:
                                     self._icy_data['audio_format'] = subsystemOut.split('] ')[1].split(' (')[0].encode('utf-8')
-                                self.info_display_handler()
+                                if old_audio_format != self._icy_data['audio_format']:
+                                    self.info_display_handler()
                         if self.PLAYER_NAME == 'mpv' and version_info < (3, 0):
                             for a_cmd in (
                                     b'{ "command": ["get_property", "metadata"], "request_id": 100 }\n',
@@ -659,7 +783,7 @@ class Player(object):
                                     if logger.isEnabledFor(logging.INFO):
                                         logger.info('no response!!!')
                         # logger.error('DE 3 {}'.format(self._icy_data))
-                    elif self._is_icy_entry(subsystemOut):
+                    elif event == tokenizer.ICY_TITLE:
                         if not subsystemOut.endswith('Icy-Title=(null)'):
                             if enable_crash_detection_function:
                                 enable_crash_detection_function()
@@ -708,40 +832,17 @@ class Player(object):
                     #        self.oldUserInput['Title'] = 'Connecting to: "{}"'.format(self.name)
                     #        self.outputStream.write(msg=self.oldUserInput['Title'], counter='')
 
-                    else:
-                        for a_token in self.icy_audio_tokens.keys():
-                            if a_token in subsystemOut:
-                                if not self.playback_is_on:
-                                    if logger.isEnabledFor(logging.INFO):
-                                        logger.info('*** updateStatus(): Start of playback detected (Icy audio token received) ***')
-                                self.playback_is_on = True
-                                self.connecting = False
-                                self.stations_history_add_function()
-                                if enable_crash_detection_function:
-                                    enable_crash_detection_function()
-                                # logger.error('DE token = "{}"'.format(a_token))
-                                # logger.error('DE icy_audio_tokens[a_token] = "{}"'.format(self.icy_audio_tokens[a_token]))
-                                a_str = subsystemOut.split(a_token)
-                                # logger.error('DE str = "{}"'.format(a_str))
-                                with self.status_update_lock:
-                                    if self.icy_audio_tokens[a_token] == 'icy-br':
-                                        self._icy_data[self.icy_audio_tokens[a_token]] = a_str[1].replace('kbit/s', '')
-                                    else:
-                                        self._icy_data[self.icy_audio_tokens[a_token]] = a_str[1]
-                                    if self.icy_audio_tokens[a_token] == 'codec':
-                                        if '[' in self._icy_data['codec']:
-                                            self._icy_data['codec-name'] = self._icy_data['codec'].split('] ')[0].replace('[', '')
-                                            self._icy_data['codec'] = self._icy_data['codec'].split('] ')[1]
-                                    if version_info < (3, 0):
-                                        for an_item in self._icy_data.keys():
-                                            try:
-                                                self._icy_data[an_item] = self._icy_data[an_item].encode(self._station_encoding, 'replace')
-                                            except UnicodeDecodeError as e:
-                                                self._icy_data[an_item] = ''
-                                    if 'codec-name' in self._icy_data.keys():
-                                        self._icy_data['codec-name'] = self._icy_data['codec-name'].replace('"', '')
-                                # logger.error('DE audio data\n\n{}\n\n'.format(self._icy_data))
-                        self.info_display_handler()
+                    elif event == tokenizer.ICY_AUDIO:
+                        if not self.playback_is_on:
+                            if logger.isEnabledFor(logging.INFO):
+                                logger.info('*** updateStatus(): Start of playback detected (Icy audio token received) ***')
+                        self.playback_is_on = True
+                        self.connecting = False
+                        self.stations_history_add_function()
+                        if enable_crash_detection_function:
+                            enable_crash_detection_function()
+                        if self._update_icy_audio_data(subsystemOut, tokens):
+                            self.info_display_handler()
         except:
             if logger.isEnabledFor(logging.ERROR):
                 logger.error('Error in updateStatus thread.', exc_info=True)
@@ -783,80 +884,120 @@ class Player(object):
         if (logger.isEnabledFor(logging.DEBUG)):
             logger.debug('MPV updateStatus thread started.')
 
+        sock = ipc = a_queue = None
         while True:
-            try:
+            if platform.startswith('win'):
                 sock = self._connect_to_socket(self.mpvsocket)
-            finally:
                 if sock:
                     break
-                if stop():
-                    if (logger.isEnabledFor(logging.INFO)):
-                        logger.info('MPV updateStatus thread stopped (no connection to socket).')
-                    return
+            else:
+                ipc = self._get_ipc()
+                if ipc:
+                    break
+            if stop():
+                if (logger.isEnabledFor(logging.INFO)):
+                    logger.info('MPV updateStatus thread stopped (no connection to socket).')
+                return
+
+        if platform.startswith('win'):
+            def send(message):
+                win32file.WriteFile(sock, message)
+
+            def read_lines():
+                while True:
+                    try:
+                        data = win32file.ReadFile(sock, 64*1024)
+                    except pywintypes.error as e:
+                        data = b''
+                    a_data = self._fix_returned_data(data)
+                    # logger.error('DE Received: "{!r}"'.format(a_data))
+                    if a_data == b'':
+                        yield b''
+                        return
+                    for n in a_data.split(b'\n'):
+                        if n:
+                            yield n
+        else:
+            ''' the connection is shared with the volume and
+                mute functions; we get everything but the
+                responses to their requests '''
+            a_queue = self._status_queue = ipc.subscribe()
+
+            def send(message):
+                if not ipc.send(message):
+                    raise IOError('Lost connection to mpv')
+
+            def read_lines():
+                while True:
+                    try:
+                        a_line = a_queue.get(timeout=.5)
+                    except queue.Empty:
+                        ''' give the caller a chance to check stop() '''
+                        yield None
+                        continue
+                    yield a_line
+                    if a_line == b'':
+                        return
+
         # Send data
         message = b'{ "command": ["observe_property", 1, "metadata"] }\n'
         try:
-            if platform.startswith('win'):
-                win32file.WriteFile(sock, message)
-            else:
-                sock.sendall(message)
+            send(message)
+            ''' commands to play a station with a running mpv;
+                sent now, so that we get all of its events.
+                Anything received before the new station starts
+                is about the previous one, so it is ignored. '''
+            wait_for_start = bool(self._station_commands)
+            while self._station_commands:
+                send(self._station_commands.pop(0))
             go_on = True
         except:
             # logger.error('DE \n\nBroken pipe\n\n')
             go_on = False
         if go_on:
-            while True:
-                if stop():
+            for n in read_lines():
+                if stop() or n == b'':
                     break
-                try:
-                    if platform.startswith('win'):
-                        try:
-                            data = win32file.ReadFile(sock, 64*1024)
-                        except pywintypes.error as e:
-                            data = b''
-                    else:
-                        data = sock.recvmsg(4096)
-                    a_data = self._fix_returned_data(data)
-                    # logger.error('DE Received: "{!r}"'.format(a_data))
-                    if a_data == b'' or stop():
-                        break
-
-                    if a_data:
-                        all_data = a_data.split(b'\n')
-                        for n in all_data:
-                            if self._get_mpv_metadata(n, stop, enable_crash_detection_function):
-                                self._request_mpv_info_data(sock)
-                            else:
+                if n is None:
+                    continue
+                if wait_for_start:
+                    if b'"start-file"' in n:
+                        wait_for_start = False
+                    continue
+                if self._get_mpv_metadata(n, stop, enable_crash_detection_function):
+                    self._request_mpv_info_data(send)
+                else:
+                    try:
+                        d = json.loads(n)
+                        if 'event' in d.keys():
+                            ret = True
+                            if d['event'] == 'metadata-update':
                                 try:
-                                    if stop():
-                                        break
-                                    d = json.loads(n)
-                                    if 'event' in d.keys():
-                                        if d['event'] == 'metadata-update':
-                                            try:
-                                                if platform.startswith('win'):
-                                                    win32file.WriteFile(sock, self.GET_TITLE)
-                                                else:
-                                                    sock.sendall(self.GET_TITLE)
-                                            except:
-                                                break
-                                            ret = self._set_mpv_playback_is_on(stop, enable_crash_detection_function)
-                                            if not ret:
-                                                break
-                                            self._request_mpv_info_data(sock)
-                                            self.info_display_handler()
-                                        elif d['event'] == 'playback-restart':
-                                            if not self.playback_is_on:
-                                                ret = self._set_mpv_playback_is_on(stop, enable_crash_detection_function)
-                                            if not ret:
-                                                break
-                                            self._request_mpv_info_data(sock)
-                                            self.info_display_handler()
+                                    send(self.GET_TITLE)
                                 except:
-                                    pass
-                finally:
-                    pass
-        self._close_pipe(sock)
+                                    continue
+                                ret = self._set_mpv_playback_is_on(stop, enable_crash_detection_function)
+                            elif d['event'] == 'playback-restart':
+                                if not self.playback_is_on:
+                                    ret = self._set_mpv_playback_is_on(stop, enable_crash_detection_function)
+                            elif d['event'] == 'idle' and self._idle_mpv:
+                                ''' an mpv started with --idle does not exit
+                                    when playback ends or fails; it is as good
+                                    as gone for us, though '''
+                                break
+                            else:
+                                continue
+                            if not ret:
+                                continue
+                            self._request_mpv_info_data(send)
+                            self.info_display_handler()
+                    except:
+                        pass
+        if platform.startswith('win'):
+            self._close_pipe(sock)
+        else:
+            ipc.unsubscribe(a_queue)
+            self._status_queue = None
 
         if not stop():
             ''' haven't been asked to stop '''
@@ -908,6 +1049,7 @@ class Player(object):
         #    self.oldUserInput['Title'] = 'Connecting to: "{}"'.format(self.name)
         #    self.outputStream.write(msg=self.oldUserInput['Title'])
 
+        tokenizer = self._get_output_tokenizer()
         go_on = False
         while not go_on:
             if stop():
@@ -943,7 +1085,8 @@ class Player(object):
                             pass
                     self.oldUserInput['Input'] = subsystemOut
                     # logger.error('DE subsystemOut = "' + subsystemOut + '"')
-                    if self.volume_string in subsystemOut:
+                    event, tokens = tokenizer.tokenize(subsystemOut)
+                    if event == tokenizer.VOLUME:
                         if stop():
                             break
                         # logger.error("***** volume")
@@ -958,7 +1101,7 @@ class Player(object):
                             if self.show_volume and self.oldUserInput['Title']:
                                 self.outputStream.write(msg=string_to_show, counter='')
                                 self.threadUpdateTitle()
-                    elif self._is_in_playback_token(subsystemOut):
+                    elif event == tokenizer.PLAYBACK:
                         # logger.error('DE \n\ntoken = "' + subsystemOut + '"\n\n')
                         if stop():
                             break
@@ -983,13 +1126,15 @@ class Player(object):
                         self.stations_history_add_function()
                         if 'AO: [' in subsystemOut:
                             with self.status_update_lock:
+                                old_audio_format = self._icy_data.get('audio_format')
                                 if version_info > (3, 0):
                                     self._icy_data['audio_format'] = subsystemOut.split('] ')[1].split(' (')[0]
                                 else:
                                     self._icy_data['audio_format'] = subsystemOut.split('] ')[1].split(' (')[0].encode('utf-8')
-                                self.info_display_handler()
+                                if old_audio_format != self._icy_data['audio_format']:
+                                    self.info_display_handler()
                         # logger.error('DE 3 {}'.format(self._icy_data))
-                    elif self._is_icy_entry(subsystemOut):
+                    elif event == tokenizer.ICY_TITLE:
                         if stop():
                             break
                         if not self.playback_is_on:
@@ -1033,48 +1178,25 @@ class Player(object):
                     #        self.oldUserInput['Title'] = 'Connecting to: "{}"'.format(self.name)
                     #        self.outputStream.write(msg=self.oldUserInput['Title'], counter='')
 
-                    else:
+                    elif event == tokenizer.ICY_AUDIO:
                         if stop():
                             break
-                        for a_token in self.icy_audio_tokens.keys():
-                            if a_token in subsystemOut:
-                                if not self.playback_is_on:
-                                    if logger.isEnabledFor(logging.INFO):
-                                        logger.info('*** updateWinVLCStatus(): Start of playback detected (Icy audio token received) ***')
-                                self.stop_timeout_counter_thread = True
-                                try:
-                                    self.connection_timeout_thread.join()
-                                except:
-                                    pass
-                                self.playback_is_on = True
-                                self.connecting = False
-                                self._stop_delay_thread()
-                                self.stations_history_add_function()
-                                if enable_crash_detection_function:
-                                    enable_crash_detection_function()
-                                # logger.error('DE token = "{}"'.format(a_token))
-                                # logger.error('DE icy_audio_tokens[a_token] = "{}"'.format(self.icy_audio_tokens[a_token]))
-                                a_str = subsystemOut.split(a_token)
-                                # logger.error('DE str = "{}"'.format(a_str))
-                                with self.status_update_lock:
-                                    if self.icy_audio_tokens[a_token] == 'icy-br':
-                                        self._icy_data[self.icy_audio_tokens[a_token]] = a_str[1].replace('kbit/s', '')
-                                    else:
-                                        self._icy_data[self.icy_audio_tokens[a_token]] = a_str[1]
-                                    if self.icy_audio_tokens[a_token] == 'codec':
-                                        if '[' in self._icy_data['codec']:
-                                            self._icy_data['codec-name'] = self._icy_data['codec'].split('] ')[0].replace('[', '')
-                                            self._icy_data['codec'] = self._icy_data['codec'].split('] ')[1]
-                                    if version_info < (3, 0):
-                                        for an_item in self._icy_data.keys():
-                                            try:
-                                                self._icy_data[an_item] = self._icy_data[an_item].encode(self._station_encoding, 'replace')
-                                            except UnicodeDecodeError as e:
-                                                self._icy_data[an_item] = ''
-                                    if 'codec-name' in self._icy_data.keys():
-                                        self._icy_data['codec-name'] = self._icy_data['codec-name'].replace('"', '')
-                                # logger.error('DE audio data\n\n{}\n\n'.format(self._icy_data))
-                        self.info_display_handler()
+                        if not self.playback_is_on:
+                            if logger.isEnabledFor(logging.INFO):
+                                logger.info('*** updateWinVLCStatus(): Start of playback detected (Icy audio token received) ***')
+                        self.stop_timeout_counter_thread = True
+                        try:
+                            self.connection_timeout_thread.join()
+                        except:
+                            pass
+                        self.playback_is_on = True
+                        self.connecting = False
+                        self._stop_delay_thread()
+                        self.stations_history_add_function()
+                        if enable_crash_detection_function:
+                            enable_crash_detection_function()
+                        if self._update_icy_audio_data(subsystemOut, tokens):
+                            self.info_display_handler()
         except:
             has_error = True
             if logger.isEnabledFor(logging.ERROR):
@@ -1086,20 +1208,15 @@ class Player(object):
         except:
             pass
 
-    def _request_mpv_info_data(self, sock):
+    def _request_mpv_info_data(self, send):
+        ''' send is the function to send data to mpv with '''
         with self.status_update_lock:
             ret = len(self._icy_data)
         if ret == 0:
-            if platform.startswith('win'):
-                win32file.WriteFile(sock, self.GET_TITLE)
-                win32file.WriteFile(sock, self.GET_AUDIO_FORMAT)
-                win32file.WriteFile(sock, self.GET_AUDIO_CODEC)
-                win32file.WriteFile(sock, self.GET_AUDIO_CODEC_NAME)
-            else:
-                sock.sendall(self.GET_TITLE)
-                sock.sendall(self.GET_AUDIO_FORMAT)
-                sock.sendall(self.GET_AUDIO_CODEC)
-                sock.sendall(self.GET_AUDIO_CODEC_NAME)
+            send(self.GET_TITLE)
+            send(self.GET_AUDIO_FORMAT)
+            send(self.GET_AUDIO_CODEC)
+            send(self.GET_AUDIO_CODEC_NAME)
 
     def _get_mpv_metadata(self, *args):
         ''' Get MPV metadata
@@ -1283,12 +1400,6 @@ class Player(object):
         else:
             arg[0].write(msg=self.title_prefix + self._format_title_string(self.oldUserInput['Title']))
 
-    def _is_icy_entry(self, a_string):
-        for a_token in self.icy_tokens:
-            if a_token in a_string:
-                return True
-        return False
-
     def _format_title_string(self, title_string):
         return self._title_string_format_text_tag(title_string)
 
@@ -1320,7 +1431,11 @@ class Player(object):
              encoding=''
          ):
         ''' use a multimedia player to play a stream '''
-        self.close()
+        warm = self._can_switch_station()
+        if warm:
+            self._stop_station_threads()
+        else:
+            self.close()
         self.name = name
         self.oldUserInput = {'Input': '', 'Volume': '', 'Title': ''}
         self.muted = False
@@ -1338,10 +1453,14 @@ class Player(object):
             self._station_encoding = self.config_encoding
         opts = []
         isPlayList = streamUrl.split("?")[0][-3:] in ['m3u', 'pls']
-        opts = self._buildStartOpts(streamUrl, isPlayList)
+        streamUrl, isPlayList = self._resolved_stream_url(streamUrl, isPlayList)
+        if warm:
+            self._switch_station(streamUrl, isPlayList)
+        else:
+            opts = self._buildStartOpts(streamUrl, isPlayList)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info('Executing command: {}'.format(' '.join(opts)))
         self.stop_mpv_status_update_thread = False
-        if logger.isEnabledFor(logging.INFO):
-            logger.info('Executing command: {}'.format(' '.join(opts)))
         if platform.startswith('win') and self.PLAYER_NAME == 'vlc':
             self.stop_win_vlc_status_update_thread = False
             ''' Launches vlc windowless '''
@@ -1363,10 +1482,11 @@ class Player(object):
             )
         else:
             if self.PLAYER_NAME == 'mpv' and version_info > (3, 0):
-                self.process = subprocess.Popen(opts, shell=False,
-                                                stdout=subprocess.DEVNULL,
-                                                stdin=subprocess.DEVNULL,
-                                                stderr=subprocess.DEVNULL)
+                if not warm:
+                    self.process = subprocess.Popen(opts, shell=False,
+                                                    stdout=subprocess.DEVNULL,
+                                                    stdin=subprocess.DEVNULL,
+                                                    stderr=subprocess.DEVNULL)
                 self.update_thread = threading.Thread(
                     target=self.updateMPVStatus,
                     args=(lambda: self.stop_mpv_status_update_thread,
@@ -1398,6 +1518,10 @@ class Player(object):
             self._get_volume()
         # start playback check timer thread
         self.stop_timeout_counter_thread = False
+        ''' a counter thread also stops when a newer one is
+            started, so that it does not have to be joined '''
+        self._timeout_counter_id += 1
+        counter_id = self._timeout_counter_id
         if self.playback_timeout > 0:
             ''' set connecting here insead of Player.play()
                 so that we do not use it when timeout = 0
@@ -1408,7 +1532,8 @@ class Player(object):
                     target=self.playback_timeout_counter,
                     args=(self.playback_timeout,
                           self.name,
-                          lambda: self.stop_timeout_counter_thread)
+                          lambda: self.stop_timeout_counter_thread or
+                                  counter_id != self._timeout_counter_id)
                 )
                 self.connection_timeout_thread.start()
                 if (logger.isEnabledFor(logging.DEBUG)):
@@ -1425,6 +1550,30 @@ class Player(object):
         if logger.isEnabledFor(logging.INFO):
             logger.info('----==== {} player started ====----'.format(self.PLAYER_NAME))
 
+    def _resolved_stream_url(self, streamUrl, isPlayList):
+        ''' Return the (cached) url of the stream a m3u, pls or asx
+            playlist points to and False, so that the player does
+            not have to download and parse the playlist, or the
+            arguments, if it is not known '''
+        from .stream_resolver import stream_resolver, is_playlist_url
+        self._playlist_url = None
+        if is_playlist_url(streamUrl):
+            stream_url = stream_resolver(self.config_dir).get(streamUrl)
+            if stream_url:
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info('Playlist resolved to: {}'.format(stream_url))
+                self._playlist_url = streamUrl
+                return stream_url, False
+        return streamUrl, isPlayList
+
+    def forget_resolved_url(self):
+        ''' The stream the playlist of the station was resolved
+            to cannot be played; use the playlist next time '''
+        if self._playlist_url:
+            from .stream_resolver import stream_resolver
+            stream_resolver(self.config_dir).forget(self._playlist_url)
+            self._playlist_url = None
+
     def _sendCommand(self, command):
         ''' send keystroke command to player '''
 
@@ -1473,6 +1622,9 @@ class Player(object):
                 self.update_thread = None
 
     def _kill_process_tree(self, pid):
+        ''' psutil is imported here, so that it is
+            not loaded by command line actions '''
+        import psutil
         if psutil.pid_exists(pid):
             parent = psutil.Process(pid)
         else:
@@ -1515,6 +1667,22 @@ class Player(object):
     def _buildStartOpts(self, streamUrl, playList):
         pass
 
+    def _can_switch_station(self):
+        ''' True if the running player can be told to play
+            another station, instead of being restarted
+
+            Currently implemented for mpv only.'''
+        return False
+
+    def _stop_station_threads(self):
+        ''' stop the threads of the station playing,
+            leaving the player running '''
+        pass
+
+    def _switch_station(self, streamUrl, playList):
+        ''' make the running player play another station '''
+        pass
+
     def toggleMute(self):
         ''' mute / unmute player '''
 
@@ -1633,6 +1801,9 @@ class MpvPlayer(Player):
                 'quit':        b'{ "command": ["quit"], "request_id": 1004}\n',
                 }
 
+        ''' seconds to wait for mpv to respond to a command '''
+        IPC_TIMEOUT = 2
+
     def __init__(self,
                  config,
                  outputStream,
@@ -1650,6 +1821,51 @@ class MpvPlayer(Player):
             history_add_function
         )
         self.config_files = self.all_config_files['mpv']
+        self._ipc = None
+        self._ipc_lock = threading.Lock()
+
+        ''' warm player support:
+                _idle_mpv         : mpv was started with --idle
+                _idle_mpv_params  : the extra parameters it
+                                    was started with
+                _station_commands : commands to send to mpv
+                                    by the status thread
+                _status_queue     : the status thread's queue '''
+        self._idle_mpv = False
+        self._idle_mpv_params = None
+        self._station_commands = []
+        self._status_queue = None
+
+    def _get_ipc(self):
+        ''' Return the (connected) MpvIpcClient of the
+            running mpv, or None if it cannot connect
+
+            Not used on Windows, where a new connection to
+            mpv's named pipe is made for every command '''
+        with self._ipc_lock:
+            if self._ipc is None or not self._ipc.connected:
+                ipc = MpvIpcClient(self.mpvsocket)
+                if not ipc.connect():
+                    return None
+                self._ipc = ipc
+            return self._ipc
+
+    def _close_ipc(self):
+        with self._ipc_lock:
+            if self._ipc is not None:
+                self._ipc.close()
+                self._ipc = None
+
+    def _get_mpv_property(self, a_property):
+        ''' Return the value of an mpv property
+            or None if it fails (not for Windows) '''
+        ipc = self._get_ipc()
+        if ipc is None:
+            return None
+        d = ipc.request(['get_property', a_property]).result(self.IPC_TIMEOUT)
+        if d and d.get('error') == 'success':
+            return d.get('data')
+        return None
 
     def save_volume(self):
         ''' Saving Volume in Windows does not work;
@@ -1692,10 +1908,16 @@ class MpvPlayer(Player):
     def _buildStartOpts(self, streamUrl, playList=False):
         ''' Builds the options to pass to mpv subprocess.'''
 
-        ''' Test for newer MPV versions as it supports different IPC flags. '''
-        p = subprocess.Popen([self.PLAYER_CMD, '--no-video',  '--input-ipc-server'], stdout=subprocess.PIPE, stdin=subprocess.PIPE, shell=False)
-        out = p.communicate()
-        if 'not found' not in str(out[0]):
+        ''' Test for newer MPV versions as it supports different IPC flags.
+            The result is cached, along with the mpv executable's mtime,
+            so mpv is only run for this once (per mpv upgrade), in the
+            background; until then, --input-ipc-server is used. '''
+        try:
+            caps = player_cache(self._cnf.stations_dir).capabilities(
+                self.PLAYER_NAME, self.PLAYER_CMD)
+        except:
+            caps = None
+        if caps is None or caps['ipc'] != '--input-unix-socket':
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug('--input-ipc-server is supported.')
             newerMpv = 1
@@ -1742,8 +1964,65 @@ class MpvPlayer(Player):
             for a_param in params:
                 opts.append(a_param)
 
+        ''' keep mpv running after playback ends, so that
+            it can be told to play another station '''
+        self._idle_mpv = self._cnf.warm_player and \
+            not platform.startswith('win') and version_info > (3, 0)
+        if self._idle_mpv:
+            opts.append('--idle=yes')
+            self._idle_mpv_params = self._cnf.command_line_params
         return opts
 
+    def _can_switch_station(self):
+        ''' True if the running mpv was started with --idle
+            (and the same parameters as the ones in use now)
+            and is still there '''
+        if not (self._idle_mpv and self._cnf.warm_player):
+            return False
+        if self.process is None or self.process.poll() is not None:
+            return False
+        if self._idle_mpv_params != self._cnf.command_line_params:
+            return False
+        return self._get_ipc() is not None
+
+    def _stop_station_threads(self):
+        ''' stop the playback detection, delay and status
+            threads, without stopping mpv
+
+            The playback detection thread is not joined; it
+            will stop as soon as the next one is started '''
+        self.stop_timeout_counter_thread = True
+        self._stop_delay_thread()
+        self.stop_mpv_status_update_thread = True
+        a_queue = self._status_queue
+        if a_queue is not None:
+            ''' wake the thread up, so that it stops now '''
+            a_queue.put(None)
+        try:
+            self.update_thread.join()
+        except:
+            pass
+        finally:
+            self.update_thread = None
+        ipc = self._get_ipc()
+        if ipc is not None:
+            ''' the new status thread will observe it again '''
+            ipc.send(b'{ "command": ["unobserve_property", 1] }\n')
+        with self.status_update_lock:
+            self._icy_data = {}
+
+    def _switch_station(self, streamUrl, playList=False):
+        ''' have the running mpv play another station; the
+            commands are sent by the new status thread '''
+        command = 'loadlist' if playList else 'loadfile'
+        self._station_commands = [
+            b'{ "command": ["set_property", "pause", false] }\n',
+            b'{ "command": ["set_property", "mute", false] }\n',
+            (json.dumps({'command': [command, self._url_to_use(streamUrl), 'replace']}) + '\n').encode('utf-8')
+        ]
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('Switching station: {0} {1}'.format(command, self._url_to_use(streamUrl)))
+
 
     def _fix_returned_data(self, data):
         if isinstance(data, tuple):
@@ -1763,6 +2042,13 @@ class MpvPlayer(Player):
         return self._get_mute_status()
 
     def _get_mute_status(self):
+        if not platform.startswith('win'):
+            while True:
+                ret = self._get_mpv_property('mute')
+                if ret is None and self._get_ipc() is None:
+                    return
+                if isinstance(ret, bool):
+                    return ret
         while True:
             sock = self._connect_to_socket(self.mpvsocket)
             try:
@@ -1812,6 +2098,7 @@ class MpvPlayer(Player):
         ''' kill mpv instance '''
         self.stop_mpv_status_update_thread = True
         self._send_mpv_command('quit')
+        self._close_ipc()
         if not platform.startswith('win'):
             os.system('rm ' + self.mpvsocket + ' 2>/dev/null');
         self._icy_data = {}
@@ -1882,6 +2169,18 @@ class MpvPlayer(Player):
 
         '''
 
+        if not platform.startswith('win'):
+            ipc = self._get_ipc()
+            if ipc is None:
+                response = None
+            else:
+                future = ipc.request(self.commands.get(a_command, a_command))
+                response = future.result(self.IPC_TIMEOUT)
+            if return_response:
+                return future.line if response else ''
+            else:
+                return response is not None
+
         #while True:
         #    sock = self._connect_to_socket(self.mpvsocket)
         #    if sock:
@@ -1936,19 +2235,8 @@ class MpvPlayer(Player):
         else:
             return True
 
-    def _display_mpv_volume_value(self):
-        ''' Display volume for MPV
-
-            Currently working with python 2 and 3
-            Eventually will be used for python 2 only
-
-            Python 2 cannot correctly read icy-title from
-            the socket (unicode issue), so it has to read
-            it from stdout.
-        '''
-
-        #if version_info > (3, 0):
-        #    return
+    def _get_win_mpv_volume(self):
+        ''' Read mpv's volume through its named pipe '''
         vol = 0
         while True:
             sock = self._connect_to_socket(self.mpvsocket)
@@ -1959,28 +2247,19 @@ class MpvPlayer(Player):
         # Send data
         message = b'{ "command": ["get_property", "volume"] }\n'
         try:
-            if platform.startswith('win'):
-                win32file.WriteFile(sock, message)
-            else:
-                sock.sendall(message)
+            win32file.WriteFile(sock, message)
         except:
             self._close_pipe(sock)
-            return
+            return None
 
         # wait for response
         got_it = True
         while got_it:
             try:
-                if platform.startswith('win'):
-                    try:
-                        data = win32file.ReadFile(sock, 64*1024)
-                    except pywintypes.error as e:
-                        data = b''
-                else:
-                    if version_info < (3, 0):
-                        data = sock.recv(4096)
-                    else:
-                        data = sock.recvmsg(4096)
+                try:
+                    data = win32file.ReadFile(sock, 64*1024)
+                except pywintypes.error as e:
+                    data = b''
 
                 # logger.error('DE Received: "{!r}"'.format(a_data))
                 a_data = self._fix_returned_data(data)
@@ -2006,6 +2285,28 @@ class MpvPlayer(Player):
             finally:
                 pass
         self._close_pipe(sock)
+        return vol
+
+    def _display_mpv_volume_value(self):
+        ''' Display volume for MPV
+
+            Currently working with python 2 and 3
+            Eventually will be used for python 2 only
+
+            Python 2 cannot correctly read icy-title from
+            the socket (unicode issue), so it has to read
+            it from stdout.
+        '''
+
+        #if version_info > (3, 0):
+        #    return
+        if platform.startswith('win'):
+            vol = self._get_win_mpv_volume()
+        else:
+            vol = self._get_mpv_property('volume')
+        if vol is None:
+            return
+        vol = int(vol)
         if self.oldUserInput['Title']:
             info_string = self._format_title_string(self.oldUserInput['Title'])
         else:
@@ -2617,10 +2918,18 @@ class VlcPlayer(Player):
                 break
         #self.print_response(rep)
 
-def probePlayer(requested_player=''):
+def probePlayer(requested_player='', config_dir=None):
     ''' Probes the multimedia players which are
-        available on the host system. '''
+        available on the host system.
+
+        If config_dir is given, the players' capabilities
+        cache in it is used, so that no player has to be
+        executed to find out whether it is available. '''
     ret_player = None
+    try:
+        cache = player_cache(config_dir) if config_dir else None
+    except:
+        cache = None
     if logger.isEnabledFor(logging.INFO):
         logger.info('Probing available multimedia players...')
     implementedPlayers = Player.__subclasses__()
@@ -2636,7 +2945,7 @@ def probePlayer(requested_player=''):
                 r_player = 'vlc'
             for player in implementedPlayers:
                 if player.PLAYER_NAME == r_player:
-                    ret_player = check_player(player)
+                    ret_player = check_player(player, cache)
                     if ret_player is not None:
                         return ret_player
             if ret_player is None:
@@ -2644,12 +2953,34 @@ def probePlayer(requested_player=''):
                     logger.info('Requested player "{}" not supported'.format(r_player))
     else:
         for player in implementedPlayers:
-            ret_player = check_player(player)
+            ret_player = check_player(player, cache)
             if ret_player is not None:
                 break
     return ret_player
 
-def check_player(a_player):
+def check_player(a_player, cache=None):
+    if cache is not None:
+        entry = cache.get(a_player.PLAYER_NAME, a_player.PLAYER_CMD)
+        if entry is not None:
+            if cache.is_stale(entry):
+                cache.probe_in_background(a_player.PLAYER_NAME, a_player.PLAYER_CMD)
+            if entry['works']:
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info('{} supported (cached: {}).'.format(str(a_player), entry['version']))
+                return a_player
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('{} not supported (cached).'.format(str(a_player)))
+            return None
+        if pywhich(a_player.PLAYER_CMD):
+            ''' found, but not cached (or changed since it was cached);
+                probe it in the background, do not wait for it '''
+            cache.probe_in_background(a_player.PLAYER_NAME, a_player.PLAYER_CMD)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info('{} supported.'.format(str(a_player)))
+            return a_player
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('{} not supported.'.format(str(a_player)))
+        return None
     try:
         p = subprocess.Popen([a_player.PLAYER_CMD, '--help'],
                              stdout=subprocess.PIPE,
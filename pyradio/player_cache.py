@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import subprocess
+import threading
+import logging
+from time import time
+try:
+    from shutil import which
+except ImportError:
+    which = None
+
+logger = logging.getLogger(__name__)
+
+''' Increase this when the cache file layout changes '''
+PLAYER_CACHE_FORMAT_VERSION = 1
+
+''' seconds an entry is trusted without being revalidated '''
+PLAYER_CACHE_REVALIDATE = 7 * 24 * 3600
+
+''' seconds to wait for a player to answer a probe '''
+PLAYER_PROBE_TIMEOUT = 5
+
+''' seconds capabilities() waits for a probe already running '''
+PLAYER_PROBE_WAIT = 1
+
+''' options whose support is recorded, per player '''
+PLAYER_OPTIONS = {
+    'mpv': ('--input-ipc-server', '--input-unix-socket'),
+    'mplayer': (),
+    'vlc': (),
+}
+
+_caches = {}
+_lock = threading.Lock()
+
+
+def resolve_player(player_cmd):
+    ''' Return the full path of a player's executable
+        (player_cmd can be a command name or a path),
+        or None if it cannot be found '''
+    if not player_cmd:
+        return None
+    if os.path.dirname(player_cmd):
+        if os.path.isfile(player_cmd) and os.access(player_cmd, os.X_OK):
+            return os.path.abspath(player_cmd)
+        return None
+    if which is None:
+        for a_dir in os.environ.get('PATH', '').split(os.pathsep):
+            a_file = os.path.join(a_dir, player_cmd)
+            if os.path.isfile(a_file) and os.access(a_file, os.X_OK):
+                return a_file
+        return None
+    return which(player_cmd)
+
+
+def _file_key(a_path):
+    ''' Return [mtime, size] of a file, or None '''
+    try:
+        st = os.stat(a_path)
+    except:
+        return None
+    return [int(st.st_mtime), st.st_size]
+
+
+def _run(args, timeout=PLAYER_PROBE_TIMEOUT):
+    ''' Run a command and return its (combined) output,
+        or None if it cannot be run '''
+    try:
+        p = subprocess.Popen(args,
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT,
+                             stdin=subprocess.PIPE,
+                             shell=False)
+    except OSError:
+        return None
+    killer = threading.Timer(timeout, p.kill)
+    killer.daemon = True
+    killer.start()
+    try:
+        out = p.communicate()[0]
+    finally:
+        killer.cancel()
+    return out.decode('utf-8', 'replace') if out else ''
+
+
+def probe_player(player_name, a_path):
+    ''' Run a player to find out its capabilities
+
+        Returns a dict:
+            works   : the player could be executed
+            version : first line of its version info
+            options : {option: supported} for the
+                      options in PLAYER_OPTIONS
+            ipc     : the option to use for IPC, or None
+    '''
+    ret = {'works': False, 'version': '', 'options': {}, 'ipc': None}
+    out = _run([a_path, '--version'])
+    if out is None:
+        return ret
+    ret['works'] = True
+    for a_line in out.splitlines():
+        if a_line.strip():
+            ret['version'] = a_line.strip()
+            break
+    for an_option in PLAYER_OPTIONS.get(player_name, ()):
+        out = _run([a_path, '--no-video', an_option])
+        ret['options'][an_option] = out is not None and 'not found' not in out
+    if player_name == 'mpv':
+        for an_option in PLAYER_OPTIONS['mpv']:
+            if ret['options'].get(an_option):
+                ret['ipc'] = an_option
+                break
+        else:
+            ''' same as before there was a cache '''
+            ret['ipc'] = '--input-unix-socket'
+    return ret
+
+
+class PyRadioPlayerCache(object):
+    ''' A persistent cache of the players' capabilities
+
+        For each player it keeps the path its executable was
+        found at, the executable's mtime and size, and the
+        result of probe_player(); an entry is valid for as
+        long as the executable is not changed (or moved), so
+        that PyRadio does not have to run a player to find
+        out whether it exists or which IPC option it supports.
+
+        Entries older than revalidate seconds are still used,
+        but are probed again in a background thread.
+
+        The cache is kept in "player-cache.json", in the
+        config dir.
+    '''
+
+    CACHE_FILE = 'player-cache.json'
+
+    def __init__(self, config_dir, revalidate=PLAYER_CACHE_REVALIDATE):
+        self._file = os.path.join(config_dir, self.CACHE_FILE) if config_dir else None
+        self.revalidate = revalidate
+        self._lock = threading.Lock()
+        ''' {player_name: threading.Event set when probed} '''
+        self._probing = {}
+        self._entries = self._read()
+
+    def _read(self):
+        if self._file is None:
+            return {}
+        try:
+            with open(self._file, 'r') as f:
+                data = json.load(f)
+        except:
+            return {}
+        if not isinstance(data, dict) or \
+                data.get('version') != PLAYER_CACHE_FORMAT_VERSION or \
+                not isinstance(data.get('players'), dict):
+            return {}
+        return data['players']
+
+    def _save(self):
+        if self._file is None:
+            return
+        tmp_file = self._file + '.tmp'
+        with self._lock:
+            data = {
+                'version': PLAYER_CACHE_FORMAT_VERSION,
+                'players': self._entries
+            }
+            try:
+                with open(tmp_file, 'w') as f:
+                    json.dump(data, f, indent=1, sort_keys=True)
+                os.rename(tmp_file, self._file)
+            except:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('Cannot write player cache "{}"'.format(self._file))
+                try:
+                    os.remove(tmp_file)
+                except:
+                    pass
+
+    def get(self, player_name, player_cmd):
+        ''' Return the cached entry of a player, if its
+            executable has not changed since it was probed,
+            or None '''
+        a_path = resolve_player(player_cmd)
+        if a_path is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(player_name)
+        if entry and entry.get('cmd') == player_cmd and \
+                entry.get('path') == a_path and \
+                entry.get('key') == _file_key(a_path):
+            return entry
+        return None
+
+    def is_stale(self, entry):
+        return not 0 <= time() - entry.get('checked', 0) < self.revalidate
+
+    def probe(self, player_name, player_cmd):
+        ''' Probe a player now and cache the result;
+            returns the new entry, or None if the
+            player cannot be found '''
+        a_path = resolve_player(player_cmd)
+        if a_path is None:
+            return None
+        entry = probe_player(player_name, a_path)
+        entry.update({
+            'cmd': player_cmd,
+            'path': a_path,
+            'key': _file_key(a_path),
+            'checked': int(time())
+        })
+        with self._lock:
+            self._entries[player_name] = entry
+        self._save()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Player probed: {0} = {1}'.format(player_name, entry))
+        return entry
+
+    def probe_in_background(self, player_name, player_cmd):
+        ''' Probe a player in a (daemon) thread, unless
+            it is being probed already '''
+        with self._lock:
+            if player_name in self._probing:
+                return
+            done = self._probing[player_name] = threading.Event()
+
+        def a_thread():
+            try:
+                self.probe(player_name, player_cmd)
+            finally:
+                with self._lock:
+                    self._probing.pop(player_name, None)
+                done.set()
+
+        t = threading.Thread(target=a_thread)
+        t.daemon = True
+        t.start()
+
+    def capabilities(self, player_name, player_cmd, wait=PLAYER_PROBE_WAIT):
+        ''' Return the entry of a player, or None if it is not
+            cached (or has changed)
+
+            If the player is being probed, the probe is waited
+            for, up to wait seconds. Otherwise, a probe is started
+            in the background and None is returned right away;
+            the player is never run by the caller's thread.
+        '''
+        entry = self.get(player_name, player_cmd)
+        if entry is None:
+            with self._lock:
+                done = self._probing.get(player_name)
+            if done is None:
+                ''' unless a probe just finished '''
+                entry = self.get(player_name, player_cmd)
+                if entry is None:
+                    self.probe_in_background(player_name, player_cmd)
+            elif done.wait(wait):
+                entry = self.get(player_name, player_cmd)
+        return entry
+
+
+def player_cache(config_dir=None):
+    ''' Return the (shared) PyRadioPlayerCache of a config dir
+
+        Without a config_dir, the one used first is returned
+    '''
+    with _lock:
+        if config_dir is None:
+            if _caches:
+                return list(_caches.values())[0]
+        if config_dir not in _caches:
+            _caches[config_dir] = PyRadioPlayerCache(config_dir)
+        return _caches[config_dir]
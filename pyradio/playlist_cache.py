@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import gc
+import hashlib
+import marshal
+import struct
+import logging
+from os import path, remove, rename
+from sys import version_info
+from .station_list import PyRadioStationList
+
+logger = logging.getLogger(__name__)
+
+''' Increase this when the cache layout changes,
+    so that old cache files get rebuilt '''
+CACHE_FORMAT_VERSION = 1
+
+''' marshal's format is interpreter specific, so
+    keep the python version in the cache header too '''
+_PY_VERSION = tuple(version_info[:2])
+
+''' The header is preceded by its length, so that it
+    can be checked without loading the stations '''
+_HEADER_LENGTH = struct.Struct('<I')
+
+
+def playlist_cache_file(stationFile):
+    ''' Return the sidecar cache file of a playlist
+
+        For "/some/dir/my-playlist.csv" this will be
+        "/some/dir/.my-playlist.csv.cache"
+    '''
+    return path.join(
+        path.dirname(stationFile),
+        '.' + path.basename(stationFile) + '.cache'
+    )
+
+def playlist_signature(stationFile):
+    ''' Return the (mtime, size, sha1) tuple of a playlist
+        or None if the file cannot be read '''
+    try:
+        with open(stationFile, 'rb') as f:
+            data = f.read()
+        mtime = path.getmtime(stationFile)
+    except:
+        return None
+    return mtime, len(data), hashlib.sha1(data).hexdigest()
+
+def read_playlist_cache(stationFile):
+    ''' Read the sidecar cache of a playlist
+
+        Returns:
+            (stations, playlist_version)
+                stations being a PyRadioStationList,
+                if the cache is valid for the
+                current content of the CSV file
+            None
+                if there is no cache, the cache is
+                stale or it cannot be read
+    '''
+    cache_file = playlist_cache_file(stationFile)
+    if not path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, 'rb') as f:
+            header_length = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))[0]
+            header = marshal.loads(f.read(header_length))
+            if header[0] != CACHE_FORMAT_VERSION or \
+                    tuple(header[1]) != _PY_VERSION:
+                return None
+            ''' compare mtime and size before reading
+                the CSV file to calculate its hash '''
+            if header[2] != path.getmtime(stationFile) or \
+                    header[3] != path.getsize(stationFile):
+                return None
+            sig = playlist_signature(stationFile)
+            if sig is None or sig[2] != header[4]:
+                return None
+            playlist_version = header[5]
+            data = f.read()
+    except:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Cannot read playlist cache: "{}"'.format(cache_file))
+        return None
+    ''' Nothing created here can form a reference cycle,
+        so keep the garbage collector from repeatedly
+        scanning the (many) new objects '''
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        stations = PyRadioStationList.from_columns(*marshal.loads(data))
+    except:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Cannot read playlist cache: "{}"'.format(cache_file))
+        return None
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('Playlist read from cache: "{}"'.format(cache_file))
+    return stations, playlist_version
+
+def write_playlist_cache(stationFile, stations, playlist_version):
+    ''' Write the sidecar cache of a playlist
+
+        The stations are stored in columns (names, URLs,
+        encodings, online browser flags), preceded by a
+        header containing the mtime, size and sha1 hash
+        of the CSV file they were read from.
+
+        Returns True on success, False otherwise
+    '''
+    sig = playlist_signature(stationFile)
+    if sig is None:
+        return False
+    cache_file = playlist_cache_file(stationFile)
+    tmp_file = cache_file + '.tmp'
+    header = (
+        CACHE_FORMAT_VERSION, _PY_VERSION,
+        sig[0], sig[1], sig[2],
+        playlist_version
+    )
+    columns = tuple(
+        tuple(n[i] for n in stations) for i in range(4)
+    )
+    try:
+        header = marshal.dumps(header)
+        with open(tmp_file, 'wb') as f:
+            f.write(_HEADER_LENGTH.pack(len(header)))
+            f.write(header)
+            f.write(marshal.dumps(columns))
+        if path.exists(cache_file):
+            remove(cache_file)
+        rename(tmp_file, cache_file)
+    except:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Cannot write playlist cache: "{}"'.format(cache_file))
+        try:
+            remove(tmp_file)
+        except:
+            pass
+        return False
+    return True
+
+def remove_playlist_cache(stationFile):
+    ''' Remove the sidecar cache of a playlist, if it exists '''
+    cache_file = playlist_cache_file(stationFile)
+    try:
+        if path.exists(cache_file):
+            remove(cache_file)
+    except:
+        pass
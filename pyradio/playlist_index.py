@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+from os import path, listdir, remove, rename, stat
+from .playlist_reader import PyRadioPlaylistReader
+
+logger = logging.getLogger(__name__)
+
+''' Increase this when the index layout changes,
+    so that old index files get rebuilt '''
+INDEX_FORMAT_VERSION = 1
+
+''' format of a malformed playlist '''
+PLAYLIST_MALFORMED = -1
+
+_indexes = {}
+
+
+class PlaylistIndexEntry(object):
+    ''' The metadata of a playlist '''
+
+    __slots__ = ('name', 'path', 'size', 'mtime', 'count', 'version')
+
+    def __init__(self, name, a_path, size, mtime, count, version):
+        self.name = name
+        self.path = a_path
+        self.size = size
+        self.mtime = mtime
+        self.count = count
+        self.version = version
+
+    def __repr__(self):
+        return 'PlaylistIndexEntry({0}, {1}, {2}, {3})'.format(
+            self.name, self.size, self.count, self.version)
+
+
+class PyRadioPlaylistIndex(object):
+    ''' A persistent index of the playlists in a directory
+
+        For each CSV file it keeps its size, mtime, number of
+        stations and detected format, in the ".playlists.idx"
+        file of the directory.
+
+        refresh() updates it incrementally: the directory is
+        only listed if its mtime has changed, and a playlist
+        is only read if its size or mtime has changed.
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_file = path.join(directory, '.playlists.idx')
+        self._dir_mtime = None
+        ''' basename -> [size, mtime, count, version] '''
+        self._files = {}
+        self._entries = None
+        self._read_index()
+
+    def _read_index(self):
+        try:
+            with open(self.index_file, 'r') as f:
+                data = json.load(f)
+        except:
+            return
+        try:
+            if data['version'] == INDEX_FORMAT_VERSION:
+                self._dir_mtime = data['dir_mtime']
+                self._files = data['files']
+        except:
+            self._dir_mtime = None
+            self._files = {}
+
+    def _write_index(self):
+        tmp_file = self.index_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump({
+                    'version': INDEX_FORMAT_VERSION,
+                    'dir_mtime': self._dir_mtime,
+                    'files': self._files
+                }, f)
+            rename(tmp_file, self.index_file)
+        except:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Cannot write playlist index: "{}"'.format(self.index_file))
+            try:
+                remove(tmp_file)
+            except:
+                pass
+
+    def _read_playlist(self, a_file):
+        reader = PyRadioPlaylistReader(path.join(self.directory, a_file))
+        for _ in reader:
+            pass
+        if reader.error:
+            return 0, PLAYLIST_MALFORMED
+        return reader.count, reader.version
+
+    def refresh(self):
+        ''' Bring the index up to date with the directory
+
+            Returns the list of PlaylistIndexEntry items,
+            sorted by name
+        '''
+        try:
+            dir_mtime = stat(self.directory).st_mtime
+        except:
+            self._files = {}
+            self._entries = []
+            return self._entries
+        changed = False
+        if dir_mtime != self._dir_mtime:
+            ''' files added or removed '''
+            try:
+                files = [x for x in listdir(self.directory) if x.endswith('.csv')]
+            except:
+                files = []
+            for a_file in list(self._files.keys()):
+                if a_file not in files:
+                    del self._files[a_file]
+                    changed = True
+            self._dir_mtime = dir_mtime
+        else:
+            files = list(self._files.keys())
+
+        for a_file in files:
+            try:
+                st = stat(path.join(self.directory, a_file))
+            except:
+                ''' removed after listing the directory '''
+                self._files.pop(a_file, None)
+                changed = True
+                continue
+            old = self._files.get(a_file)
+            if old is None or old[0] != st.st_size or old[1] != st.st_mtime:
+                count, version = self._read_playlist(a_file)
+                self._files[a_file] = [st.st_size, st.st_mtime, count, version]
+                changed = True
+
+        if changed or self._entries is None:
+            self._entries = sorted(
+                [PlaylistIndexEntry(
+                    ''.join(a_file.split('.')[:-1]),
+                    path.join(self.directory, a_file),
+                    *self._files[a_file]) for a_file in self._files],
+                key=lambda x: x.name
+            )
+        if changed:
+            self._write_index()
+            ''' writing the index changes the mtime of the directory '''
+            try:
+                self._dir_mtime = stat(self.directory).st_mtime
+            except:
+                pass
+        return self._entries
+
+    def get(self, a_file):
+        ''' Return the PlaylistIndexEntry of a playlist
+            (a full path or a file name) or None '''
+        a_file = path.basename(a_file)
+        for n in self.refresh():
+            if path.basename(n.path) == a_file:
+                return n
+        return None
+
+
+def playlist_index(directory):
+    ''' Return the (shared) PyRadioPlaylistIndex of a directory '''
+    try:
+        return _indexes[directory]
+    except KeyError:
+        _indexes[directory] = PyRadioPlaylistIndex(directory)
+        return _indexes[directory]
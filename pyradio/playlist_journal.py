@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+from os import path, remove, fsync
+from .playlist_cache import playlist_signature
+
+logger = logging.getLogger(__name__)
+
+''' Journal operations
+        [JOURNAL_REMOVE, index]
+        [JOURNAL_INSERT, index, station]
+        [JOURNAL_MOVE, source, target]
+        [JOURNAL_SWITCH, source, target]
+'''
+JOURNAL_REMOVE = 'r'
+JOURNAL_INSERT = 'i'
+JOURNAL_MOVE = 'm'
+JOURNAL_SWITCH = 's'
+
+
+def playlist_journal_file(stationFile):
+    ''' Return the journal file of a playlist
+
+        For "/some/dir/my-playlist.csv" this will be
+        "/some/dir/.my-playlist.csv.journal"
+    '''
+    return path.join(
+        path.dirname(stationFile),
+        '.' + path.basename(stationFile) + '.journal'
+    )
+
+def playlist_journal_size(stationFile):
+    ''' Return the size of the journal of a
+        playlist, or 0 if there is no journal '''
+    try:
+        return path.getsize(playlist_journal_file(stationFile))
+    except:
+        return 0
+
+def append_to_playlist_journal(stationFile, operations):
+    ''' Append a batch of operations to the journal of a playlist
+
+        The first line of a journal is the signature of the CSV
+        file it applies to; each following line is a batch of
+        operations (one per save), so that a partially written
+        batch (i.e. a crash while saving) is ignored as a whole.
+
+        Returns:
+             0: All ok
+            -1: Error writing file
+    '''
+    journal_file = playlist_journal_file(stationFile)
+    lines = []
+    if not path.exists(journal_file):
+        sig = playlist_signature(stationFile)
+        if sig is None:
+            return -1
+        lines.append(json.dumps(sig))
+    lines.append(json.dumps(operations))
+    try:
+        with open(journal_file, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+            fsync(f.fileno())
+    except:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Cannot write playlist journal: "{}"'.format(journal_file))
+        return -1
+    return 0
+
+def read_playlist_journal(stationFile):
+    ''' Read the journal of a playlist
+
+        Returns:
+            a list of operations
+                if the journal exists and has been written
+                for the current content of the CSV file
+            None
+                if there is no journal, or it is stale
+                (i.e. the CSV file has been modified after
+                the journal was created)
+    '''
+    journal_file = playlist_journal_file(stationFile)
+    if not path.exists(journal_file):
+        return None
+    try:
+        with open(journal_file, 'r') as f:
+            lines = f.read().splitlines()
+    except:
+        return None
+    try:
+        sig = json.loads(lines[0])
+    except:
+        sig = None
+    if sig is None or list(playlist_signature(stationFile) or []) != sig:
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('Ignoring stale playlist journal: "{}"'.format(journal_file))
+        return None
+    operations = []
+    for a_line in lines[1:]:
+        try:
+            operations.extend(json.loads(a_line))
+        except ValueError:
+            ''' incomplete batch '''
+            if logger.isEnabledFor(logging.INFO):
+                logger.info('Ignoring incomplete playlist journal entry')
+            break
+    return operations
+
+def apply_playlist_journal(stations, operations):
+    ''' Apply journal operations to a list of stations, in place '''
+    for op in operations:
+        if op[0] == JOURNAL_REMOVE:
+            stations.pop(op[1])
+        elif op[0] == JOURNAL_INSERT:
+            stations.insert(op[1], op[2])
+        elif op[0] == JOURNAL_MOVE:
+            stations.insert(op[2], stations.pop(op[1]))
+        elif op[0] == JOURNAL_SWITCH:
+            stations[op[1]], stations[op[2]] = stations[op[2]], stations[op[1]]
+
+def remove_playlist_journal(stationFile):
+    ''' Remove the journal of a playlist, if it exists '''
+    journal_file = playlist_journal_file(stationFile)
+    try:
+        if path.exists(journal_file):
+            remove(journal_file)
+    except:
+        pass
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import csv
+import logging
+from sys import platform
+from .station_list import Station
+
+logger = logging.getLogger(__name__)
+
+''' the same values as PyRadioStations.PLAYLIST_HAS_* '''
+PLAYLIST_HAS_NAME_URL = 0
+PLAYLIST_HAS_NAME_URL_ENCODING = 1
+PLAYLIST_HAS_NAME_URL_ENCODING_BROWSER = 2
+
+
+def _open_playlist(stationFile):
+    if platform.startswith('win'):
+        return open(stationFile, 'r', encoding='utf-8')
+    return open(stationFile, 'r')
+
+
+class PyRadioPlaylistReader(object):
+    ''' Read the stations of a CSV playlist, one at a time
+
+        Iterating over it yields a Station for each line of
+        the playlist; the file is only read as far as it is
+        iterated, so the caller can stop at any time (the
+        file is closed when the iteration stops, or when
+        close() is called).
+
+        After (or while) iterating:
+            version is the detected playlist version
+            error   is True if the playlist is malformed
+                    (the iteration stops at the bad line)
+
+        A PyRadioPlaylistReader can only be iterated once.
+    '''
+
+    def __init__(self, stationFile):
+        self.stationFile = stationFile
+        self.version = PLAYLIST_HAS_NAME_URL
+        self.error = False
+        self.count = 0
+        self._gen = self._read()
+
+    def __iter__(self):
+        return self._gen
+
+    def __next__(self):
+        return next(self._gen)
+
+    next = __next__
+
+    def close(self):
+        self._gen.close()
+
+    def _read(self):
+        try:
+            cfgfile = _open_playlist(self.stationFile)
+        except:
+            self.error = True
+            return
+        with cfgfile:
+            try:
+                for row in csv.reader(filter(lambda row: row[0]!='#', cfgfile), skipinitialspace=True):
+                    if not row:
+                        continue
+                    n = len(row)
+                    if n == 2:
+                        a_station = Station(row[0].strip(), row[1].strip())
+                    elif n == 3:
+                        a_station = Station(*[s.strip() for s in row])
+                        if self.version < PLAYLIST_HAS_NAME_URL_ENCODING:
+                            self.version = PLAYLIST_HAS_NAME_URL_ENCODING
+                    elif n == 4:
+                        a_station = Station(*[s.strip() for s in row])
+                        self.version = PLAYLIST_HAS_NAME_URL_ENCODING_BROWSER
+                    else:
+                        self.error = True
+                        break
+                    self.count += 1
+                    yield a_station
+            except GeneratorExit:
+                raise
+            except:
+                self.error = True
+        if self.error and logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Malformed playlist: "{}"'.format(self.stationFile))
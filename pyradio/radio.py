@@ -16,27 +16,25 @@ import random
 import signal
 from copy import deepcopy
 from sys import version as python_version, version_info, platform
-from os.path import join, basename, getmtime, getsize
+from os.path import join, basename
 from os import remove
 from platform import system
 from time import ctime, sleep
 from datetime import datetime
 import glob
 import logging
-try:
-    import psutil
-    HAVE_PSUTIL = True
-except:
-    HAVE_PSUTIL = False
-
 from .config import HAS_REQUESTS, HAS_DNSPYTHON
 from .common import *
+HAVE_PSUTIL = module_is_available('psutil')
 from .window_stack import Window_Stack
 from .config_window import *
 from .log import Log
+from .redraw import PyRadioRedrawScheduler
+from .file_watch import PyRadioFileWatcher
+from .station_list import PyRadioStationList, find_station
 from .edit import PyRadioSearch, PyRadioEditor, PyRadioRenameFile, PyRadioConnectionType
 from .themes import *
-from .cjkwrap import cjklen
+from .cjkwrap import cjklen, cjkslices
 from . import player
 from .install import version_string_to_list, get_github_tag, fix_pyradio_win_exe
 from .html_help import HtmlHelp
@@ -124,9 +122,23 @@ class PyRadio(object):
     _i_am_resizing = False
     _redisplay_list = []
 
+    ''' what is displayed in each line of bodyWin (None if
+        unknown), so that unchanged lines are not redrawn '''
+    _body_lines = []
+    _body_lines_win = None
+
     ''' number of items (stations or playlists) in current view '''
     number_of_items = 0
 
+    ''' the stations check running (\k) and the results
+        of the checks, {url: result} (None if not read yet);
+        results read by a thread are kept in
+        _station_check_new_results (under _update_notify_lock)
+        until the main loop picks them up '''
+    _station_checker = None
+    _station_check_results = None
+    _station_check_new_results = None
+
     _playing = -1
     jumpnr = ''
     _backslash_pressed = False
@@ -207,8 +219,8 @@ class PyRadio(object):
     ''' update notification '''
     _update_version = ''
     _update_version_do_display = ''
-    _watch_theme_thread = _update_notification_thread = None
-    stop_watch_theme_thread = stop_update_notification_thread = False
+    _theme_watcher = _update_notification_thread = None
+    stop_update_notification_thread = False
     _watch_theme_lock = threading.Lock()
     _update_notify_lock = threading.Lock()
 
@@ -263,6 +275,7 @@ class PyRadio(object):
                  force_update=''):
         self._current_selection = 0
         self._force_print_all_lines = False
+        self.redraw_scheduler = PyRadioRedrawScheduler()
         self._system_asked_to_terminate = False
         self._cnf = pyradio_config
         self._cnf.update_calculated_colors = self._update_calculated_colors
@@ -619,7 +632,8 @@ class PyRadio(object):
         ''' For the time being, supported players are mpv, mplayer and vlc. '''
         try:
             self.player = player.probePlayer(
-                requested_player=self.requested_player)(
+                requested_player=self.requested_player,
+                config_dir=self._cnf.stations_dir)(
                     self._cnf,
                     self.log,
                     self.playbackTimeoutCounter,
@@ -667,6 +681,7 @@ class PyRadio(object):
         self.playlist_selections[self.ws.PLAYLIST_MODE] = self.selections[self.ws.PLAYLIST_MODE][:-1][:]
         # self.ll('setup')
         self.run()
+        self.log.stop()
 
     def _redraw(self):
         self.footerWin.noutrefresh()
@@ -752,6 +767,7 @@ class PyRadio(object):
 
             self.bodyWin.bkgdset(' ', curses.color_pair(5))
             self.bodyWin.erase()
+            self._invalidate_body_lines()
             if self.player.isPlaying():
                 try:
                     self.bodyWin.addstr(self.maxY - 2, 0, ' Station: ', curses.color_pair(5))
@@ -936,6 +952,7 @@ class PyRadio(object):
         self.bodyWin.bkgdset(' ', col)
         self.outerBodyWin.erase()
         self.bodyWin.erase()
+        self._invalidate_body_lines()
         self.outerBodyWin.box()
         self.bodyWin.addstr(1,1, 'PyRadio ', curses.color_pair(4))
         self.bodyWin.addstr('has a new dependency: ', curses.color_pair(5))
@@ -968,6 +985,7 @@ class PyRadio(object):
         self.bodyWin.bkgdset(' ', col)
         self.outerBodyWin.erase()
         self.bodyWin.erase()
+        self._invalidate_body_lines()
         # self.bodyWin.box()
         self.outerBodyWin.box()
         lines = a_string.split('\n')
@@ -1039,7 +1057,31 @@ class PyRadio(object):
             except:
                 pass
 
-    def __displayBodyLine(self, lineNum, pad, station, return_line=False):
+    def _invalidate_body_lines(self, start=0):
+        ''' Forget what is displayed in bodyWin, from line start on '''
+        del self._body_lines[start:]
+
+    def _invalidate_body_line(self, lineNum):
+        if 0 <= lineNum < len(self._body_lines):
+            self._body_lines[lineNum] = None
+
+    def _body_line_is_displayed(self, lineNum, a_line):
+        ''' Return True if a_line (a tuple of what is drawn in
+            a line of bodyWin) is already displayed in lineNum;
+            otherwise remember it as displayed and return False '''
+        if self._body_lines_win is not self.bodyWin:
+            ''' new window (i.e. after a resize) '''
+            self._body_lines_win = self.bodyWin
+            self._body_lines = []
+        if lineNum < len(self._body_lines) and \
+                self._body_lines[lineNum] == a_line:
+            return True
+        while len(self._body_lines) <= lineNum:
+            self._body_lines.append(None)
+        self._body_lines[lineNum] = a_line
+        return False
+
+    def __displayBodyLine(self, lineNum, pad, station, return_line=False, clear_line=False):
         col = curses.color_pair(5)
         sep_col = None
         # logger.error('DE selection  = {0},{1},{2},{3}'.format(
@@ -1084,6 +1126,8 @@ class PyRadio(object):
         ticks = None
         if self.ws.window_mode == self.ws.PLAYLIST_MODE:
             line = self._format_playlist_line(lineNum, pad, station)
+            if self._body_line_is_displayed(lineNum, (self.bodyMaxX, line, col)):
+                return
             try:
                 self.bodyWin.addstr(lineNum, 0, line, col)
             except:
@@ -1104,7 +1148,10 @@ class PyRadio(object):
                     played, line = self._cnf.online_browser.format_empty_line(self.bodyMaxX)
             else:
                 if station:
-                    line = self._format_station_line("{0}. {1}".format(str(lineNum + self.startPos + 1).rjust(pad), station[0]))
+                    line = self._format_station_line("{0}. {1}{2}".format(
+                        str(lineNum + self.startPos + 1).rjust(pad),
+                        self._station_check_mark(station[1]),
+                        station[0]))
                 else:
                     line = ' ' * (self.bodyMaxX - 2)
 
@@ -1112,6 +1159,21 @@ class PyRadio(object):
                 ''' return empty line '''
                 return line
 
+            if self._body_line_is_displayed(
+                lineNum,
+                (self.bodyMaxX, line, col, column_num, column_text,
+                 sep_col if station and self._cnf.browsing_station_service else None,
+                 tuple(ticks) if ticks else None)
+            ):
+                return
+
+            if clear_line:
+                try:
+                    self.bodyWin.move(lineNum, 0)
+                    self.bodyWin.clrtoeol()
+                except:
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug('====---- clear line move failed----====')
             self.bodyWin.hline(lineNum, 0, ' ', self.bodyMaxX, col)
             try:
                 # logger.error('line: "{}"'.format(line))
@@ -1139,29 +1201,25 @@ class PyRadio(object):
             Parameters
             =========
             path    the path to the file
-                    if it's None, the thread is terminated
+                    if it's None, the watcher is terminated
         '''
-        if self._watch_theme_thread:
-            self.stop_watch_theme_thread = True
-            self._watch_theme_thread.join()
-            self._watch_theme_thread = None
-            self.stop_watch_theme_thread = False
+        if self._theme_watcher:
+            self._theme_watcher.stop()
+            self._theme_watcher = None
         if theme_path is None:
             return
+        a_file = self._cnf.theme_path
+        ret, ret_ind = self._cnf.is_project_theme(self._cnf.theme)
+        if ret is not None:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Watching project theme: ' + self._cnf.theme)
+            a_file = ret.check_file
+            ret.theme_id = ret_ind
         else:
-            a_path = theme_path
-        self._watch_theme_thread = threading.Thread(
-            target=self._wait_for_theme_to_change,
-            # args=(self._cnf,
-            # args=(path.basename(a_path).replace('.pyradio-theme', ''),
-            #       a_path,
-            args=(self._cnf.theme,
-                  self._cnf.theme_path,
-                  self._watch_theme_lock,
-                  lambda: self.stop_watch_theme_thread,
-                  self._auto_update_theme,
-                  self._cnf))
-        self._watch_theme_thread.start()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Wathcing a non project theme: ' + self._cnf.theme)
+        self._theme_watcher = PyRadioFileWatcher(a_file, self._auto_update_theme)
+        self._theme_watcher.start()
 
     def _auto_update_theme(self):
         logger.error('_auto_update_theme(): triggered! - updating theme: ' + self._cnf.theme)
@@ -1180,103 +1238,6 @@ class PyRadio(object):
             logger.info('_print_theme_download_error 1')
             self._print_theme_download_error()
 
-    def _wait_for_theme_to_change(self, theme, file, a_lock, stop, func, config):
-        is_project_theme = False
-        a_file = file
-        ret, ret_ind = config.is_project_theme(theme)
-        if ret is not None:
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug('Watching project theme: ' + theme)
-            is_project_theme = True
-            a_file = ret.check_file
-            ret.theme_id = ret_ind
-        else:
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug('Wathcing a non project theme: ' + theme)
-
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug('File watch thread started on: {}'.format(a_file))
-
-        showed = False
-        while not path.exists(a_file):
-            if logger.isEnabledFor(logging.DEBUG) and not showed:
-                logger.debug('Waiting for watched file to appear: {}'.format(a_file))
-                showed = True
-            for n in range(0, 5):
-                sleep(.15)
-                if stop():
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug('File watch thread stopped on: {}'.format(a_file))
-                    return
-
-        if logger.isEnabledFor(logging.DEBUG) and showed:
-            logger.debug('Watched file appeared: {}'.format(a_file))
-            showed = False
-        st_time = cur_time = getmtime(a_file)
-        st_size = cur_size = getsize(a_file)
-        while True:
-            if path.exists(a_file):
-                for n in range(0, 5):
-                    sleep(.15)
-                    if stop():
-                        break
-                try:
-                    cur_time = getmtime(a_file)
-                    showed = False
-                except:
-                    if logger.isEnabledFor(logging.DEBUG) and not showed:
-                        logger.debug('Watched file disappeared: {}'.format(a_file))
-                        showed = True
-                if st_time != cur_time:
-                    if stop():
-                        break
-                    try:
-                        st_time = cur_time = getmtime(a_file)
-                        st_size = cur_size = getsize(a_file)
-                        showed = False
-                    except:
-                        if logger.isEnabledFor(logging.DEBUG) and not showed:
-                            logger.debug('Watched file disappeared: {}'.format(a_file))
-                            showed = True
-                    if stop():
-                        break
-                    # with a_lock:
-                    #     func()
-                    func()
-                if stop():
-                    break
-                try:
-                    cur_size = getsize(a_file)
-                    showed = False
-                except:
-                    if logger.isEnabledFor(logging.DEBUG) and not showed:
-                        logger.debug('Watched file disappeared: {}'.format(a_file))
-                        showed = True
-                if st_size != cur_size:
-                    if stop():
-                        break
-                    st_time = cur_time = getmtime(a_file)
-                    st_size = cur_size = getsize(a_file)
-                    if stop():
-                        break
-                    # with a_lock:
-                    #     func()
-                    func()
-                if stop():
-                    break
-            else:
-                if logger.isEnabledFor(logging.DEBUG) and not showed:
-                    logger.debug('File watched does not exist: {}'.format(a_file))
-                    showed = True
-                for n in range(0, 5):
-                    sleep(.15)
-                    if stop():
-                        if logger.isEnabledFor(logging.DEBUG):
-                            logger.debug('File watch thread stopped on: {}'.format(a_file))
-                        return
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug('File watch thread stopped on: {}'.format(a_file))
-
     def run(self):
         # self._watch_theme()
         self._register_signals_handlers()
@@ -1363,12 +1324,18 @@ class PyRadio(object):
             ''' start theme file thread  '''
             if self._cnf.auto_update_theme:
                 self._watch_theme(self._cnf.theme_path)
+            self._load_station_check_results()
             while True:
                 try:
+                    self._apply_station_check_results()
+                    ''' display everything drawn while
+                        handling the previous key '''
+                    self.redraw_scheduler.flush()
                     c = self.bodyWin.getch()
                     # logger.error('DE pressed "{0} - {1}"'.format(c, chr(c)))
                     ret = self.keypress(c)
                     if (ret == -1):
+                        self.redraw_scheduler.cancel()
                         return
                 except KeyboardInterrupt:
                     # ok
@@ -1433,9 +1400,9 @@ class PyRadio(object):
         self.restore_colors()
 
     def _wait_for_threads(self):
-        if self._watch_theme_thread:
-            self.stop_watch_theme_thread = True
-            self._watch_theme_thread.join()
+        self.log.stop()
+        if self._theme_watcher:
+            self._theme_watcher.stop()
         if self._update_notification_thread:
             if self._update_notification_thread.is_alive():
                 self.stop_update_notification_thread = True
@@ -1516,7 +1483,7 @@ class PyRadio(object):
         # logger.error('de setStation: selection = {}'.format(self.selection))
 
     def playSelectionBrowser(self, a_url=None):
-            self.log.display_help_message = False
+            self.log.write(reset_help_msg=True)
 
             # self.log.write(msg=player_start_stop_token[0] + self._last_played_station[0])
 
@@ -1557,7 +1524,7 @@ class PyRadio(object):
         # logger.error('DE \n\nselection = {0}, playing = {1}\nlast played = {2}\n\n'.format(self.selection, self.playing, self._last_played_station))
         # logger.error('DE \n\nselection = {}'.format(self.selections))
         stream_url = ''
-        self.log.display_help_message = False
+        self.log.write(reset_help_msg=True)
         if restart:
             stream_url = self._last_played_station[1]
             enc = self._last_played_station[2]
@@ -1611,6 +1578,93 @@ class PyRadio(object):
         except ValueError:
             self.playback_timeout = 10
         self._click_station()
+        self._resolve_stream_urls()
+
+    def _resolve_stream_urls(self):
+        ''' find the stream urls the playlist (m3u, pls, asx)
+            stations around the one playing point to, in the
+            background, so that they can be played directly
+            when the user moves to them '''
+        if not self._cnf.browsing_station_service and \
+                0 <= self.playing < self.number_of_items:
+            from .stream_resolver import stream_resolver, RESOLVE_NEIGHBOURS
+            first = max(0, self.playing - RESOLVE_NEIGHBOURS)
+            last = min(self.number_of_items, self.playing + RESOLVE_NEIGHBOURS + 1)
+            stream_resolver(self._cnf.stations_dir).resolve_in_background(
+                [self.stations[i][1] for i in range(first, last)])
+
+    def _check_stations(self):
+        ''' check all stations of the playlist in the background;
+            dead and slow ones are marked when done '''
+        if self._cnf.browsing_station_service:
+            self._print_not_applicable()
+            return
+        if self.number_of_items == 0:
+            return
+        if self._station_checker and self._station_checker.running:
+            self.log.write(msg='Already checking stations...')
+            return
+        from .station_check import PyRadioStationChecker
+        self._station_checker = PyRadioStationChecker(
+            [x[1] for x in self.stations],
+            config_dir=self._cnf.stations_dir,
+            progress_function=self._station_check_progress,
+            done_function=self._station_check_done
+        )
+        self._station_checker.start()
+
+    def _station_check_progress(self, done, total):
+        self.log.write(msg='Checking stations: {0}/{1}'.format(done, total))
+
+    def _station_check_done(self, results):
+        ''' runs in a checker thread '''
+        counts = {'ok': 0, 'slow': 0, 'dead': 0}
+        for n in results:
+            counts[n['status']] += 1
+        self.log.write(msg='Stations checked: {0} ok, {1} slow, {2} dead'.format(
+            counts['ok'], counts['slow'], counts['dead']))
+        ''' read them again, they have been saved
+            (along with the ones of other playlists) '''
+        self._read_station_check_results()
+
+    def _load_station_check_results(self):
+        ''' read the results of previous checks in a thread,
+            if there are any '''
+        from .station_check import STATION_CHECK_FILE
+        if os.path.exists(os.path.join(self._cnf.stations_dir, STATION_CHECK_FILE)):
+            a_thread = threading.Thread(target=self._read_station_check_results)
+            a_thread.daemon = True
+            a_thread.start()
+
+    def _read_station_check_results(self):
+        ''' runs in a thread; the results are
+            displayed by the main loop '''
+        from .station_check import load_check_results
+        results = load_check_results(self._cnf.stations_dir)
+        with self._update_notify_lock:
+            self._station_check_new_results = results
+
+    def _apply_station_check_results(self):
+        ''' use the results read by _read_station_check_results()
+            (called by the main loop) '''
+        with self._update_notify_lock:
+            results = self._station_check_new_results
+            self._station_check_new_results = None
+        if results is not None:
+            self._station_check_results = results
+            if self.ws.window_mode == self.ws.NORMAL_MODE and \
+                    self.ws.operation_mode == self.ws.NORMAL_MODE and \
+                    not self._cnf.browsing_station_service:
+                self.refreshBody()
+
+    def _station_check_mark(self, url):
+        ''' Return the mark of a station which was found dead
+            or slow the last time it was checked ('' otherwise) '''
+        try:
+            status = self._station_check_results[url]['status']
+        except (KeyError, TypeError):
+            return ''
+        return '' if status == 'ok' else '[' + status + '] '
 
     def _enable_player_crash_detection(self):
         if logger.isEnabledFor(logging.INFO):
@@ -1669,6 +1723,7 @@ class PyRadio(object):
             self.refreshBody(start=1)
         if logger.isEnabledFor(logging.INFO):
             logger.info('*** Start of playback NOT detected!!! ***')
+        self.player.forget_resolved_url()
         self.player.stop_mpv_status_update_thread = True
         self.log.write(msg='Failed to connect to: ' + self._last_played_station[0])
         self.player.connecting = False
@@ -1688,8 +1743,7 @@ class PyRadio(object):
         if from_update_thread:
             self.detect_if_player_exited = True
             self.player.stop_timeout_counter_thread = True
-        with self.log.lock:
-            self.log.counter = None
+        self.log.write(counter='0')
         self._update_status_bar_right()
         if self.player.isPlaying():
             self.stopPlayer(show_message=True, from_update_thread=from_update_thread)
@@ -2063,11 +2117,13 @@ class PyRadio(object):
             line = pl_line.replace('register_', 'Register: ')
         else:
             line = pl_line
-        f_data = ' [{0}, {1}]'.format(station[2], station[1])
+        f_data = ' [{0} station{1}, {2}, {3}]'.format(
+            station[3], '' if station[3] == 1 else 's',
+            station[2], station[1])
         if version_info < (3, 0):
             if cjklen(line.decode('utf-8', 'replace')) + cjklen(f_data.decode('utf-8', 'replace')) > self.bodyMaxX:
                 ''' this is too long, try to shorten it
-                    by removing file size '''
+                    by removing number of stations and file size '''
                 f_data = ' [{0}]'.format(station[1])
             if cjklen(line.decode('utf-8', 'replace')) + cjklen(f_data.decode('utf-8', 'replace')) > self.bodyMaxX:
                 ''' still too long. start removing chars '''
@@ -2081,7 +2137,7 @@ class PyRadio(object):
         else:
             if cjklen(line) + cjklen(f_data) > self.bodyMaxX:
                 ''' this is too long, try to shorten it
-                    by removing file size '''
+                    by removing number of stations and file size '''
                 f_data = ' [{0}]'.format(station[1])
             if cjklen(line) + cjklen(f_data) > self.bodyMaxX:
                 ''' still too long. start removing chars '''
@@ -2089,9 +2145,9 @@ class PyRadio(object):
                     f_data = f_data[:-1]
                 f_data += ']'
             ''' if too short, pad f_data to the right '''
-            if cjklen(line) + cjklen(f_data) < self.maxX:
-                while cjklen(line) + cjklen(f_data) < self.bodyMaxX:
-                    line += ' '
+            f_len = cjklen(line) + cjklen(f_data)
+            if f_len < self.maxX and f_len < self.bodyMaxX:
+                line += ' ' * (self.bodyMaxX - f_len)
         line += f_data
         return line
 
@@ -2104,12 +2160,7 @@ class PyRadio(object):
             else:
                 return line[:self.bodyMaxX]
         else:
-            if len(line) != cjklen(line):
-                while cjklen(line) > self.bodyMaxX:
-                    line = line[:-1]
-                return line
-            else:
-                return line[:self.bodyMaxX]
+            return cjkslices(line, self.bodyMaxX)[0]
 
     def _print_help(self):
         # logger.error('DE \n\nself.ws.operation_mode = {}'.format(self.ws.operation_mode))
@@ -2733,6 +2784,7 @@ class PyRadio(object):
                      r      ||R|ename current playlist.
                      C      ||C|lear all registers.
                      u      |Show |U|nnamed Register.
+                     k      |Chec|k| stations (mark dead / slow ones).
 
                     |Any other key exits current mode.
                   '''
@@ -3888,13 +3940,17 @@ class PyRadio(object):
         # self.ll('_open_playlist(): returning')
 
     def _return_from_online_browser_search(self, ret):
-        ''' ret is (success, from user search)
+        ''' ret is (success, number of stations, from user search[, partial])
                 success
                     True or False
                 from user search
                     if success is False
                         True if from user search or server change
                         False if from opening browser
+                partial
+                    if present and True, these are the first
+                    stations received; the function will be
+                    called again when the search is complete
         '''
 
         if self.ws.operation_mode in (
@@ -3902,6 +3958,7 @@ class PyRadio(object):
             self.ws.BROWSER_PERFORMING_SEARCH_MODE,
         ):
             self.ws.close_window()
+        partial = len(ret) > 3 and ret[3]
         if not ret[0]:
             logger.error('DE operation mode = {}'.format(self.ws.operation_mode))
             if ret[2]:
@@ -3946,6 +4003,11 @@ class PyRadio(object):
         '''
         self._cnf._online_browser.first_search = False
 
+        if partial:
+            ''' display the first stations now; the
+                rest of them are still being received '''
+            self.redraw_scheduler.flush()
+
     def _open_playlist_from_history(self,
                                     reset=False,
                                     list_of_registers=False,
@@ -4108,13 +4170,9 @@ class PyRadio(object):
         return result
 
     def _get_station_id(self, find):
-        for i, a_station in enumerate(self.stations):
-            if a_station[0] == find:
-                return i
-        return -1
+        return find_station(self.stations, find)
 
     def _get_stations_ids(self, find):
-        ch = -2
         i_find = [-1, -1]
         debug_str = ('selection', 'playing')
         for j, a_find in enumerate(find):
@@ -4125,28 +4183,22 @@ class PyRadio(object):
                     except:
                         logger.debug('** Looking for {0} station: "{1}"'.format(debug_str[j], a_find.encode('utf-8', 'replace')))
 
-                for i, a_station in enumerate(self.stations):
-                    if i_find[j] == -1:
-                        if j == 1 and find[0] == find[1]:
-                            ''' No need to scan again for the same station '''
-                            i_find[1] = i_find[0]
-                            if logger.isEnabledFor(logging.DEBUG):
-                                logger.debug('** Got it at {}'.format(i_find[0]))
-                            break
-                        ''' python 2 fix
-                            a_find may be unicode under python 2, so convert to str
-                        '''
-                        if isinstance(a_find, str):
-                            a_find_str = a_find
-                        else:
-                            a_find_str = a_find.encode('utf-8', 'ignore')
-                        if a_station[0] == a_find_str:
-                            i_find[j] = i
-                            if logger.isEnabledFor(logging.DEBUG):
-                                logger.debug('** Found at {}'.format(i))
-                            ch += 1
-                            if ch == 0:
-                                break
+                if j == 1 and find[0] == find[1]:
+                    ''' No need to scan again for the same station '''
+                    i_find[1] = i_find[0]
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug('** Got it at {}'.format(i_find[0]))
+                    continue
+                ''' python 2 fix
+                    a_find may be unicode under python 2, so convert to str
+                '''
+                if isinstance(a_find, str):
+                    a_find_str = a_find
+                else:
+                    a_find_str = a_find.encode('utf-8', 'ignore')
+                i_find[j] = find_station(self.stations, a_find_str)
+                if i_find[j] > -1 and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('** Found at {}'.format(i_find[j]))
         return i_find
 
     def _set_active_stations(self):
@@ -4536,7 +4588,6 @@ class PyRadio(object):
         if ret:
             ''' refresh reference '''
             self.stations = self._cnf.stations
-            self._cnf.dirty_playlist = True
             if self.playing == source:
                 self.playing = target
             elif self.playing == target:
@@ -4610,7 +4661,7 @@ class PyRadio(object):
             return
         self._limited_width_mode = False
         if self.player.isPlaying():
-            self.log.display_help_message = False
+            self.log.write(reset_help_msg=True)
         self.setupAndDrawScreen()
         if self.selection >= self.number_of_items - self.bodyMaxY and \
                 self.number_of_items > self.bodyMaxY:
@@ -4725,9 +4776,9 @@ class PyRadio(object):
 
             if playlist == '':
                 ''' paste to current playlist / register '''
-                self._cnf.dirty_playlist = True
                 if self.number_of_items == 0:
-                    self._cnf.stations = [self._unnamed_register]
+                    self._cnf.dirty_playlist = True
+                    self._cnf.stations = PyRadioStationList([self._unnamed_register])
                     self.number_of_items = self._cnf.number_of_stations = 1
                     self.selection = -1
                     self.startPos = 0
@@ -4762,7 +4813,7 @@ class PyRadio(object):
         selection = playing = found = -1
         for i, n in enumerate(self._cnf.playlists):
             for k in range(0, 2):
-                if search[k] == n[3]:
+                if search[k] == n[-1]:
                     found_id[k] = i
                     found += 1
                 if k == 0 and search[0] == search[1]:
@@ -5050,7 +5101,7 @@ class PyRadio(object):
                     self.bodyWin.untouchwin()
                     self._unselect_line(self._current_selection)
                     self._select_line(self.selection)
-                    self.bodyWin.refresh()
+                    self.redraw_scheduler.update(self.bodyWin)
                     return
         self.refreshBody()
 
@@ -5072,7 +5123,7 @@ class PyRadio(object):
                     self.bodyWin.untouchwin()
                     self._unselect_line(self._current_selection)
                     self._select_line(self.selection)
-                    self.bodyWin.refresh()
+                    self.redraw_scheduler.update(self.bodyWin)
                     return
         self.refreshBody()
 
@@ -5084,6 +5135,7 @@ class PyRadio(object):
         # if logger.isEnabledFor(logging.DEBUG):
         #     logger.debug('selecting line {}, color {}'.format(a_line - self.startPos, col))
         ''' chgat also touches the libe '''
+        self._invalidate_body_line(a_line - self.startPos)
         try:
             self.bodyWin.chgat(a_line - self.startPos, 0, -1, curses.color_pair(col))
         except:
@@ -5103,6 +5155,7 @@ class PyRadio(object):
         # if logger.isEnabledFor(logging.DEBUG):
         #     logger.debug('unselecting line {}, color {}'.format(a_line - self.startPos, col))
         ''' chgat also touches the libe '''
+        self._invalidate_body_line(a_line - self.startPos)
         try:
             self.bodyWin.chgat(a_line - self.startPos, 0, -1, curses.color_pair(col))
         except:
@@ -5470,7 +5523,7 @@ class PyRadio(object):
                     self._print_playlist_not_saved_error()
                 else:
                     self._rename_playlist_dialog = PyRadioRenameFile(
-                        self._cnf.station_path if self.ws.operation_mode == self.ws.NORMAL_MODE else self.stations[self.selection][3],
+                        self._cnf.station_path if self.ws.operation_mode == self.ws.NORMAL_MODE else self.stations[self.selection][-1],
                         self.outerBodyWin,
                         opened_from_editor=True if self.ws.operation_mode == self.ws.NORMAL_MODE else False,
                         global_functions=self._global_functions,
@@ -5538,6 +5591,12 @@ class PyRadio(object):
                 self._show_unnamed_register()
                 return
 
+            elif char == ord('k'):
+                ''' k pressed - check stations '''
+                self._update_status_bar_right(status_suffix='')
+                if self.ws.operation_mode == self.ws.NORMAL_MODE:
+                    self._check_stations()
+
             elif char == ord('\\'):
                 ''' \\ pressed - go back in history '''
                 if self._cnf.dirty_playlist:
@@ -5809,6 +5868,12 @@ class PyRadio(object):
             elif ret == self.ws.SELECT_STATION_MODE:
                 ''' Config > Select Default Station '''
                 self.ws.operation_mode = self.ws.SELECT_STATION_MODE
+                ''' the window reads the CSV file; write any journaled
+                    edits to it first, so that the station indices
+                    are those of the real playlist '''
+                self._cnf.compact_playlist_journal(
+                    join(self._cnf.stations_dir,
+                         self._config_win._config_options['default_playlist'][1] + '.csv'))
                 if self._station_select_win is None:
                     self._station_select_win = PyRadioSelectStation(
                         self.bodyWin,
@@ -5842,8 +5907,7 @@ class PyRadio(object):
                         if self.player.isPlaying():
                             self.stopPlayer()
                             self.refreshBody()
-                        self.log.display_help_message = False
-                        self.log.write(msg=msg[0], help_msg=False, suffix=self._status_suffix)
+                        self.log.write(msg=msg[0], help_msg=False, reset_help_msg=True, suffix=self._status_suffix)
                         self._print_config_save_error()
                     elif ret == 0:
                         ''' Config saved successfully '''
@@ -6057,8 +6121,8 @@ class PyRadio(object):
                         self._last_played_station = self._station_editor.new_station
                 else:
                     ''' adding a new station '''
-                    self._cnf.dirty_playlist = True
                     if self._station_editor.append and self.number_of_items > 0:
+                        self._cnf.dirty_playlist = True
                         self.stations.append(self._station_editor.new_station)
                         self.number_of_items = len(self.stations)
                         self._cnf.number_of_stations = self.number_of_items
@@ -6066,7 +6130,8 @@ class PyRadio(object):
                         self.startPos = self.number_of_items - self.bodyMaxY
                     else:
                         if self.number_of_items == 0:
-                            self._cnf.stations = [self._station_editor.new_station]
+                            self._cnf.dirty_playlist = True
+                            self._cnf.stations = PyRadioStationList([self._station_editor.new_station])
                             self.number_of_items = self._cnf.number_of_stations = 1
                             self.selection = -1
                             self.startPos = 0
@@ -6987,7 +7052,9 @@ class PyRadio(object):
                     self.stations[self.playing][0],
                     icy_data_name
                 )
-                self.stations[self.playing][0] = icy_data_name
+                ''' replace the station, so that the station
+                    list's name index gets updated '''
+                self.stations[self.playing] = [icy_data_name] + self.stations[self.playing][1:]
                 self._cnf.dirty_playlist = True
                 self._last_played_station = self.stations[self.playing]
                 self.selections[0][3] = self.stations
@@ -7424,7 +7491,7 @@ class PyRadio(object):
                               ord('\n'), ord('\r'),
                               curses.KEY_RIGHT, ord('l')):
                     self._reset_status_bar_right()
-                    self.log.counter = None
+                    self.log.write(counter='0')
                     self._update_status_bar_right()
                     if self.number_of_items > 0:
                         logger.info('playSelection!')
@@ -7435,7 +7502,7 @@ class PyRadio(object):
 
                 elif char in (ord(' '), curses.KEY_LEFT, ord('h')):
                     self._reset_status_bar_right()
-                    self.log.counter = None
+                    self.log.write(counter='0')
                     self._update_status_bar_right()
                     if self.number_of_items > 0:
                         if self.player.isPlaying():
@@ -8185,20 +8252,16 @@ class PyRadio(object):
                 pass
             else:
                 self.bodyWin.erase()
+            self._invalidate_body_lines()
         else:
+            clear_line = not self._cnf.browsing_station_service and \
+                self.ws.operation_mode == self.ws.NORMAL_MODE
             for lineNum in range(self.bodyMaxY):
                 i = lineNum + self.startPos
                 if i < len(self.stations):
-                    if not self._cnf.browsing_station_service and \
-                            self.ws.operation_mode == self.ws.NORMAL_MODE:
-                        try:
-                            self.bodyWin.move(lineNum, 0)
-                            self.bodyWin.clrtoeol()
-                        except:
-                            if logger.isEnabledFor(logging.DEBUG):
-                                logger.debug('====---- clear line move failed----====')
-                    self.__displayBodyLine(lineNum, pad, self.stations[i])
+                    self.__displayBodyLine(lineNum, pad, self.stations[i], clear_line=clear_line)
                 else:
+                    self._invalidate_body_lines(lineNum)
                     if self._cnf.browsing_station_service:
                         ''' display browser empty lines (station=None) '''
                         line = self.__displayBodyLine(0, pad, None, return_line = True)
@@ -8257,9 +8320,8 @@ class PyRadio(object):
                         except:
                             pass
         self.outerBodyWin.touchwin()
-        self.outerBodyWin.refresh()
         self.bodyWin.touchwin()
-        self.bodyWin.refresh()
+        self.redraw_scheduler.update(self.outerBodyWin, self.bodyWin)
 
     def _redisplay_config(self):
         self._config_win.parent = self.outerBodyWin
@@ -8622,8 +8684,9 @@ class PyRadio(object):
                 func()
                 return
             self._set_rename_stations()
-            self._cnf.stations = list(self._reading_stations)
+            self._cnf.stations = self._reading_stations
             self._reading_stations = []
+            self._cnf._read_playlist_version = self._cnf._playlist_version = self._reading_playlist_version
             self.stations = self._cnf.stations
             self._playlist_in_editor = stationFile
             self.number_of_items = len(self.stations)
@@ -8716,51 +8779,12 @@ class PyRadio(object):
 
 
     def _scan_playlist_for_station(self, stations, start, station_to_find):
+        ''' Return the index of station_to_find in stations
+            (the one nearest to start, if there are more than
+            one stations with the same name), or -1 '''
+        num = find_station(stations, station_to_find, start)
         if logger.isEnabledFor(logging.DEBUG):
-            logger.error('Scanning playlist...')
-        up = down = 0
-        num = -1
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug('  checking start={0}: "{1}"'.format(start, stations[start]))
-        if stations[start][0] == station_to_find:
-            return start
-        for i in range(start, -1, -1):
-            up = i + 1
-            down = i - 1
-            if down > -1 :
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug('  checking down={0}: "{1}"'.format(down, stations[down]))
-                if stations[down][0] == station_to_find:
-                    num = down
-                    break
-            if up < self._cnf.number_of_stations:
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug('  checking up={0}: "{1}"'.format(up, stations[up]))
-                if stations[up][0] == station_to_find:
-                    num = up
-                    break
-        up += 1
-        down -= 1
-        if num == -1 and down > -1:
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug('Station not found... Scanning to top...')
-            for i in range(down, -1, -1):
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug('  checking {0}: "{1}"'.format(i, stations[i]))
-                if stations[i][0] == station_to_find:
-                    num = i
-                    break
-
-        if num == -1 and up < self._cnf.number_of_stations:
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug('Station not found... Scanning to bottom...')
-            for i in range(up, self._cnf.number_of_stations - 1):
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug('  checking {0}: "{1}"'.format(i, stations[i]))
-                if stations[i][0] == station_to_find:
-                    num = i
-                    break
-
+            logger.debug('Scanning playlist from {0}: station found at {1}'.format(start, num))
         return num
 
     def _open_and_check_station_in_playlist(self, playlist_file, start, station_to_find):
@@ -8770,29 +8794,15 @@ class PyRadio(object):
                    or -1 if it fails
 
             stations are returned in self._reading_stations
+            playlist version in self._reading_playlist_version
         '''
-        num = -1
-        self._reading_stations = []
-        with open(playlist_file, 'r') as cfgfile:
-            try:
-                for row in csv.reader(filter(lambda row: row[0]!='#', cfgfile), skipinitialspace=True):
-                    if not row:
-                        continue
-                    try:
-                        name, url = [s.strip() for s in row]
-                        self._reading_stations.append([name, url, '', ''])
-                    except:
-                        try:
-                            name, url, enc = [s.strip() for s in row]
-                            self._reading_stations.append([name, url, enc, ''])
-                        except:
-                            name, url, enc, onl = [s.strip() for s in row]
-                            self._reading_stations.append([name, url, enc, onl])
-            except:
-                self._reading_stations = []
-                return num
-
-
+        self._cnf.compact_playlist_journal(playlist_file)
+        self._reading_stations, self._reading_playlist_version = \
+            self._cnf._read_playlist_stations(playlist_file)
+        if self._reading_stations is None:
+            ''' malformed playlist '''
+            self._reading_stations = PyRadioStationList()
+            return -1
         return self._scan_playlist_for_station(self._reading_stations, start, station_to_find)
 
 # pymode:lint_ignore=W901
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import curses
+import threading
+import logging
+from time import time
+
+logger = logging.getLogger(__name__)
+
+
+class PyRadioRedrawScheduler(object):
+    ''' Batch screen updates, so that any number of windows
+        drawn together reach the terminal with a single
+        curses.doupdate()
+
+        update() copies the windows to curses' virtual screen
+        right away (so windows drawn later, i.e. a popup, still
+        end up on top of them), but the physical screen is only
+        updated on flush().
+
+        The main thread calls flush() before waiting for a key,
+        so everything drawn while handling a key is displayed
+        at once.
+
+        Updates made by other threads (titles, counters etc.)
+        are flushed by a timer, no more often than max_fps
+        times per second, so that fast updates are coalesced.
+    '''
+
+    def __init__(self, max_fps=25):
+        self._lock = threading.RLock()
+        self._pending = False
+        self._timer = None
+        self._last_flush = 0
+        self.min_interval = 1.0 / max_fps
+        self._main_thread = threading.current_thread()
+
+    def update(self, *windows):
+        ''' Schedule windows to be displayed '''
+        with self._lock:
+            for a_window in windows:
+                try:
+                    a_window.noutrefresh()
+                except:
+                    ''' the window may have been deleted (resize) '''
+                    pass
+            self._pending = True
+            if threading.current_thread() is not self._main_thread:
+                self._arm_timer()
+
+    def _arm_timer(self):
+        if self._timer is not None:
+            ''' a flush is already scheduled '''
+            return
+        delay = self._last_flush + self.min_interval - time()
+        if delay < 0:
+            delay = 0
+        self._timer = threading.Timer(delay, self._timed_flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._timer = None
+            self._flush()
+
+    def flush(self):
+        ''' Update the screen now; returns True if
+            there was anything to display '''
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            return self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return False
+        self._pending = False
+        try:
+            curses.doupdate()
+        except:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('curses.doupdate() failed')
+        self._last_flush = time()
+        return True
+
+    def cancel(self):
+        ''' Drop any scheduled update (i.e. on exit) '''
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = False
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from bisect import bisect_right
+
+
+class PyRadioSearchIndex(object):
+    ''' Substring search over a list of strings
+
+        The (lowercase) strings are joined into a single text,
+        separated by SEPARATOR, and the offset each of them
+        starts at is kept; finding the next (or previous) item
+        containing a term is then a single str.find() (or
+        str.rfind()) on the text, wrapping around once, plus
+        a binary search to turn the offset into an item index.
+
+        An item can be made of several fields, by joining them
+        with SEPARATOR; a term never matches across fields or
+        items, since it cannot contain SEPARATOR.
+
+        Usage:
+            index = PyRadioSearchIndex(x.lower() for x in a_list)
+            index.find_next('term', start)
+    '''
+
+    SEPARATOR = '\0'
+
+    def __init__(self, strings):
+        self._starts = []
+        parts = []
+        pos = 0
+        for a_string in strings:
+            self._starts.append(pos)
+            parts.append(a_string)
+            pos += len(a_string) + 1
+        self._text = self.SEPARATOR.join(parts)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def _item_at(self, offset):
+        return bisect_right(self._starts, offset) - 1
+
+    def _end_of(self, item):
+        if item + 1 < len(self._starts):
+            return self._starts[item + 1] - 1
+        return len(self._text)
+
+    def _valid(self, term, start):
+        return term and self.SEPARATOR not in term and \
+            0 <= start < len(self._starts)
+
+    def find_next(self, term, start=0):
+        ''' Return the first item, from start on, which contains
+            term (continuing from the top of the list), or None '''
+        if not self._valid(term, start):
+            return None
+        offset = self._starts[start]
+        pos = self._text.find(term, offset)
+        if pos == -1:
+            pos = self._text.find(term, 0, offset)
+        return None if pos == -1 else self._item_at(pos)
+
+    def find_previous(self, term, start=0):
+        ''' Return the first item, from start back, which contains
+            term (continuing from the bottom of the list), or None '''
+        if not self._valid(term, start):
+            return None
+        offset = self._end_of(start)
+        pos = self._text.rfind(term, 0, offset)
+        if pos == -1:
+            pos = self._text.rfind(term, offset)
+        return None if pos == -1 else self._item_at(pos)
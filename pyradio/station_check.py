@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+import os
+import ssl
+import json
+import socket
+import threading
+import logging
+from time import time
+try:
+    from urllib.parse import urlsplit, urljoin
+except ImportError:
+    from urlparse import urlsplit, urljoin
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+from .stream_resolver import is_playlist_url, resolve_stream_url
+
+logger = logging.getLogger(__name__)
+
+''' number of stations checked at the same time '''
+STATION_CHECK_WORKERS = 16
+
+''' seconds to wait for a station to connect or respond '''
+STATION_CHECK_TIMEOUT = 5
+
+''' a station taking longer than this number of
+    seconds to send its first bytes is slow '''
+STATION_CHECK_SLOW = 2
+
+MAX_REDIRECTS = 5
+MAX_HEADER_SIZE = 16384
+
+''' Increase this when the results file layout changes '''
+STATION_CHECK_FORMAT_VERSION = 1
+STATION_CHECK_FILE = 'station-check.json'
+
+CODECS = {
+    'audio/mpeg': 'MP3',
+    'audio/mp3': 'MP3',
+    'audio/aac': 'AAC',
+    'audio/aacp': 'AAC+',
+    'audio/x-aac': 'AAC',
+    'audio/mp4': 'AAC',
+    'audio/ogg': 'OGG',
+    'application/ogg': 'OGG',
+    'audio/opus': 'OPUS',
+    'audio/flac': 'FLAC',
+    'audio/x-flac': 'FLAC',
+    'audio/wav': 'WAV',
+    'audio/x-wav': 'WAV',
+    'video/mp2t': 'TS',
+    'application/vnd.apple.mpegurl': 'HLS',
+    'application/x-mpegurl': 'HLS',
+    'audio/x-mpegurl': 'HLS',
+    'audio/mpegurl': 'HLS',
+}
+
+
+def _result(status, code=None, codec='', bitrate='', latency=None, error=''):
+    ''' The result of a station check, a dict:
+            status  : "ok", "slow" or "dead"
+            code    : the http (or icy) status code
+            codec   : i.e. "MP3", "AAC", "HLS"
+            bitrate : the icy-br header
+            latency : ms until the first byte of the
+                      stream was received
+            error   : why the station is dead
+            checked : when it was checked
+    '''
+    return {
+        'status': status,
+        'code': code,
+        'codec': codec,
+        'bitrate': bitrate,
+        'latency': latency,
+        'error': error,
+        'checked': int(time())
+    }
+
+
+def _handshake(url, timeout):
+    ''' GET a url and read the first bytes of its body
+
+        A raw socket is used, since shoutcast v1 servers
+        answer with an "ICY 200 OK" status line, which
+        http libraries do not accept.
+
+        Returns the status code, the (lower case) headers
+        and whether any data has been received.
+    '''
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError('unsupported url')
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    sock = socket.create_connection((parts.hostname, port), timeout)
+    try:
+        if parts.scheme == 'https':
+            sock = ssl.create_default_context().wrap_socket(
+                sock, server_hostname=parts.hostname)
+        a_path = parts.path or '/'
+        if parts.query:
+            a_path += '?' + parts.query
+        request = 'GET {0} HTTP/1.0\r\nHost: {1}\r\nUser-Agent: PyRadio\r\n' \
+            'Icy-MetaData: 1\r\nAccept: */*\r\nConnection: close\r\n\r\n'
+        sock.sendall(request.format(a_path, parts.netloc.split('@')[-1]).encode('utf-8'))
+        data = b''
+        while b'\r\n\r\n' not in data and b'\n\n' not in data:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+            if len(data) > MAX_HEADER_SIZE:
+                raise ValueError('invalid response')
+        sep = b'\r\n\r\n' if b'\r\n\r\n' in data else b'\n\n'
+        head, _, body = data.partition(sep)
+        lines = head.decode('latin-1').splitlines()
+        try:
+            code = int(lines[0].split()[1])
+        except (IndexError, ValueError):
+            raise ValueError('invalid response')
+        headers = {}
+        for a_line in lines[1:]:
+            sp = a_line.split(':', 1)
+            if len(sp) == 2:
+                headers[sp[0].strip().lower()] = sp[1].strip()
+        if 200 <= code < 300 and not body:
+            ''' the short read '''
+            body = sock.recv(4096)
+        return code, headers, bool(body)
+    finally:
+        sock.close()
+
+
+def check_station(url, timeout=STATION_CHECK_TIMEOUT, slow=STATION_CHECK_SLOW):
+    ''' Check whether a station's url can be played
+
+        Playlist urls (m3u, pls, asx) are resolved to the
+        stream they point to first. Returns a _result() dict.
+    '''
+    if is_playlist_url(url):
+        stream_url = resolve_stream_url(url, timeout)
+        if stream_url is None:
+            return _result('dead', error='playlist not found')
+        url = stream_url
+    start = time()
+    for _ in range(MAX_REDIRECTS + 1):
+        try:
+            code, headers, got_data = _handshake(url, timeout)
+        except socket.timeout:
+            return _result('dead', error='timeout')
+        except Exception as e:
+            return _result('dead', error=str(e) or e.__class__.__name__)
+        if code in (301, 302, 303, 307, 308) and 'location' in headers:
+            url = urljoin(url, headers['location'])
+            continue
+        break
+    else:
+        return _result('dead', code, error='too many redirects')
+    latency = int(1000 * (time() - start))
+    content_type = headers.get('content-type', '').split(';')[0].strip().lower()
+    codec = CODECS.get(content_type, content_type)
+    bitrate = headers.get('icy-br', '').split(',')[0].strip()
+    if not 200 <= code < 300:
+        return _result('dead', code, codec, bitrate, latency, 'HTTP {}'.format(code))
+    if not got_data:
+        return _result('dead', code, codec, bitrate, latency, 'no data')
+    status = 'slow' if latency > 1000 * slow else 'ok'
+    return _result(status, code, codec, bitrate, latency)
+
+
+def load_check_results(config_dir):
+    ''' Return the saved results, a dict {url: result} '''
+    try:
+        with open(os.path.join(config_dir, STATION_CHECK_FILE), 'r') as f:
+            data = json.load(f)
+    except:
+        return {}
+    if not isinstance(data, dict) or \
+            data.get('version') != STATION_CHECK_FORMAT_VERSION or \
+            not isinstance(data.get('results'), dict):
+        return {}
+    return data['results']
+
+
+def save_check_results(config_dir, results):
+    ''' Add results ({url: result}) to the saved ones '''
+    a_file = os.path.join(config_dir, STATION_CHECK_FILE)
+    tmp_file = a_file + '.tmp'
+    all_results = load_check_results(config_dir)
+    all_results.update(results)
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump({
+                'version': STATION_CHECK_FORMAT_VERSION,
+                'results': all_results
+            }, f)
+        os.rename(tmp_file, a_file)
+    except:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Cannot write station check results "{}"'.format(a_file))
+        try:
+            os.remove(tmp_file)
+        except:
+            pass
+        return False
+    return True
+
+
+class PyRadioStationChecker(object):
+    ''' Check a list of station urls, STATION_CHECK_WORKERS
+        of them at a time, in (daemon) threads
+
+        progress_function(done, total) is called after each
+        url is checked, and done_function(results) when all
+        of them are (unless stopped). results is a list
+        with the _result() of each url (None if not checked).
+
+        If config_dir is given, the results are saved in it.
+    '''
+
+    def __init__(self,
+                 urls,
+                 config_dir=None,
+                 workers=STATION_CHECK_WORKERS,
+                 timeout=STATION_CHECK_TIMEOUT,
+                 slow=STATION_CHECK_SLOW,
+                 progress_function=None,
+                 done_function=None):
+        self.urls = list(urls)
+        self.results = [None] * len(self.urls)
+        self._config_dir = config_dir
+        self._workers = max(1, min(workers, len(self.urls)))
+        self._timeout = timeout
+        self._slow = slow
+        self._progress_function = progress_function
+        self._done_function = done_function
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._done = 0
+        self._stop = False
+        self._finished = threading.Event()
+        self.elapsed = 0
+
+    @property
+    def running(self):
+        return bool(self._threads) and not self._finished.is_set()
+
+    def start(self):
+        self._start_time = time()
+        if not self.urls:
+            self._finish()
+            return
+        for i in range(len(self.urls)):
+            self._queue.put(i)
+        for _ in range(self._workers):
+            a_thread = threading.Thread(target=self._work)
+            a_thread.daemon = True
+            a_thread.start()
+            self._threads.append(a_thread)
+
+    def wait(self, timeout=None):
+        ''' Wait for all urls to be checked; returns the results '''
+        self._finished.wait(timeout)
+        return self.results
+
+    def stop(self):
+        ''' Do not check any more urls; the ones being
+            checked are not waited for '''
+        self._stop = True
+        self._finished.set()
+
+    def _work(self):
+        while not self._stop:
+            try:
+                i = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = check_station(self.urls[i], self._timeout, self._slow)
+            except Exception as e:
+                result = _result('dead', error=str(e))
+            with self._lock:
+                if self._stop:
+                    return
+                self.results[i] = result
+                self._done += 1
+                done = self._done
+            if self._progress_function:
+                self._progress_function(done, len(self.urls))
+            if done == len(self.urls):
+                self._finish()
+
+    def _finish(self):
+        self.elapsed = time() - self._start_time
+        if self._config_dir:
+            save_check_results(self._config_dir, dict(
+                (self.urls[i], x) for i, x in enumerate(self.results) if x))
+        self._finished.set()
+        if self._done_function:
+            self._done_function(self.results)
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+import logging
+from bisect import bisect_left, insort
+try:
+    from collections.abc import MutableSequence
+except ImportError:
+    from collections import MutableSequence
+try:
+    from sys import intern
+except ImportError:
+    ''' python 2: intern is a builtin '''
+    pass
+
+logger = logging.getLogger(__name__)
+
+
+class Station(object):
+    ''' A playlist station
+
+        It behaves like the 4-item list PyRadio used to keep
+        for each station ([name, URL, encoding, online browser])
+        i.e. it can be indexed, sliced, iterated and compared
+        to a list, but it uses a lot less memory.
+
+        Encodings and online browser flags are repeated many
+        times in a playlist, so they are interned.
+    '''
+
+    __slots__ = ('name', 'url', 'encoding', 'online')
+
+    _fields = ('name', 'url', 'encoding', 'online')
+
+    def __init__(self, name='', url='', encoding='', online=''):
+        self.name = name
+        self.url = url
+        self.encoding = intern(encoding) if encoding else ''
+        self.online = intern(online) if online else ''
+
+    @classmethod
+    def from_row(cls, row):
+        ''' Create a Station from a list, tuple or Station
+            containing 2, 3 or 4 items '''
+        if isinstance(row, cls):
+            return row
+        return cls(*row)
+
+    def __len__(self):
+        return 4
+
+    def __iter__(self):
+        yield self.name
+        yield self.url
+        yield self.encoding
+        yield self.online
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [getattr(self, x) for x in self._fields[index]]
+        return getattr(self, self._fields[index])
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            tmp = list(self)
+            tmp[index] = value
+            if len(tmp) != 4:
+                raise ValueError('a station must have exactly 4 items')
+            self.__init__(*tmp)
+        else:
+            field = self._fields[index]
+            if field in ('encoding', 'online') and value:
+                value = intern(value)
+            setattr(self, field, value)
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        ret = self.__eq__(other)
+        return ret if ret is NotImplemented else not ret
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def copy(self):
+        return Station(self.name, self.url, self.encoding, self.online)
+
+
+class PyRadioStationList(MutableSequence):
+    ''' The stations of a playlist
+
+        A list of Station items, which supports copy-on-write
+        snapshots: snapshot() (and [:]) returns a new list
+        which shares its data with the original one; the
+        data will only be copied when (and if) either of
+        them is modified.
+
+        As with a list, the snapshot is shallow; the Station
+        items themselves are shared.
+
+        It also keeps a name -> indices index, which is built
+        on the first call to find() or indices() and is then
+        kept up to date by the list's own methods. Changing
+        the name of a Station in place (i.e. stations[i][0] = x)
+        bypasses it; replace the station (stations[i] = x) instead.
+
+        version is increased every time the list is modified
+        (the same way), so that data derived from it (i.e. the
+        search index) can tell when to be rebuilt.
+    '''
+
+    __slots__ = ('_items', '_shared', '_index', '_version')
+
+    def __init__(self, stations=None):
+        self._shared = False
+        self._index = None
+        self._version = 0
+        if stations is None:
+            self._items = []
+        elif isinstance(stations, PyRadioStationList):
+            self._items = stations._items
+            self._shared = stations._shared = True
+        else:
+            self._items = [Station.from_row(x) for x in stations]
+
+    @classmethod
+    def from_columns(cls, names, urls, encodings, browsers):
+        ''' Create a list from the columns of a playlist '''
+        ret = cls()
+        ret._items = [Station(*x) for x in zip(names, urls, encodings, browsers)]
+        return ret
+
+    @classmethod
+    def from_stations(cls, stations):
+        ''' Create a list from an iterable of Station items
+            (no conversion takes place) '''
+        ret = cls()
+        ret._items = list(stations)
+        return ret
+
+    @property
+    def version(self):
+        return self._version
+
+    def _own(self):
+        ''' Copy the data, if shared, before modifying it
+            (and count the modification) '''
+        self._version += 1
+        if self._shared:
+            self._items = list(self._items)
+            self._shared = False
+
+    def snapshot(self):
+        ''' Return a copy-on-write copy of the list '''
+        return PyRadioStationList(self)
+
+    copy = snapshot
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __reversed__(self):
+        return reversed(self._items)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index == slice(None, None, None):
+                return self.snapshot()
+            ret = PyRadioStationList()
+            ret._items = self._items[index]
+            return ret
+        return self._items[index]
+
+    def __setitem__(self, index, value):
+        self._own()
+        if isinstance(index, slice):
+            self._items[index] = [Station.from_row(x) for x in value]
+            self._index = None
+        else:
+            index = self._positive(index)
+            old = self._items[index]
+            self._items[index] = Station.from_row(value)
+            if self._index is not None:
+                self._unindex(old.name, index)
+                self._add_to_index(self._items[index].name, index)
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            self._own()
+            del self._items[index]
+            self._index = None
+        else:
+            self.pop(index)
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and \
+                all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        ret = self.__eq__(other)
+        return ret if ret is NotImplemented else not ret
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self._items)
+
+    def _positive(self, index):
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError('station index out of range')
+        return index
+
+    def insert(self, index, value):
+        self._own()
+        n = len(self._items)
+        if index < 0:
+            index = max(0, index + n)
+        elif index > n:
+            index = n
+        self._items.insert(index, Station.from_row(value))
+        if self._index is not None:
+            ''' shift the stations below it down, starting
+                from the bottom, so that indices stay unique '''
+            for i in range(n, index, -1):
+                self._reindex(self._items[i].name, i - 1, i)
+            self._add_to_index(self._items[index].name, index)
+
+    def append(self, value):
+        self._own()
+        self._items.append(Station.from_row(value))
+        if self._index is not None:
+            self._add_to_index(self._items[-1].name, len(self._items) - 1)
+
+    def extend(self, values):
+        for x in values:
+            self.append(x)
+
+    def pop(self, index=-1):
+        self._own()
+        index = self._positive(index)
+        ret = self._items.pop(index)
+        if self._index is not None:
+            self._unindex(ret.name, index)
+            ''' shift the stations below it up, starting
+                from the top, so that indices stay unique '''
+            for i in range(index, len(self._items)):
+                self._reindex(self._items[i].name, i + 1, i)
+        return ret
+
+    def clear(self):
+        ''' Do not touch the (possibly shared) data '''
+        self._version += 1
+        self._items = []
+        self._shared = False
+        self._index = None
+
+    def move(self, source, target):
+        ''' Move the item at source to target, in place '''
+        source = self._positive(source)
+        target = self._positive(target)
+        self._own()
+        low, high = min(source, target), max(source, target)
+        old_names = [x.name for x in self._items[low:high+1]]
+        self._items.insert(target, self._items.pop(source))
+        self._reindex_range(low, old_names)
+
+    def swap(self, source, target):
+        ''' Switch the items at source and target, in place '''
+        source = self._positive(source)
+        target = self._positive(target)
+        self._own()
+        self._items[source], self._items[target] = \
+            self._items[target], self._items[source]
+        if self._index is not None:
+            names = self._items[source].name, self._items[target].name
+            self._unindex(names[1], source)
+            self._unindex(names[0], target)
+            self._add_to_index(names[0], source)
+            self._add_to_index(names[1], target)
+
+    ''' name index '''
+
+    def _build_index(self):
+        self._index = {}
+        for i, a_station in enumerate(self._items):
+            try:
+                self._index[a_station.name].append(i)
+            except KeyError:
+                self._index[a_station.name] = [i]
+
+    def _add_to_index(self, name, index):
+        try:
+            insort(self._index[name], index)
+        except KeyError:
+            self._index[name] = [index]
+
+    def _unindex(self, name, index):
+        ids = self._index[name]
+        ids.pop(bisect_left(ids, index))
+        if not ids:
+            del self._index[name]
+
+    def _reindex(self, name, old_index, new_index):
+        ''' a station's index changed by one; its
+            position in the (sorted) indices does not '''
+        ids = self._index[name]
+        ids[bisect_left(ids, old_index)] = new_index
+
+    def _reindex_range(self, start, old_names):
+        if self._index is None:
+            return
+        for i, name in enumerate(old_names):
+            self._unindex(name, start + i)
+        for i in range(start, start + len(old_names)):
+            self._add_to_index(self._items[i].name, i)
+
+    def indices(self, name):
+        ''' Return the (sorted) indices of the stations called name '''
+        if self._index is None:
+            self._build_index()
+        ids = self._index.get(name, [])
+        if any(self._items[i].name != name for i in ids[:1]):
+            ''' a station has been renamed in place '''
+            self._build_index()
+            ids = self._index.get(name, [])
+        return list(ids)
+
+    def find(self, name, start=0):
+        ''' Return the index of the station called name which is
+            nearest to start (the one with the lower index, in
+            case of a tie), or -1 if not found '''
+        ids = self.indices(name)
+        if not ids:
+            return -1
+        pos = bisect_left(ids, start)
+        if pos == len(ids):
+            return ids[-1]
+        if pos == 0 or ids[pos] == start:
+            return ids[pos]
+        if start - ids[pos - 1] <= ids[pos] - start:
+            return ids[pos - 1]
+        return ids[pos]
+
+
+def find_station(stations, name, start=0):
+    ''' Return the index of the station called name in
+        stations (a PyRadioStationList or a plain list)
+        which is nearest to start (the one with the lower
+        index, in case of a tie), or -1 if not found '''
+    if isinstance(stations, PyRadioStationList):
+        return stations.find(name, start)
+    ret = -1
+    for i, a_station in enumerate(stations):
+        if a_station[0] == name:
+            if ret == -1 or abs(i - start) < abs(ret - start):
+                ret = i
+            elif i > start:
+                break
+    return ret
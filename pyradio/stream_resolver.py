@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+import threading
+import logging
+from time import time
+try:
+    from urllib.request import urlopen, Request
+    from urllib.parse import urljoin
+except ImportError:
+    from urllib2 import urlopen, Request
+    from urlparse import urljoin
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+logger = logging.getLogger(__name__)
+
+''' Increase this when the cache file layout changes '''
+STREAM_CACHE_FORMAT_VERSION = 1
+
+''' seconds a resolved url is used for '''
+STREAM_URL_TTL = 24 * 3600
+
+''' seconds to wait before trying to resolve
+    a url which could not be resolved again '''
+STREAM_URL_FAILED_TTL = 600
+
+''' playlists bigger than this are not parsed '''
+MAX_PLAYLIST_SIZE = 65536
+
+''' playlists pointing to playlists are followed
+    up to this many times '''
+MAX_PLAYLIST_DEPTH = 3
+
+''' number of stations before and after the one played
+    whose playlist urls are resolved in advance '''
+RESOLVE_NEIGHBOURS = 5
+
+RESOLVER_WORKERS = 4
+RESOLVER_TIMEOUT = 5
+
+PLAYLIST_EXTENSIONS = ('m3u', 'pls', 'asx')
+
+_resolvers = {}
+_lock = threading.Lock()
+
+
+def is_playlist_url(url):
+    ''' True if url points to a m3u, pls or asx playlist
+        (judging by its extension, like the players do) '''
+    return url.split('?')[0][-3:].lower() in PLAYLIST_EXTENSIONS
+
+
+def parse_playlist(text):
+    ''' Return the urls in a m3u, pls or asx playlist
+        (which may be relative to the playlist's url)
+
+        HLS playlists (m3u8) are not parsed; they are
+        left to the player '''
+    if '#EXT-X-' in text:
+        return []
+    lower_text = text.lower()
+    if '[playlist]' in lower_text:
+        ret = []
+        for a_line in text.splitlines():
+            sp = a_line.split('=', 1)
+            if len(sp) == 2 and sp[0].strip().lower().startswith('file'):
+                ret.append(sp[1].strip())
+    elif '<asx' in lower_text:
+        ret = re.findall(r'<ref\s+href\s*=\s*["\']([^"\']+)["\']', text, re.I)
+    else:
+        ret = [x.strip() for x in text.splitlines()
+               if x.strip() and not x.strip().startswith('#')]
+    return [x for x in ret if x]
+
+
+def _open(url, timeout):
+    return urlopen(Request(url, headers={'User-Agent': 'PyRadio'}), timeout=timeout)
+
+
+def resolve_stream_url(url, timeout=RESOLVER_TIMEOUT, depth=MAX_PLAYLIST_DEPTH):
+    ''' Return the url of the stream a playlist url points
+        to (following redirects), or None if it cannot be
+        resolved '''
+    try:
+        r = _open(url, timeout)
+        try:
+            base_url = r.geturl()
+            text = r.read(MAX_PLAYLIST_SIZE + 1)
+        finally:
+            r.close()
+    except:
+        return None
+    if len(text) > MAX_PLAYLIST_SIZE:
+        return None
+    entries = [urljoin(base_url, x) for x in parse_playlist(text.decode('utf-8', 'replace'))]
+    entries = [x for x in entries if '://' in x]
+    if not entries:
+        return None
+    stream_url = entries[0]
+    if is_playlist_url(stream_url):
+        if depth > 1:
+            return resolve_stream_url(stream_url, timeout, depth - 1)
+        return None
+    ''' follow the stream's redirects, without reading it;
+        shoutcast v1 servers do not answer with an http
+        status line, so their url is used as is '''
+    try:
+        r = _open(stream_url, timeout)
+        stream_url = r.geturl()
+        r.close()
+    except:
+        pass
+    return stream_url
+
+
+class PyRadioStreamResolver(object):
+    ''' A cache of the stream urls m3u, pls and asx
+        playlist urls point to
+
+        Instead of having the player download and parse
+        a station's playlist every time it is played, the
+        stream url is found in advance (in a background
+        thread) and given to the player instead.
+
+        Resolved urls are kept for STREAM_URL_TTL seconds,
+        in "stream-urls.json", in the config dir.
+    '''
+
+    CACHE_FILE = 'stream-urls.json'
+
+    def __init__(self, config_dir, ttl=STREAM_URL_TTL):
+        self._file = os.path.join(config_dir, self.CACHE_FILE) if config_dir else None
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._threads = []
+        self._dirty = False
+        self._urls = self._read()
+
+    def _read(self):
+        if self._file is None:
+            return {}
+        try:
+            with open(self._file, 'r') as f:
+                data = json.load(f)
+        except:
+            return {}
+        if not isinstance(data, dict) or \
+                data.get('version') != STREAM_CACHE_FORMAT_VERSION or \
+                not isinstance(data.get('urls'), dict):
+            return {}
+        now = time()
+        return dict((k, v) for k, v in data['urls'].items() if v[1] > now)
+
+    def save(self):
+        if self._file is None:
+            return
+        tmp_file = self._file + '.tmp'
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time()
+            data = {
+                'version': STREAM_CACHE_FORMAT_VERSION,
+                'urls': dict((k, v) for k, v in self._urls.items() if v[1] > now)
+            }
+            try:
+                with open(tmp_file, 'w') as f:
+                    json.dump(data, f)
+                os.rename(tmp_file, self._file)
+                self._dirty = False
+            except:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('Cannot write stream urls cache "{}"'.format(self._file))
+                try:
+                    os.remove(tmp_file)
+                except:
+                    pass
+
+    def _entry(self, url):
+        ''' Return [resolved url or None, expiration time]
+            or None if url is not cached (or has expired) '''
+        with self._lock:
+            entry = self._urls.get(url)
+        if entry and entry[1] > time():
+            return entry
+        return None
+
+    def get(self, url):
+        ''' Return the (cached) stream url of a playlist
+            url, or None '''
+        entry = self._entry(url)
+        return entry[0] if entry else None
+
+    def forget(self, url):
+        ''' Remove a url from the cache (i.e. because the
+            stream it was resolved to cannot be played) '''
+        with self._lock:
+            if self._urls.pop(url, None) is not None:
+                self._dirty = True
+        self.save()
+
+    def resolve(self, url):
+        ''' Resolve a playlist url now, cache and return
+            its stream url (None if it cannot be resolved) '''
+        stream_url = resolve_stream_url(url)
+        if stream_url:
+            entry = [stream_url, time() + self.ttl]
+        else:
+            entry = [None, time() + STREAM_URL_FAILED_TTL]
+        with self._lock:
+            self._urls[url] = entry
+            self._dirty = True
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Stream url resolved: "{0}" -> "{1}"'.format(url, stream_url))
+        return stream_url
+
+    def resolve_in_background(self, urls):
+        ''' Resolve the playlist urls in urls, which are not
+            cached already, in RESOLVER_WORKERS threads '''
+        added = False
+        for url in urls:
+            if is_playlist_url(url) and self._entry(url) is None:
+                with self._lock:
+                    if url in self._pending:
+                        continue
+                    self._pending.add(url)
+                self._queue.put(url)
+                added = True
+        if added:
+            self._start_threads()
+
+    def _start_threads(self):
+        with self._lock:
+            while len(self._threads) < RESOLVER_WORKERS:
+                a_thread = threading.Thread(target=self._work)
+                a_thread.daemon = True
+                a_thread.start()
+                self._threads.append(a_thread)
+
+    def _work(self):
+        while True:
+            url = self._queue.get()
+            try:
+                self.resolve(url)
+            except:
+                pass
+            with self._lock:
+                self._pending.discard(url)
+                done = not self._pending
+            if done:
+                self.save()
+
+
+def stream_resolver(config_dir):
+    ''' Return the (shared) PyRadioStreamResolver of a config dir '''
+    with _lock:
+        if config_dir not in _resolvers:
+            _resolvers[config_dir] = PyRadioStreamResolver(config_dir)
+        return _resolvers[config_dir]